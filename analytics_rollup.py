@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Analytics Rollup
+Folds the raw AR viewer events in `public.analytics` into small per-day,
+per-model aggregate tables, so dashboards read a few hundred rows instead
+of scanning every event.
+
+    analytics_daily        events per (day, model, event type, device, language)
+    analytics_daily_users  one row per (day, model, user), for unique users
+    analytics_rollup_state the id of the last event folded in
+
+Each run reads the events after the stored id in batches, groups them with
+NumPy and adds the counts to the aggregates. The counts and the new id are
+written in one transaction (the analytics_rollup_apply function in
+Supabase), which only succeeds if the stored id is still the one the batch
+started from, so overlapping or retried runs never count an event twice.
+Events younger than SETTLE_SECONDS are left for the next run, in case an
+insert with a lower id hasn't committed yet.
+
+Stores: SupabaseRollupStore in production (the scheduled rollup_analytics
+function in spacecheck_backend.py), SqlRollupStore for a local SQLite or
+Postgres stand-in.
+
+Usage:
+    python3 analytics_rollup.py --sqlite analytics.sqlite --seed 100000
+    python3 analytics_rollup.py --sqlite analytics.sqlite
+    python3 analytics_rollup.py --supabase
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+STATE_NAME = "daily"
+BATCH_SIZE = 10000
+SETTLE_SECONDS = 60
+
+# Columns of analytics_daily that identify a row
+DAILY_KEYS = ("day", "model_name", "event_type", "device", "language")
+USER_KEYS = ("day", "model_name", "user_id")
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analytics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+    event_type TEXT NOT NULL,
+    user_id TEXT,
+    model_name TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS analytics_daily (
+    day TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    device TEXT NOT NULL,
+    language TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    PRIMARY KEY (day, model_name, event_type, device, language)
+);
+CREATE TABLE IF NOT EXISTS analytics_daily_users (
+    day TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (day, model_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+    name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+"""
+
+# Event types and user agents for --seed, as sent by the AR viewer
+SEED_EVENTS = ("view_page", "model_loaded", "click_ar_view", "ar_activated_success",
+               "ar_not_available", "ar_activation_error", "model_load_error", "toggle_language")
+SEED_AGENTS = ("Mozilla/5.0 (iPhone; CPU iPhone OS 17_4 like Mac OS X)",
+               "Mozilla/5.0 (Linux; Android 14; Pixel 8)",
+               "Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+class SupabaseRollupStore:
+    """Raw events and aggregates in Supabase (service role key)"""
+
+    def __init__(self, supabase):
+        self.supabase = supabase
+
+    def last_id(self):
+        result = (self.supabase.table("analytics_rollup_state").select("last_id")
+                  .eq("name", STATE_NAME).execute())
+        return int(result.data[0]["last_id"]) if result.data else 0
+
+    def fetch(self, after_id, limit):
+        # Only the metadata fields the rollup needs, not the whole payload
+        result = (self.supabase.table("analytics")
+                  .select("id,created_at,event_type,user_id,model_name,"
+                          "user_agent:metadata->>userAgent,ios:metadata->>ios,language:metadata->>language")
+                  .gt("id", after_id).order("id").limit(limit).execute())
+        return result.data or []
+
+    def apply(self, expected_id, last_id, daily, users):
+        result = self.supabase.rpc("analytics_rollup_apply", {
+            "p_name": STATE_NAME,
+            "p_expected_id": expected_id,
+            "p_last_id": last_id,
+            "p_daily": daily,
+            "p_users": users,
+        }).execute()
+        return bool(result.data)
+
+
+class SqlRollupStore:
+    """
+    Raw events and aggregates in a DB-API connection: sqlite3, or a local
+    Postgres (psycopg) with the tables from landing/supabase/schema.sql.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sqlite = isinstance(conn, sqlite3.Connection)
+        self.mark = "?" if self.sqlite else "%s"
+        if self.sqlite:
+            conn.executescript(SQLITE_SCHEMA)
+            conn.commit()
+
+    def _sql(self, sql):
+        return sql.replace("?", self.mark)
+
+    def last_id(self):
+        cursor = self.conn.cursor()
+        cursor.execute(self._sql("SELECT last_id FROM analytics_rollup_state WHERE name = ?"), (STATE_NAME,))
+        row = cursor.fetchone()
+        return int(row[0]) if row else 0
+
+    def fetch(self, after_id, limit):
+        cursor = self.conn.cursor()
+        cursor.execute(self._sql(
+            "SELECT id, created_at, event_type, user_id, model_name, metadata FROM analytics "
+            "WHERE id > ? ORDER BY id LIMIT ?"), (after_id, limit))
+        events = []
+        for id_, created_at, event_type, user_id, model_name, metadata in cursor.fetchall():
+            if isinstance(metadata, str):
+                metadata = json.loads(metadata or "null")
+            metadata = metadata or {}
+            events.append({
+                "id": id_, "created_at": created_at, "event_type": event_type,
+                "user_id": user_id, "model_name": model_name,
+                "user_agent": metadata.get("userAgent"), "ios": metadata.get("ios"),
+                "language": metadata.get("language"),
+            })
+        return events
+
+    def apply(self, expected_id, last_id, daily, users):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(self._sql(
+                "INSERT INTO analytics_rollup_state (name, last_id) VALUES (?, 0) ON CONFLICT (name) DO NOTHING"),
+                (STATE_NAME,))
+            cursor.execute(self._sql(
+                "UPDATE analytics_rollup_state SET last_id = ?, updated_at = ? WHERE name = ? AND last_id = ?"),
+                (last_id, utc_now().isoformat(timespec="seconds"), STATE_NAME, expected_id))
+            if cursor.rowcount != 1:
+                self.conn.rollback()
+                return False
+            cursor.executemany(self._sql(
+                "INSERT INTO analytics_daily (day, model_name, event_type, device, language, events) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (day, model_name, event_type, device, language) "
+                "DO UPDATE SET events = analytics_daily.events + excluded.events"),
+                [tuple(row[key] for key in DAILY_KEYS) + (row["events"],) for row in daily])
+            cursor.executemany(self._sql(
+                "INSERT INTO analytics_daily_users (day, model_name, user_id) VALUES (?, ?, ?) "
+                "ON CONFLICT (day, model_name, user_id) DO NOTHING"),
+                [tuple(row[key] for key in USER_KEYS) for row in users])
+            self.conn.commit()
+            return True
+        except Exception:
+            self.conn.rollback()
+            raise
+
+
+def _strings(events, key):
+    return np.array(["" if e.get(key) is None else str(e[key]) for e in events], dtype=str)
+
+
+def event_columns(events):
+    """Events as NumPy columns: id, day, model_name, event_type, device, language, user_id"""
+    ua = np.array([e.get("user_agent") or "" for e in events], dtype=str)
+    ios = np.array([str(e.get("ios")).lower() == "true" for e in events], dtype=bool)
+    # Same device rules as the dashboard
+    ios |= (np.char.find(ua, "iPhone") >= 0) | (np.char.find(ua, "iPad") >= 0)
+    android = np.char.find(ua, "Android") >= 0
+
+    created = [e.get("created_at") for e in events]
+    return {
+        "id": np.array([e["id"] for e in events], dtype=np.int64),
+        # Dates in UTC, as stored; datetimes from a Postgres driver are converted first
+        "day": np.array([c.astimezone(timezone.utc).date().isoformat() if isinstance(c, datetime) else str(c)[:10]
+                         for c in created], dtype=str),
+        "model_name": _strings(events, "model_name"),
+        "event_type": _strings(events, "event_type"),
+        "device": np.where(ios, "ios", np.where(android, "android", "desktop")),
+        "language": _strings(events, "language"),
+        "user_id": _strings(events, "user_id"),
+    }
+
+
+def group_count(columns, keys, mask=None):
+    """Distinct key tuples of the (masked) rows and how many rows each has"""
+    codes, values = [], []
+    for key in keys:
+        column = columns[key] if mask is None else columns[key][mask]
+        unique, inverse = np.unique(column, return_inverse=True)
+        codes.append(inverse.reshape(-1))
+        values.append(unique)
+    if not len(codes[0]):
+        return []
+
+    # One int64 per row (mixed radix) sorts much faster than rows of codes
+    if np.prod([float(len(v)) for v in values]) < 2 ** 62:
+        combined = np.zeros(len(codes[0]), dtype=np.int64)
+        for code, unique in zip(codes, values):
+            combined = combined * len(unique) + code
+        _, first, counts = np.unique(combined, return_index=True, return_counts=True)
+        groups = [code[first] for code in codes]
+    else:
+        rows, counts = np.unique(np.column_stack(codes), axis=0, return_counts=True)
+        groups = list(rows.T)
+
+    columns_out = [unique[group].tolist() for unique, group in zip(values, groups)]
+    return [
+        dict(zip(keys, row), events=count)
+        for row, count in zip(zip(*columns_out), counts.tolist())
+    ]
+
+
+def fold_events(events):
+    """Aggregate rows (daily counts, daily users) for a batch of events"""
+    columns = event_columns(events)
+    daily = group_count(columns, DAILY_KEYS)
+    users = group_count(columns, USER_KEYS, mask=columns["user_id"] != "")
+    for row in users:
+        del row["events"]
+    return daily, users
+
+
+def run_rollup(store, batch_size=BATCH_SIZE, settle_seconds=SETTLE_SECONDS, max_batches=None):
+    """
+    Fold every settled event after the stored id into the aggregates.
+
+    Returns a report dict: events folded, batches, aggregate rows written,
+    first and last id, per-stage timings and whether a concurrent run took
+    over (conflict).
+    """
+    start = time.perf_counter()
+    timings = {"fetch": 0.0, "fold": 0.0, "apply": 0.0}
+    report = {"events": 0, "batches": 0, "daily_rows": 0, "user_rows": 0, "conflict": False, "timings": timings}
+    cutoff = utc_now() - timedelta(seconds=settle_seconds)
+
+    last_id = report["first_id"] = store.last_id()
+    while max_batches is None or report["batches"] < max_batches:
+        stage = time.perf_counter()
+        events = store.fetch(last_id, batch_size)
+        timings["fetch"] += time.perf_counter() - stage
+        full_batch = len(events) == batch_size
+
+        # Stop at the first unsettled event, so no lower id can commit behind us
+        for index, event in enumerate(events):
+            if _parse_time(event.get("created_at")) > cutoff:
+                events = events[:index]
+                full_batch = False
+                break
+        if not events:
+            break
+
+        stage = time.perf_counter()
+        daily, users = fold_events(events)
+        timings["fold"] += time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        new_id = int(events[-1]["id"])
+        applied = store.apply(last_id, new_id, daily, users)
+        timings["apply"] += time.perf_counter() - stage
+        if not applied:
+            report["conflict"] = True
+            break
+
+        last_id = new_id
+        report["events"] += len(events)
+        report["batches"] += 1
+        report["daily_rows"] += len(daily)
+        report["user_rows"] += len(users)
+        if not full_batch:
+            break
+
+    report["last_id"] = last_id
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    text = str(value).replace(" ", "T").replace("Z", "+00:00")
+    parsed = datetime.fromisoformat(text)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def print_report(report):
+    stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in report["timings"].items())
+    print(f"Rollup: {report['events']} events in {report['batches']} batches "
+          f"(id {report['first_id']} -> {report['last_id']}), "
+          f"{report['daily_rows']} daily rows, {report['user_rows']} user rows, {report['seconds']:.2f}s")
+    print(f"Rollup timings: {stages}")
+    if report["conflict"]:
+        print("Rollup: another run moved the cursor first, stopped")
+
+
+def seed_events(conn, count, days=30, models=20, users=2000, seed=0):
+    """Insert `count` synthetic viewer events into a SQLite stand-in"""
+    rng = np.random.default_rng(seed)
+    now = utc_now()
+    offsets = np.sort(rng.uniform(SETTLE_SECONDS * 2, days * 86400, count))[::-1]
+    rows = []
+    for offset in offsets:
+        created = (now - timedelta(seconds=float(offset))).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+        metadata = {"userAgent": SEED_AGENTS[rng.integers(len(SEED_AGENTS))],
+                    "language": ("pl", "en")[rng.integers(2)]}
+        rows.append((created, SEED_EVENTS[rng.integers(len(SEED_EVENTS))],
+                     f"user-{rng.integers(users)}", f"model-{rng.integers(models)}", json.dumps(metadata)))
+    conn.executemany(
+        "INSERT INTO analytics (created_at, event_type, user_id, model_name, metadata) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold raw analytics events into daily aggregates")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--sqlite", help="SQLite stand-in database (created if missing)")
+    target.add_argument("--supabase", action="store_true",
+                        help="Use NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY")
+    parser.add_argument("--seed", type=int, default=0, help="First insert this many synthetic events (SQLite only)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help=f"Events per batch (default: {BATCH_SIZE})")
+    parser.add_argument("--settle-seconds", type=float, default=SETTLE_SECONDS,
+                        help=f"Leave events younger than this for the next run (default: {SETTLE_SECONDS})")
+
+    args = parser.parse_args()
+
+    if args.supabase:
+        try:
+            from supabase import create_client
+        except ImportError:
+            print("Error: 'supabase' is required. Please install it: pip install supabase")
+            sys.exit(1)
+        url = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
+        key = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not key:
+            print("Error: NEXT_PUBLIC_SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY must be set")
+            sys.exit(1)
+        store = SupabaseRollupStore(create_client(url, key))
+    else:
+        store = SqlRollupStore(sqlite3.connect(args.sqlite))
+        if args.seed:
+            seed_events(store.conn, args.seed)
+            print(f"Inserted {args.seed} synthetic events into {args.sqlite}")
+
+    print_report(run_rollup(store, batch_size=args.batch_size, settle_seconds=args.settle_seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,9 @@ import os
 import tempfile
 import shutil
 import time
-from resize_and_convert import resize_glb, convert_glb_to_usdz_blender, BLENDER_PATH
+from resize_and_convert import resize_glb_variants, convert_glbs_to_usdz_blender, parse_dims, format_dims, unique_sizes
+from blender_probe import get_blender_info, can_convert_to_usdz
+from mesh_fitting import FIT_MODES
 
 # Set page configuration
 st.set_page_config(
@@ -18,12 +20,18 @@ st.markdown("""
 Upload a `.glb` model, specify the target dimensions, and this tool will resize it and generate a `.usdz` version for AR.
 """)
 
+# Blender discovery is probed once and cached, so reruns don't touch the filesystem
+blender_info = get_blender_info()
+blender_ready = can_convert_to_usdz(blender_info)
+
 # Sidebar for configuration
 with st.sidebar:
     st.header("Settings")
-    st.info(f"Blender Path: `{BLENDER_PATH}`")
-    if not os.path.exists(BLENDER_PATH):
-        st.error("⚠️ Blender not found at the specified path. USDZ conversion will fail.")
+    st.info(f"Blender Path: `{blender_info['path'] or 'not found'}`")
+    if blender_info["version_string"]:
+        st.caption(f"Blender {blender_info['version_string']}")
+    if not blender_ready:
+        st.error(f"⚠️ {blender_info['error'] or 'Blender has no USDZ exporter'}. USDZ conversion will fail.")
     else:
         st.success("✅ Blender found.")
 
@@ -35,7 +43,7 @@ if uploaded_file is not None:
     if "last_uploaded_file" not in st.session_state or st.session_state.last_uploaded_file != uploaded_file.name:
         st.session_state.last_uploaded_file = uploaded_file.name
         # Clear previous results
-        for key in ["processed_glb", "processed_usdz", "processed_glb_name", "processed_usdz_name", "processing_done"]:
+        for key in ["processed_variants", "processing_done"]:
             if key in st.session_state:
                 del st.session_state[key]
 
@@ -53,8 +61,34 @@ if uploaded_file is not None:
     with col3:
         depth = st.number_input("Depth (cm)", min_value=1.0, value=100.0, step=1.0)
 
+    # More sizes of the same piece reuse the loaded model and one Blender session
+    extra_sizes = st.text_area(
+        "Additional sizes (optional, one width,height,depth per line)",
+        placeholder="85,75,85\n120,75,85",
+    )
+
+    cleanup = st.checkbox("Clean up geometry (merge vertices, remove floaters, ground on floor)", value=True)
+
+    mode_labels = {
+        "exact": "Exact (stretch each axis to match)",
+        "fit": "Uniform, fit inside all dimensions",
+        "width": "Uniform, match width",
+        "height": "Uniform, match height",
+        "depth": "Uniform, match depth",
+    }
+    scale_mode = st.selectbox("Scaling mode", FIT_MODES, format_func=mode_labels.get)
+    obb = st.checkbox("Straighten rotated models (oriented bounding box)", value=False)
+
     # Process button
     if st.button("Resize & Convert", type="primary"):
+        try:
+            sizes = [[width, height, depth]] + [parse_dims(line) for line in extra_sizes.splitlines() if line.strip()]
+        except ValueError as e:
+            st.error(f"❌ Invalid size '{e}', use width,height,depth in cm")
+            st.stop()
+        # A size entered twice would clash on its file names and download buttons
+        sizes = unique_sizes(sizes)
+
         # Create a temporary directory for processing
         with tempfile.TemporaryDirectory() as temp_dir:
             # Save uploaded file
@@ -62,13 +96,15 @@ if uploaded_file is not None:
             with open(input_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
             
-            # Define output paths
+            # Define output paths (a single size keeps the original names)
             base_name = os.path.splitext(uploaded_file.name)[0]
-            resized_glb_name = f"{base_name}_resized.glb"
-            usdz_name = f"{base_name}_resized.usdz"
+            if len(sizes) == 1:
+                names = [f"{base_name}_resized"]
+            else:
+                names = [f"{base_name}_{format_dims(dims)}" for dims in sizes]
             
-            resized_glb_path = os.path.join(temp_dir, resized_glb_name)
-            usdz_path = os.path.join(temp_dir, usdz_name)
+            resized_glb_paths = [os.path.join(temp_dir, f"{name}.glb") for name in names]
+            usdz_paths = [os.path.join(temp_dir, f"{name}.usdz") for name in names]
             
             # Progress tracking
             progress_bar = st.progress(0)
@@ -77,11 +113,11 @@ if uploaded_file is not None:
             # Step 1: Resize
             status_text.text("Step 1/2: Resizing GLB model...")
             try:
-                dims = [width, height, depth]
                 # Redirect stdout to capture print statements (optional, simplified here)
-                resize_glb(input_path, dims, resized_glb_path)
+                resize_glb_variants(input_path, list(zip(sizes, resized_glb_paths)),
+                                    cleanup=cleanup, mode=scale_mode, obb=obb)
                 progress_bar.progress(50)
-                st.success(f"✅ Resized to {width}x{height}x{depth} cm")
+                st.success(f"✅ Resized to {', '.join(format_dims(dims) for dims in sizes)} cm")
             except Exception as e:
                 st.error(f"❌ Error resizing model: {e}")
                 st.stop()
@@ -89,11 +125,11 @@ if uploaded_file is not None:
             # Step 2: Convert
             status_text.text("Step 2/2: Converting to USDZ (this may take a moment)...")
             
-            # Check for Blender again before attempting
-            if os.path.exists(BLENDER_PATH):
+            # Skip straight past conversion if the probe says it can't work
+            if blender_ready:
                 try:
-                    success = convert_glb_to_usdz_blender(resized_glb_path, usdz_path)
-                    if success:
+                    results = convert_glbs_to_usdz_blender(list(zip(resized_glb_paths, usdz_paths)))
+                    if all(results):
                         progress_bar.progress(100)
                         status_text.text("Processing complete!")
                         st.success("✅ Converted to USDZ")
@@ -107,16 +143,21 @@ if uploaded_file is not None:
                 progress_bar.progress(100)
 
             # Save results to session state
-            if os.path.exists(resized_glb_path):
-                with open(resized_glb_path, "rb") as f:
-                    st.session_state.processed_glb = f.read()
-                    st.session_state.processed_glb_name = resized_glb_name
-            
-            if os.path.exists(usdz_path):
-                with open(usdz_path, "rb") as f:
-                    st.session_state.processed_usdz = f.read()
-                    st.session_state.processed_usdz_name = usdz_name
+            variants = []
+            for dims, name, resized_glb_path, usdz_path in zip(sizes, names, resized_glb_paths, usdz_paths):
+                variant = {"label": format_dims(dims)}
+                if os.path.exists(resized_glb_path):
+                    with open(resized_glb_path, "rb") as f:
+                        variant["glb"] = f.read()
+                        variant["glb_name"] = f"{name}.glb"
+                
+                if os.path.exists(usdz_path):
+                    with open(usdz_path, "rb") as f:
+                        variant["usdz"] = f.read()
+                        variant["usdz_name"] = f"{name}.usdz"
+                variants.append(variant)
             
+            st.session_state.processed_variants = variants
             st.session_state.processing_done = True
 
     # Show results and download buttons (from session state)
@@ -124,26 +165,33 @@ if uploaded_file is not None:
         st.divider()
         st.subheader("🎉 Results")
         
-        col_res1, col_res2 = st.columns(2)
-        
-        # GLB Download
-        if "processed_glb" in st.session_state:
-            col_res1.download_button(
-                label="Download Resized GLB",
-                data=st.session_state.processed_glb,
-                file_name=st.session_state.processed_glb_name,
-                mime="model/gltf-binary"
-            )
-        
-        # USDZ Download
-        if "processed_usdz" in st.session_state:
-            col_res2.download_button(
-                label="Download USDZ",
-                data=st.session_state.processed_usdz,
-                file_name=st.session_state.processed_usdz_name,
-                mime="model/vnd.usdz+zip"
-            )
-        elif not os.path.exists(BLENDER_PATH):
-             col_res2.info("USDZ not generated (Blender missing)")
-        else:
-             col_res2.error("USDZ generation failed")
+        variants = st.session_state.processed_variants
+        for variant in variants:
+            if len(variants) > 1:
+                st.markdown(f"**{variant['label']} cm**")
+            
+            col_res1, col_res2 = st.columns(2)
+            
+            # GLB Download
+            if "glb" in variant:
+                col_res1.download_button(
+                    label="Download Resized GLB",
+                    data=variant["glb"],
+                    file_name=variant["glb_name"],
+                    mime="model/gltf-binary",
+                    key=f"glb_{variant['label']}"
+                )
+            
+            # USDZ Download
+            if "usdz" in variant:
+                col_res2.download_button(
+                    label="Download USDZ",
+                    data=variant["usdz"],
+                    file_name=variant["usdz_name"],
+                    mime="model/vnd.usdz+zip",
+                    key=f"usdz_{variant['label']}"
+                )
+            elif not blender_ready:
+                 col_res2.info("USDZ not generated (Blender missing)")
+            else:
+                 col_res2.error("USDZ generation failed")
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Asset Store
+Stores the textures and vertex data of GLB models once, however many
+models and size variants use them. Catalog products share fabrics and
+size variants share their index and UV buffers, so a shop publishing
+self-contained GLBs uploads the same bytes over and over.
+
+split_glb turns a GLB into a small .gltf plus blobs named by their
+SHA-256: one per texture and one per large buffer view (indices, UVs,
+positions, ...), with the small views packed into one blob. The .gltf
+references them by relative URI, so model-viewer loads it like a GLB and
+the CDN caches every blob forever. pack_glb rebuilds a self-contained GLB
+from a .gltf and its blobs, for the USDZ conversion and anything else that
+needs a single file.
+
+Stores: StorageBlobStore (a Supabase Storage bucket) for publishing,
+LocalBlobStore (a directory) for local runs and reports.
+
+Usage:
+    python3 asset_store.py report assets
+    python3 asset_store.py report --sample
+    python3 asset_store.py split model.glb out_dir
+    python3 asset_store.py pack out_dir/model.gltf model_packed.glb
+"""
+
+import os
+import sys
+import copy
+import json
+import hashlib
+import argparse
+import posixpath
+import tempfile
+
+from glb_io import read_glb, write_glb
+
+BLOB_PREFIX = "blobs/"
+
+# Buffer views smaller than this share one blob per model instead of a request each
+MIN_BLOB_BYTES = 16 * 1024
+
+IMAGE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp", "image/ktx2": "ktx2"}
+CONTENT_TYPES = {"bin": "application/octet-stream", "gltf": "model/gltf+json",
+                 **{ext: mime for mime, ext in IMAGE_EXTENSIONS.items()}}
+
+# Extensions that reference buffer views of their own, which split_glb doesn't renumber
+BUFFER_VIEW_EXTENSIONS = {"KHR_draco_mesh_compression", "EXT_meshopt_compression", "KHR_meshopt_compression"}
+
+# Blobs never change under their name
+BLOB_CACHE_CONTROL = "31536000"
+
+
+def blob_key(data, extension):
+    return f"{hashlib.sha256(data).hexdigest()}.{extension}"
+
+
+class LocalBlobStore:
+    """Blobs and .gltf files in a local directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def exists(self, path):
+        return os.path.exists(os.path.join(self.root, path))
+
+    def read(self, path):
+        with open(os.path.join(self.root, path), "rb") as f:
+            return f.read()
+
+    def write(self, path, data, content_type=None):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path) or ".", exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated blob under a valid hash
+        with open(full_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(full_path + ".tmp", full_path)
+
+
+class StorageBlobStore:
+    """Blobs and .gltf files in a Supabase Storage bucket"""
+
+    def __init__(self, supabase, bucket="models"):
+        self.bucket = supabase.storage.from_(bucket)
+
+    def exists(self, path):
+        try:
+            return bool(self.bucket.exists(path))
+        except Exception:
+            return False
+
+    def read(self, path):
+        return self.bucket.download(path)
+
+    def write(self, path, data, content_type=None):
+        options = {"content-type": content_type or "application/octet-stream", "upsert": "true"}
+        if path.startswith(BLOB_PREFIX):
+            options["cache-control"] = BLOB_CACHE_CONTROL
+        self.bucket.upload(path, data, options)
+
+    def public_url(self, path):
+        return self.bucket.get_public_url(path)
+
+
+def _renumber_views(gltf, mapping):
+    """Point every bufferView reference at its new index"""
+    for accessor in gltf.get("accessors", []):
+        if "bufferView" in accessor:
+            accessor["bufferView"] = mapping[accessor["bufferView"]]
+        sparse = accessor.get("sparse")
+        if sparse:
+            for part in ("indices", "values"):
+                sparse[part]["bufferView"] = mapping[sparse[part]["bufferView"]]
+    for image in gltf.get("images", []):
+        if "bufferView" in image:
+            image["bufferView"] = mapping[image["bufferView"]]
+
+
+def split_glb(data, blob_uri=BLOB_PREFIX, min_blob_bytes=MIN_BLOB_BYTES):
+    """
+    Split GLB bytes into (.gltf bytes, {blob key: bytes}).
+
+    Blob URIs in the .gltf are blob_uri + key. Returns None for GLBs that
+    can't be split safely: extensions that reference buffer views of their
+    own (Draco, meshopt; also when only listed as used, with a fallback),
+    required extensions, or data outside the binary chunk.
+    """
+    gltf, binary = read_glb(data)
+    gltf = copy.deepcopy(gltf)
+    if (gltf.get("extensionsRequired") or BUFFER_VIEW_EXTENSIONS & set(gltf.get("extensionsUsed", []))
+            or any("uri" in b for b in gltf.get("buffers", []))):
+        return None
+
+    views = gltf.get("bufferViews", [])
+    images = gltf.get("images", [])
+    image_views = {image["bufferView"]: image for image in images if "bufferView" in image}
+
+    blobs = {}
+    buffers, buffer_index = [], {}
+    small, small_views = bytearray(), []
+    new_views, mapping = [], {}
+
+    for index, view in enumerate(views):
+        start = view.get("byteOffset", 0)
+        chunk = bytes(binary[start:start + view["byteLength"]])
+
+        image = image_views.get(index)
+        if image is not None:
+            key = blob_key(chunk, IMAGE_EXTENSIONS.get(image.get("mimeType"), "bin"))
+            blobs[key] = chunk
+            image.pop("bufferView")
+            image["uri"] = blob_uri + key
+            continue
+
+        view = dict(view)
+        mapping[index] = len(new_views)
+        new_views.append(view)
+        if len(chunk) >= min_blob_bytes:
+            key = blob_key(chunk, "bin")
+            if key not in buffer_index:
+                buffer_index[key] = len(buffers)
+                buffers.append({"uri": blob_uri + key, "byteLength": len(chunk)})
+                blobs[key] = chunk
+            view["buffer"] = buffer_index[key]
+            view["byteOffset"] = 0
+        else:
+            # Accessors need their data aligned to the component size (at most 4 bytes)
+            small.extend(b"\0" * (-len(small) % 4))
+            view["byteOffset"] = len(small)
+            small.extend(chunk)
+            small_views.append(view)
+
+    if small_views:
+        key = blob_key(bytes(small), "bin")
+        blobs[key] = bytes(small)
+        for view in small_views:
+            view["buffer"] = len(buffers)
+        buffers.append({"uri": blob_uri + key, "byteLength": len(small)})
+
+    _renumber_views(gltf, mapping)
+    gltf["bufferViews"] = new_views
+    if buffers:
+        gltf["buffers"] = buffers
+    else:
+        gltf.pop("buffers", None)
+    return json.dumps(gltf, separators=(",", ":")).encode(), blobs
+
+
+def pack_glb(gltf_bytes, read):
+    """
+    Self-contained GLB bytes from .gltf bytes; read(uri) returns the bytes a
+    buffer or image URI points to.
+    """
+    gltf = json.loads(gltf_bytes)
+    binary = bytearray()
+    offsets = []
+    for buffer in gltf.get("buffers", []):
+        binary.extend(b"\0" * (-len(binary) % 4))
+        offsets.append(len(binary))
+        binary.extend(read(buffer["uri"])[:buffer["byteLength"]])
+
+    for view in gltf.get("bufferViews", []):
+        view["byteOffset"] = view.get("byteOffset", 0) + offsets[view.get("buffer", 0)]
+        view["buffer"] = 0
+
+    # Textures go back into the binary chunk as buffer views
+    for image in gltf.get("images", []):
+        uri = image.pop("uri", None)
+        if uri is None:
+            continue
+        extension = uri.rsplit(".", 1)[-1].lower()
+        image.setdefault("mimeType", CONTENT_TYPES.get(extension, "image/png"))
+        binary.extend(b"\0" * (-len(binary) % 4))
+        data = read(uri)
+        image["bufferView"] = len(gltf.setdefault("bufferViews", []))
+        gltf["bufferViews"].append({"buffer": 0, "byteOffset": len(binary), "byteLength": len(data)})
+        binary.extend(data)
+
+    if binary:
+        gltf["buffers"] = [{"byteLength": len(binary) + (-len(binary) % 4)}]
+    return write_glb(gltf, binary)
+
+
+def publish_model(store, data, gltf_path, blob_root=BLOB_PREFIX):
+    """
+    Store a GLB as gltf_path plus content-addressed blobs under blob_root,
+    writing only blobs the store doesn't have yet.
+
+    Returns a report dict (bytes of the GLB, the .gltf and the blobs, and
+    how many blob bytes were actually written), or None when the GLB can't
+    be split; the caller should then store it whole.
+    """
+    blob_uri = posixpath.relpath(blob_root, posixpath.dirname(gltf_path) or ".") + "/"
+    split = split_glb(data, blob_uri=blob_uri)
+    if split is None:
+        return None
+    gltf_bytes, blobs = split
+
+    report = {"glb_bytes": len(data), "gltf_bytes": len(gltf_bytes), "blobs": len(blobs),
+              "blob_bytes": sum(len(b) for b in blobs.values()), "uploaded_blobs": 0, "uploaded_bytes": 0}
+    for key, blob in blobs.items():
+        path = posixpath.join(blob_root, key)
+        if store.exists(path):
+            continue
+        store.write(path, blob, CONTENT_TYPES[key.rsplit(".", 1)[-1]])
+        report["uploaded_blobs"] += 1
+        report["uploaded_bytes"] += len(blob)
+    store.write(gltf_path, gltf_bytes, CONTENT_TYPES["gltf"])
+    return report
+
+
+def load_packed(store, gltf_path):
+    """Self-contained GLB bytes for a .gltf stored with publish_model"""
+    base = posixpath.dirname(gltf_path)
+    read = lambda uri: store.read(posixpath.normpath(posixpath.join(base, uri)))
+    return pack_glb(store.read(gltf_path), read)
+
+
+def catalog_report(paths, store=None):
+    """
+    Bytes needed to store GLB files whole vs. as .gltf files plus unique blobs.
+
+    Publishes into `store` (a temporary LocalBlobStore by default), so the
+    numbers include blobs that earlier models already stored.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        store = store or LocalBlobStore(tmp)
+        report = {"models": 0, "whole": 0, "gltf_bytes": 0, "blob_bytes": 0, "uploaded_bytes": 0, "unsplit": 0}
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            name = os.path.splitext(os.path.basename(path))[0]
+            result = publish_model(store, data, f"gltf/{name}.gltf")
+            report["models"] += 1
+            report["whole"] += len(data)
+            if result is None:
+                report["unsplit"] += len(data)
+                report["uploaded_bytes"] += len(data)
+                continue
+            report["gltf_bytes"] += result["gltf_bytes"]
+            report["blob_bytes"] += result["blob_bytes"]
+            report["uploaded_bytes"] += result["gltf_bytes"] + result["uploaded_bytes"]
+    report["saved_bytes"] = report["whole"] - report["uploaded_bytes"]
+    return report
+
+
+def print_report(report):
+    mb = 1024 * 1024
+    saved = report["saved_bytes"] / report["whole"] if report["whole"] else 0.0
+    print(f"Catalog: {report['models']} models, {report['whole'] / mb:.2f} MB as self-contained GLBs")
+    print(f"Deduplicated: {report['uploaded_bytes'] / mb:.2f} MB "
+          f"({report['gltf_bytes'] / 1024:.1f} KB of .gltf, "
+          f"{(report['uploaded_bytes'] - report['gltf_bytes']) / mb:.2f} MB of unique blobs)")
+    print(f"Saved: {report['saved_bytes'] / mb:.2f} MB ({saved:.1%})")
+    if report["unsplit"]:
+        print(f"Stored whole (Draco/meshopt or external data): {report['unsplit'] / mb:.2f} MB")
+
+
+def make_sample_catalog(directory):
+    """
+    A small synthetic catalog: four products in three sizes each, the
+    upholstered ones sharing the sofa-dl-welur fabric.
+    """
+    import io
+    import contextlib
+    from PIL import Image
+    from synthetic_meshes import make_furniture, fabric_texture
+    from resize_and_convert import resize_glb_variants
+
+    fabric_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "sofa-dl-welur.jpg")
+    fabric = Image.open(fabric_path).convert("RGB") if os.path.exists(fabric_path) else fabric_texture(1024)
+    fabric.thumbnail((1024, 1024))
+    wood = fabric_texture(512, seed=7, color=(150, 110, 70))
+
+    products = {
+        "narożnik": ("sofa", fabric, [(220, 85, 95), (260, 85, 160), (300, 85, 200)]),
+        "fotel": ("chair", fabric, [(70, 90, 75), (80, 95, 80), (90, 100, 85)]),
+        "stół": ("table", wood, [(120, 75, 80), (160, 75, 90), (200, 75, 100)]),
+        "regał": ("shelf", wood, [(60, 180, 35), (80, 180, 35), (100, 200, 40)]),
+    }
+    paths = []
+    for name, (kind, texture, sizes) in products.items():
+        scene = make_furniture(kind, faces=20000)
+        for geometry in scene.geometry.values():
+            geometry.visual.material.baseColorTexture = texture
+        source = os.path.join(directory, f"{name}_source.glb")
+        scene.export(source)
+        variants = [(dims, os.path.join(directory, f"{name}_{'x'.join(map(str, dims))}.glb")) for dims in sizes]
+        with contextlib.redirect_stdout(io.StringIO()):
+            resize_glb_variants(source, variants)
+        os.remove(source)
+        paths.extend(path for _, path in variants)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed storage for GLB textures and buffers")
+    subparsers = parser.add_subparsers(dest="command")
+
+    report_parser = subparsers.add_parser("report", help="Bytes saved by deduplicating a directory of GLBs")
+    report_parser.add_argument("directory", nargs="?", help="Directory with .glb files")
+    report_parser.add_argument("--sample", action="store_true", help="Build and measure a synthetic sample catalog")
+
+    split_parser = subparsers.add_parser("split", help="Write a GLB as .gltf plus content-addressed blobs")
+    split_parser.add_argument("input", help="Input GLB")
+    split_parser.add_argument("output_dir", help="Store directory (gltf/<name>.gltf, blobs/<sha256>.<ext>)")
+
+    pack_parser = subparsers.add_parser("pack", help="Rebuild a self-contained GLB from a .gltf and its blobs")
+    pack_parser.add_argument("input", help="Input .gltf")
+    pack_parser.add_argument("output", help="Output GLB")
+
+    args = parser.parse_args()
+
+    if args.command == "report":
+        if args.sample:
+            with tempfile.TemporaryDirectory() as tmp:
+                print("Building sample catalog...")
+                paths = make_sample_catalog(tmp)
+                print_report(catalog_report(paths))
+            return
+        if not args.directory or not os.path.isdir(args.directory):
+            print("Error: give a directory of GLB files, or --sample")
+            sys.exit(1)
+        paths = sorted(os.path.join(args.directory, f) for f in os.listdir(args.directory) if f.lower().endswith(".glb"))
+        if not paths:
+            print(f"No .glb files found in {args.directory}")
+            sys.exit(1)
+        print_report(catalog_report(paths))
+    elif args.command == "split":
+        with open(args.input, "rb") as f:
+            data = f.read()
+        name = os.path.splitext(os.path.basename(args.input))[0]
+        result = publish_model(LocalBlobStore(args.output_dir), data, f"gltf/{name}.gltf")
+        if result is None:
+            print("Error: this GLB can't be split (Draco/meshopt compression or external data)")
+            sys.exit(1)
+        print(f"Saved {args.output_dir}/gltf/{name}.gltf with {result['blobs']} blobs "
+              f"({result['uploaded_blobs']} new, {result['uploaded_bytes'] / 1024:.1f} KB)")
+    elif args.command == "pack":
+        store = LocalBlobStore(os.path.dirname(os.path.abspath(args.input)))
+        with open(args.output, "wb") as f:
+            f.write(load_packed(store, os.path.basename(args.input)))
+        print(f"Saved self-contained GLB to: {args.output}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
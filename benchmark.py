@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+Times the model-processing hot paths on synthetic furniture meshes and
+compares the results against a stored baseline.
+
+Cases:
+    resize_glb in exact, fit and OBB-aligned modes, four size variants from
+    one load, scale_glb_model,
+    mesh cleanup, GPU mesh optimization, draw-call merging of multi-part
+    scenes, USDZ packaging, native USDZ rescale (needs usd-core),
+    Blender USDZ conversion (needs Blender), input photo preprocessing and
+    stitch_images.
+
+Each case records the median wall time over --repeats runs and the peak
+Python/NumPy memory (tracemalloc, measured in a separate run). Memory used
+inside subprocesses such as Blender is not included.
+
+Timings only compare on the same machine, so the baseline is not committed
+and CI does not run this: keep benchmark_baseline.json next to the repo on
+the machine you benchmark on (it is gitignored), save it from the commit
+you want to compare against, then re-run on your branch.
+
+Usage:
+    python3 benchmark.py                          # run, write benchmark_results.json
+    python3 benchmark.py --save-baseline          # also store as the baseline
+    python3 benchmark.py --baseline benchmark_baseline.json --tolerance 0.25
+    python3 benchmark.py --sizes 1000,100000,1000000 --filter resize
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone
+
+import numpy as np
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_RESULTS = "benchmark_results.json"
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Differences below these are noise, never regressions
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+
+
+def _quiet(func, *args, **kwargs):
+    """Run func with its progress output suppressed"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def measure(func, repeats):
+    """Median seconds over `repeats` runs, plus peak traced memory (MB) of one extra run"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _quiet(func)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        _quiet(func)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return float(np.median(times)), peak / (1024 * 1024)
+
+
+def build_cases(work_dir, sizes):
+    """
+    Return a list of (name, params, func) benchmark cases.
+
+    Inputs are generated here, outside the timed region.
+    """
+    from synthetic_meshes import write_furniture_glb
+    from resize_and_convert import resize_glb, resize_glb_variants
+    from scale_model import scale_glb_model
+    from mesh_cleanup import cleanup_model
+    from mesh_optimize import optimize_model
+    from mesh_merge import merge_model
+
+    import trimesh
+
+    cases = []
+    out = lambda name: os.path.join(work_dir, name)
+
+    for faces in sizes:
+        for textured in (True, False):
+            tag = f"{faces}f_{'tex' if textured else 'flat'}"
+            glb = write_furniture_glb(out(f"sofa_{tag}.glb"), kind="sofa", faces=faces, textured=textured, yaw=25.0)
+            params = {"faces": faces, "textured": textured}
+
+            cases.append((f"resize_glb[exact,{tag}]", params,
+                          lambda glb=glb: resize_glb(glb, (220, 90, 95), out("r_exact.glb"))))
+            cases.append((f"resize_glb[fit,{tag}]", params,
+                          lambda glb=glb: resize_glb(glb, (220, 90, 95), out("r_fit.glb"), mode="fit")))
+            cases.append((f"resize_glb[obb,{tag}]", params,
+                          lambda glb=glb: resize_glb(glb, (220, 90, 95), out("r_obb.glb"), obb=True)))
+            sizes = [(85, 75, 85), (120, 75, 85), (160, 75, 90), (200, 75, 100)]
+            cases.append((f"resize_glb_variants[x4,{tag}]", params,
+                          lambda glb=glb: resize_glb_variants(glb, [(d, out(f"v{i}.glb")) for i, d in enumerate(sizes)])))
+            cases.append((f"scale_glb_model[{tag}]", params,
+                          lambda glb=glb: scale_glb_model(glb, 220, 90, 95, out("s.glb"))))
+
+        noisy = write_furniture_glb(out(f"noisy_{faces}.glb"), kind="sofa", faces=faces, floaters=20)
+        cases.append((f"cleanup_model[{faces}f]", {"faces": faces},
+                      lambda noisy=noisy: cleanup_model(trimesh.load(noisy, force='mesh'))))
+        cases.append((f"optimize_model[{faces}f]", {"faces": faces},
+                      lambda noisy=noisy: optimize_model(trimesh.load(noisy, force='mesh'), metrics=False)))
+
+        # Catalog-style scenes: a material and texture per part
+        for parts in (8, 64):
+            multi = write_furniture_glb(out(f"parts_{faces}_{parts}.glb"), kind="sofa", faces=faces,
+                                        part_textures=True, floaters=parts - 8, texture_size=256)
+            cases.append((f"merge_model[{faces}f,{parts}parts]", {"faces": faces, "parts": parts},
+                          lambda multi=multi: merge_model(trimesh.load(multi))))
+
+    cases.extend(_usdz_cases(work_dir, out))
+    cases.extend(_image_cases())
+    cases.extend(_stitch_cases(work_dir, out))
+    return cases
+
+
+def _usdz_cases(work_dir, out):
+    from synthetic_meshes import write_furniture_glb, fabric_texture
+    from usdz_packager import package_usdz
+
+    cases = []
+
+    # Packaging: a 16 MB layer plus four 2k textures
+    layer_dir = os.path.join(work_dir, "usd")
+    os.makedirs(os.path.join(layer_dir, "textures"), exist_ok=True)
+    layer = os.path.join(layer_dir, "model.usdc")
+    with open(layer, "wb") as f:
+        f.write(os.urandom(16 * 1024 * 1024))
+    textures = [os.path.join(layer_dir, "textures", f"fabric_{i}.png") for i in range(4)]
+    for i, path in enumerate(textures):
+        fabric_texture(2048, seed=i).save(path)
+    # The layer is random bytes, so name its textures rather than reading its references
+    cases.append(("package_usdz[16MB+4x2k]", {}, lambda: package_usdz(layer, out("packed.usdz"), textures)))
+
+    try:
+        from pxr import Usd  # noqa: F401
+        from usdz_reader import rescale_usdz
+        usdz = _make_usd_model(work_dir)
+        cases.append(("rescale_usdz[native]", {}, lambda: rescale_usdz(usdz, (220, 90, 95), out("rescaled.usdz"))))
+    except ImportError:
+        print("Skipping rescale_usdz: usd-core not installed")
+
+    from blender_probe import get_blender_info, can_convert_to_usdz
+    from resize_and_convert import convert_glb_to_usdz_blender
+    if can_convert_to_usdz(get_blender_info()):
+        glb = write_furniture_glb(out("convert.glb"), kind="sofa", faces=20000)
+        cases.append(("convert_glb_to_usdz_blender[20000f]", {"faces": 20000},
+                      lambda: convert_glb_to_usdz_blender(glb, out("convert.usdz"))))
+    else:
+        print("Skipping Blender USDZ conversion: Blender not available")
+
+    return cases
+
+
+def _make_usd_model(work_dir):
+    """A 1M-point USD mesh packaged as USDZ, for the native rescale case"""
+    from pxr import Usd, UsdGeom, Gf, Vt
+    from usdz_packager import package_usdz
+
+    layer = os.path.join(work_dir, "rescale_src.usdc")
+    stage = Usd.Stage.CreateNew(layer)
+    UsdGeom.SetStageMetersPerUnit(stage, 1.0)
+    root = UsdGeom.Xform.Define(stage, "/root")
+    stage.SetDefaultPrim(root.GetPrim())
+    mesh = UsdGeom.Mesh.Define(stage, "/root/mesh")
+    points = np.random.default_rng(0).random((1000000, 3), dtype=np.float32) * np.float32([2.2, 0.9, 0.95])
+    mesh.CreatePointsAttr(Vt.Vec3fArray.FromNumpy(points))
+    mesh.CreateExtentAttr([Gf.Vec3f(*map(float, points.min(0))), Gf.Vec3f(*map(float, points.max(0)))])
+    stage.Save()
+
+    usdz = os.path.join(work_dir, "rescale_src.usdz")
+    package_usdz(layer, usdz, asset_paths=[])
+    return usdz
+
+
+def _image_cases():
+    from synthetic_meshes import phone_photo
+    from image_preprocess import preprocess_image
+
+    photo = phone_photo(4032, 3024)
+    busy = phone_photo(4032, 3024, busy=True)
+    return [
+        ("preprocess_image[12MP]", {}, lambda: preprocess_image(photo)),
+        ("preprocess_image[12MP,busy]", {}, lambda: preprocess_image(busy)),
+    ]
+
+
+def _stitch_cases(work_dir, out):
+    from synthetic_meshes import fabric_texture
+    from stitch_images import stitch_images
+
+    image_dir = os.path.join(work_dir, "posters")
+    os.makedirs(image_dir, exist_ok=True)
+    for i in range(6):
+        fabric_texture(1500, seed=i).save(os.path.join(image_dir, f"poster_{i}.png"))
+    return [("stitch_images[6x1500px]", {}, lambda: stitch_images(image_dir, out("stitched.png"), 20))]
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression messages for cases slower/larger than baseline * (1 + tolerance)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+
+        limit = previous["seconds"] * (1 + tolerance)
+        if current["seconds"] > limit and current["seconds"] - previous["seconds"] > MIN_TIME_DELTA:
+            regressions.append(f"{name}: time {previous['seconds']:.4f}s -> {current['seconds']:.4f}s")
+
+        limit = previous["peak_mb"] * (1 + tolerance)
+        if current["peak_mb"] > limit and current["peak_mb"] - previous["peak_mb"] > MIN_MEMORY_DELTA_MB:
+            regressions.append(f"{name}: peak memory {previous['peak_mb']:.1f}MB -> {current['peak_mb']:.1f}MB")
+    return regressions
+
+
+def _environment():
+    import trimesh
+
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "trimesh": trimesh.__version__,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model processing hot paths")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated face counts (default: 1000,10000,100000; up to 1000000)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per case (default: 3)")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help=f"Results JSON (default: {DEFAULT_RESULTS})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help=f"Baseline JSON (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown/growth vs. baseline before failing (default: 0.25 = 25%%)")
+
+    args = parser.parse_args()
+
+    try:
+        sizes = [int(s) for s in args.sizes.split(",")]
+    except ValueError:
+        print("Error: --sizes must be comma-separated integers")
+        sys.exit(1)
+
+    work_dir = tempfile.mkdtemp(prefix="furniture-bench-")
+    try:
+        print("Generating synthetic inputs...")
+        cases = build_cases(work_dir, sizes)
+        if args.filter:
+            cases = [c for c in cases if args.filter in c[0]]
+
+        results = {}
+        print(f"\n{'case':<42} {'median s':>10} {'peak MB':>10}")
+        for name, params, func in cases:
+            seconds, peak_mb = measure(func, args.repeats)
+            results[name] = {"seconds": seconds, "peak_mb": peak_mb, "params": params}
+            print(f"{name:<42} {seconds:>10.4f} {peak_mb:>10.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"environment": _environment(), "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one.")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) vs. baseline (tolerance {args.tolerance:.0%}):")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print(f"\n✓ No regressions vs. baseline (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
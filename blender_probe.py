@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Blender Discovery & Capability Probe
+Finds a Blender executable and records what it can do (version, glTF import,
+USD/USDZ export), caching the result on disk so callers don't relaunch Blender
+just to find out a conversion cannot work.
+
+Usage:
+    python3 blender_probe.py            # print cached info (probes once if needed)
+    python3 blender_probe.py --refresh  # force a new probe
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import subprocess
+
+# Checked in order after the BLENDER_PATH env var and the PATH lookup
+KNOWN_LOCATIONS = [
+    "/Applications/Blender.app/Contents/MacOS/Blender",
+    "/usr/local/blender/blender",
+    "/usr/bin/blender",
+    "/usr/local/bin/blender",
+    "/snap/bin/blender",
+    "/opt/blender/blender",
+    r"C:\Program Files\Blender Foundation\Blender\blender.exe",
+]
+
+CACHE_PATH = os.environ.get(
+    "BLENDER_PROBE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "furniture-ar", "blender_probe.json"),
+)
+
+PROBE_TIMEOUT = 120
+
+# Blender 3.5 added native .usdz output to wm.usd_export
+USDZ_MIN_VERSION = (3, 5, 0)
+
+PROBE_MARKER = "BLENDER_PROBE_RESULT "
+
+PROBE_SCRIPT = f"""
+import bpy
+import json
+
+caps = {{
+    "version": list(bpy.app.version),
+    "version_string": bpy.app.version_string,
+    "gltf_import": "gltf" in dir(bpy.ops.import_scene),
+    "usd_export": "usd_export" in dir(bpy.ops.wm),
+}}
+print("{PROBE_MARKER}" + json.dumps(caps))
+"""
+
+# In-process memo so repeated calls (e.g. Streamlit reruns) don't even stat the cache
+_INFO_CACHE = {}
+
+
+def find_blender(path=None):
+    """
+    Locate a Blender executable.
+
+    Order: explicit path, BLENDER_PATH env var, `blender` on PATH, KNOWN_LOCATIONS.
+    Returns the path or None.
+    """
+    candidates = [path, os.environ.get("BLENDER_PATH"), shutil.which("blender")]
+    candidates.extend(KNOWN_LOCATIONS)
+
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
+def _cache_key(path):
+    """Identify a Blender binary so an upgrade in place invalidates the cache"""
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return f"{real_path}:{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    try:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        tmp_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: Could not write Blender probe cache: {e}")
+
+
+def probe_blender(path):
+    """
+    Launch Blender once in the background and report its capabilities.
+    """
+    print(f"Probing Blender at {path} (one-time, result is cached)...")
+    info = {
+        "path": path,
+        "version": None,
+        "version_string": None,
+        "gltf_import": False,
+        "usd_export": False,
+        "usdz_export": False,
+        "error": None,
+    }
+
+    cmd = [path, "--background", "--factory-startup", "--python-expr", PROBE_SCRIPT]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        info["error"] = f"Probe failed to run: {e}"
+        return info
+
+    for line in result.stdout.splitlines():
+        if line.startswith(PROBE_MARKER):
+            caps = json.loads(line[len(PROBE_MARKER):])
+            info.update(caps)
+            break
+    else:
+        info["error"] = f"Probe produced no result (exit code {result.returncode})"
+        return info
+
+    info["usdz_export"] = info["usd_export"] and tuple(info["version"]) >= USDZ_MIN_VERSION
+    return info
+
+
+def get_blender_info(path=None, refresh=False):
+    """
+    Return the capability dict for the discovered Blender.
+
+    Keys: path, version, version_string, gltf_import, usd_export, usdz_export, error.
+    A missing Blender is reported with path=None and an error message. Results
+    are memoized in-process and cached on disk keyed by binary path/size/mtime.
+    """
+    memo_key = path or ""
+    if not refresh and memo_key in _INFO_CACHE:
+        return _INFO_CACHE[memo_key]
+
+    blender = find_blender(path)
+    if blender is None:
+        info = {
+            "path": None,
+            "version": None,
+            "version_string": None,
+            "gltf_import": False,
+            "usd_export": False,
+            "usdz_export": False,
+            "error": "Blender not found (set BLENDER_PATH or add blender to PATH)",
+        }
+        _INFO_CACHE[memo_key] = info
+        return info
+
+    key = _cache_key(blender)
+    cache = _load_cache()
+    if not refresh and key in cache:
+        info = cache[key]
+    else:
+        info = probe_blender(blender)
+        # Don't persist transient launch failures, retry on the next process start
+        if not info["error"]:
+            cache[key] = info
+            _save_cache(cache)
+
+    _INFO_CACHE[memo_key] = info
+    return info
+
+
+def can_convert_to_usdz(info):
+    """
+    True if Blender can import GLB and write USD.
+
+    Blender without native .usdz output still qualifies: its .usdc export is
+    packaged into a USDZ by usdz_packager.
+    """
+    return bool(info["path"] and info["gltf_import"] and info["usd_export"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Discover Blender and report its capabilities")
+    parser.add_argument("--path", help="Explicit Blender executable to probe")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cache and probe again")
+
+    args = parser.parse_args()
+
+    info = get_blender_info(args.path, refresh=args.refresh)
+    print(json.dumps(info, indent=2))
+
+    if not can_convert_to_usdz(info):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Cooperative Cancellation
+A background watcher that polls whether a running generation is still
+wanted, so the worker can stop between stages, cancel its Replicate
+prediction and kill Blender instead of finishing a result nobody will see.
+
+A generation is cancelled when its row is deleted or a newer run of the
+same generation (a resubmit) has taken over its run_id.
+"""
+
+import threading
+
+
+class GenerationCancelled(Exception):
+    """Raised inside the worker when its generation was cancelled"""
+
+
+def cancel_reason(row, run_id):
+    """Why a run should stop given its generation row (None = keep going)"""
+    if row is None:
+        return "deleted"
+    if run_id and row.get("run_id") and row["run_id"] != run_id:
+        return "superseded"
+    return None
+
+
+class CancelWatcher:
+    """
+    Polls check() every `interval` seconds in a daemon thread.
+
+    check() returns a reason string once the work should stop. Callbacks
+    registered with on_cancel (killing a subprocess, cancelling a remote
+    prediction) run once, from the watcher thread, when that happens.
+    Errors from check() are ignored: a flaky database never cancels a job.
+    An interval of 0 disables polling; cancel() still works.
+    """
+
+    def __init__(self, check, interval=5.0):
+        self.check = check
+        self.interval = interval
+        self.reason = None
+        self._event = threading.Event()
+        self._stopped = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        if self.interval > 0:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stopped.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                reason = self.check()
+            except Exception:
+                continue
+            if reason:
+                self.cancel(reason)
+                return
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        print(f"Generation cancelled ({reason})")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Cancel callback failed: {e}")
+
+    def on_cancel(self, callback):
+        """Run callback on cancellation (at once if already cancelled); returns a function to unregister it"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds, waking early on cancellation; True if cancelled"""
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled(self.reason)
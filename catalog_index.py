@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Catalog Index Script
+Keeps a local SQLite index of model metadata (dimensions, triangle counts,
+texture sizes, hashes) for directories of GLB/USDZ files.
+
+GLB metadata comes from the JSON chunk and the image headers only; vertex
+buffers are never decoded. A rescan only re-reads files whose size or
+modification time changed.
+
+The index also records finished work (uploads, resizes) keyed by the file
+hash, so tools can skip inputs they have already handled.
+
+Usage:
+    python3 catalog_index.py scan assets
+    python3 catalog_index.py list
+    python3 catalog_index.py show assets/sofa.glb
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import struct
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+import numpy as np
+
+from glb_io import GLB_MAGIC, GLB_VERSION, JSON_CHUNK, BIN_CHUNK, TYPE_SIZES
+
+DEFAULT_INDEX = "catalog_index.sqlite"
+MODEL_EXTENSIONS = (".glb", ".usdz")
+
+# Bytes read from the start of an embedded image to get its size from the header
+IMAGE_HEADER_BYTES = 64 * 1024
+
+# Bump when the extracted metadata changes, to force a full rescan
+INDEX_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    format TEXT NOT NULL,
+    width_cm REAL,
+    height_cm REAL,
+    depth_cm REAL,
+    triangles INTEGER,
+    vertices INTEGER,
+    meshes INTEGER,
+    materials INTEGER,
+    textures TEXT,
+    error TEXT,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE TABLE IF NOT EXISTS work (
+    sha256 TEXT NOT NULL,
+    task TEXT NOT NULL,
+    params TEXT NOT NULL,
+    done_at TEXT NOT NULL,
+    PRIMARY KEY (sha256, task, params)
+);
+"""
+
+# Triangles per primitive from its vertex/index count, by glTF primitive mode
+TRIANGLE_COUNTS = {
+    4: lambda n: n // 3,          # TRIANGLES
+    5: lambda n: max(n - 2, 0),   # TRIANGLE_STRIP
+    6: lambda n: max(n - 2, 0),   # TRIANGLE_FAN
+}
+
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def open_index(path=DEFAULT_INDEX):
+    """Open (creating if needed) the index; an index from an older version is rebuilt"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != INDEX_VERSION:
+        # Work records don't depend on the metadata format, only the file rows do
+        conn.execute("DROP TABLE IF EXISTS files")
+        conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+    conn.executescript(SCHEMA)
+    conn.commit()
+    return conn
+
+
+def _node_matrix(node):
+    """Local 4x4 transform of a glTF node (column-major matrix or TRS)"""
+    if "matrix" in node:
+        return np.asarray(node["matrix"], dtype=np.float64).reshape(4, 4).T
+
+    x, y, z, w = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.asarray(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def _mesh_instances(gltf):
+    """(mesh index, world matrix) for every node of the default scene that draws a mesh"""
+    nodes = gltf.get("nodes", [])
+    scenes = gltf.get("scenes", [])
+    if scenes:
+        roots = scenes[gltf.get("scene", 0)].get("nodes", [])
+    else:
+        roots = range(len(nodes))
+
+    instances = []
+    stack = [(index, np.eye(4)) for index in roots]
+    while stack:
+        index, parent = stack.pop()
+        node = nodes[index]
+        world = parent @ _node_matrix(node)
+        if "mesh" in node:
+            instances.append((node["mesh"], world))
+        stack.extend((child, world) for child in node.get("children", []))
+    return instances
+
+
+def _read_glb_json(f):
+    """
+    (gltf dict, file offset of the binary chunk data or None) from an open
+    GLB file, reading only the header, the JSON chunk and the next chunk header
+    """
+    header = f.read(12)
+    if len(header) < 12 or header[:4] != GLB_MAGIC:
+        raise ValueError("Not a GLB file")
+    version, _ = struct.unpack("<II", header[4:])
+    if version != GLB_VERSION:
+        raise ValueError(f"Unsupported GLB version {version}")
+
+    chunk_length, chunk_type = struct.unpack("<II", f.read(8))
+    if chunk_type != JSON_CHUNK:
+        raise ValueError("GLB has no JSON chunk")
+    gltf = json.loads(f.read(chunk_length))
+
+    binary_offset = None
+    next_header = f.read(8)
+    if len(next_header) == 8 and struct.unpack("<II", next_header)[1] == BIN_CHUNK:
+        binary_offset = f.tell()
+    return gltf, binary_offset
+
+
+def _image_sizes(gltf, f, binary_offset, base_dir):
+    """[{name, mime, width, height, bytes}] for each image, read from its header only"""
+    from PIL import Image
+
+    textures = []
+    for index, image in enumerate(gltf.get("images", [])):
+        entry = {"name": image.get("name") or f"image_{index}", "mime": image.get("mimeType"),
+                 "width": None, "height": None, "bytes": None}
+        head = None
+        if "bufferView" in image and binary_offset is not None:
+            view = gltf["bufferViews"][image["bufferView"]]
+            entry["bytes"] = view["byteLength"]
+            f.seek(binary_offset + view.get("byteOffset", 0))
+            head = f.read(min(view["byteLength"], IMAGE_HEADER_BYTES))
+        elif "uri" in image and not image["uri"].startswith("data:"):
+            image_path = os.path.join(base_dir, image["uri"])
+            if os.path.exists(image_path):
+                entry["bytes"] = os.path.getsize(image_path)
+                with open(image_path, "rb") as image_file:
+                    head = image_file.read(IMAGE_HEADER_BYTES)
+        if head is not None:
+            try:
+                with Image.open(io.BytesIO(head)) as header:
+                    entry["width"], entry["height"] = header.size
+            except Exception:
+                pass
+        textures.append(entry)
+    return textures
+
+
+def glb_metadata(path):
+    """
+    Metadata of a GLB file from its JSON chunk and image headers.
+
+    Dimensions are the axis-aligned bounds of the POSITION accessor min/max
+    boxes, transformed through the node hierarchy (in cm, assuming metres).
+    """
+    with open(path, "rb") as f:
+        gltf, binary_offset = _read_glb_json(f)
+        textures = _image_sizes(gltf, f, binary_offset, os.path.dirname(path))
+    accessors = gltf.get("accessors", [])
+    meshes = gltf.get("meshes", [])
+
+    triangles = vertices = 0
+    corners = []
+    for mesh_index, world in _mesh_instances(gltf):
+        for primitive in meshes[mesh_index].get("primitives", []):
+            position = accessors[primitive["attributes"]["POSITION"]] if "POSITION" in primitive.get("attributes", {}) else None
+            if position is None:
+                continue
+            vertices += position["count"]
+            count = accessors[primitive["indices"]]["count"] if "indices" in primitive else position["count"]
+            triangles += TRIANGLE_COUNTS.get(primitive.get("mode", 4), lambda n: 0)(count)
+
+            if "min" in position and "max" in position and TYPE_SIZES[position["type"]] == 3:
+                low, high = position["min"], position["max"]
+                box = np.array([[x, y, z, 1.0] for x in (low[0], high[0])
+                                for y in (low[1], high[1]) for z in (low[2], high[2])])
+                corners.append((box @ world.T)[:, :3])
+
+    dims = [None, None, None]
+    if corners:
+        points = np.concatenate(corners)
+        dims = ((points.max(axis=0) - points.min(axis=0)) * 100).tolist()
+
+    return {
+        "width_cm": dims[0],
+        "height_cm": dims[1],
+        "depth_cm": dims[2],
+        "triangles": triangles,
+        "vertices": vertices,
+        "meshes": len(meshes),
+        "materials": len(gltf.get("materials", [])),
+        "textures": textures,
+    }
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_file(conn, path, stat=None):
+    """(Re)read one file into the index; returns its row"""
+    path = os.path.abspath(path)
+    stat = stat or os.stat(path)
+    row = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(path),
+        "format": os.path.splitext(path)[1].lower().lstrip("."),
+        "width_cm": None, "height_cm": None, "depth_cm": None,
+        "triangles": None, "vertices": None, "meshes": None, "materials": None,
+        "textures": None,
+        "error": None,
+        "indexed_at": utc_now(),
+    }
+    if row["format"] == "glb":
+        try:
+            metadata = glb_metadata(path)
+            metadata["textures"] = json.dumps(metadata["textures"])
+            row.update(metadata)
+        except Exception as e:
+            row["error"] = str(e)
+
+    columns = ", ".join(row)
+    placeholders = ", ".join(f":{key}" for key in row)
+    conn.execute(f"INSERT OR REPLACE INTO files ({columns}) VALUES ({placeholders})", row)
+    return row
+
+
+def model_files(roots):
+    for root in roots:
+        if os.path.isfile(root):
+            yield os.path.abspath(root)
+            continue
+        for directory, _, names in os.walk(root):
+            for name in sorted(names):
+                if name.lower().endswith(MODEL_EXTENSIONS):
+                    yield os.path.abspath(os.path.join(directory, name))
+
+
+def scan(conn, roots):
+    """
+    Bring the index up to date for the given directories (or files).
+
+    Files whose size and mtime match the index are skipped; rows for files
+    that no longer exist under the roots are removed. Returns counts and time.
+    """
+    start = time.perf_counter()
+    stats = {"scanned": 0, "updated": 0, "unchanged": 0, "removed": 0, "errors": 0}
+    seen = set()
+
+    for path in model_files(roots):
+        seen.add(path)
+        stats["scanned"] += 1
+        stat = os.stat(path)
+        known = conn.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            stats["unchanged"] += 1
+            continue
+        row = index_file(conn, path, stat)
+        stats["updated"] += 1
+        if row["error"]:
+            stats["errors"] += 1
+            print(f"⚠️  {path}: {row['error']}")
+
+    for root in roots:
+        root = os.path.abspath(root)
+        if os.path.isfile(root):
+            continue
+        prefix = os.path.join(root, "")
+        for row in conn.execute("SELECT path FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)).fetchall():
+            if row["path"] not in seen:
+                conn.execute("DELETE FROM files WHERE path = ?", (row["path"],))
+                stats["removed"] += 1
+
+    conn.commit()
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def lookup(conn, path):
+    """Current index row for a file as a dict (refreshed if the file changed), or None if missing"""
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    row = conn.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+    if row is None or row["size"] != stat.st_size or row["mtime_ns"] != stat.st_mtime_ns:
+        index_file(conn, path, stat)
+        conn.commit()
+        row = conn.execute("SELECT * FROM files WHERE path = ?", (path,)).fetchone()
+    row = dict(row)
+    row["textures"] = json.loads(row["textures"]) if row["textures"] else []
+    return row
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def is_done(conn, sha256, task, params=None):
+    """Whether `task` already ran on content with this hash and these parameters"""
+    row = conn.execute("SELECT 1 FROM work WHERE sha256 = ? AND task = ? AND params = ?",
+                       (sha256, task, _params_key(params or {}))).fetchone()
+    return row is not None
+
+
+def record_done(conn, sha256, task, params=None):
+    conn.execute("INSERT OR REPLACE INTO work (sha256, task, params, done_at) VALUES (?, ?, ?, ?)",
+                 (sha256, task, _params_key(params or {}), utc_now()))
+    conn.commit()
+
+
+def format_row(row):
+    dims = "?"
+    if row["width_cm"] is not None:
+        dims = f"{row['width_cm']:.1f}x{row['height_cm']:.1f}x{row['depth_cm']:.1f} cm"
+    triangles = f"{row['triangles']:,} tris" if row["triangles"] is not None else ""
+    textures = json.loads(row["textures"]) if isinstance(row["textures"], str) else (row["textures"] or [])
+    sizes = ", ".join(f"{t['width']}x{t['height']}" for t in textures if t["width"])
+    return (f"{os.path.relpath(row['path'])}  {row['format']}  {row['size'] / 1024:.0f} KB  {dims}  "
+            f"{triangles}{'  textures: ' + sizes if sizes else ''}{'  ERROR: ' + row['error'] if row['error'] else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index model metadata in a local SQLite catalog")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help=f"Index file (default: {DEFAULT_INDEX})")
+    subparsers = parser.add_subparsers(dest="command")
+
+    scan_parser = subparsers.add_parser("scan", help="Index new and changed models")
+    scan_parser.add_argument("paths", nargs="+", help="Directories or files to scan")
+
+    subparsers.add_parser("list", help="List indexed models")
+
+    show_parser = subparsers.add_parser("show", help="Show one model's metadata")
+    show_parser.add_argument("path", help="Model file")
+
+    args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        sys.exit(1)
+
+    conn = open_index(args.index)
+    try:
+        if args.command == "scan":
+            stats = scan(conn, args.paths)
+            print(f"Scanned {stats['scanned']} files: {stats['updated']} indexed, {stats['unchanged']} unchanged, "
+                  f"{stats['removed']} removed, {stats['errors']} errors in {stats['seconds']:.2f}s")
+        elif args.command == "list":
+            for row in conn.execute("SELECT * FROM files ORDER BY path"):
+                print(format_row(row))
+        elif args.command == "show":
+            row = lookup(conn, args.path)
+            if row is None:
+                print(f"Error: File '{args.path}' not found.")
+                sys.exit(1)
+            for key, value in row.items():
+                print(f"{key}: {value}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Generation Checkpoints
+Persists the outputs of the post-processing stages (raw GLB, resized GLB,
+USDZ) per generation, so a retried or re-spawned job resumes from the first
+incomplete stage instead of paying for inference and download again.
+
+Each generation tier has a manifest (the stage cursor) next to its files:
+
+    <generationId>/<tier>/manifest.json
+    <generationId>/<tier>/raw.glb
+    <generationId>/<tier>/resized.glb
+    <generationId>/<tier>/model.usdz
+
+Every stage is saved with a key hashed from its inputs and the previous
+stage's key, so changed dimensions on a retry redo the resize and
+everything after it, but reuse the raw model. Since a key covers the whole
+chain, a stage can be resumed without the ones before it being saved: the
+raw model is only kept when the resize failed.
+
+Stores: StorageCheckpointStore (Supabase Storage, the private `checkpoints`
+bucket) in production, LocalCheckpointStore (a directory) for local runs.
+
+Usage:
+    python3 checkpoints.py show <generationId> --dir /tmp/checkpoints
+    python3 checkpoints.py clear <generationId> --dir /tmp/checkpoints
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+CHECKPOINT_BUCKET = "checkpoints"
+STAGES = ("raw", "resized", "usdz")
+STAGE_FILES = {"raw": "raw.glb", "resized": "resized.glb", "usdz": "model.usdz"}
+TIERS = ("draft", "final")
+
+# Bump when a stage's output changes for the same inputs
+CHECKPOINT_VERSION = 1
+
+
+class LocalCheckpointStore:
+    """Checkpoint files in a local directory"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def read(self, path):
+        try:
+            with open(os.path.join(self.root, path), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, path, data):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        # Write then rename, so a crash never leaves a truncated file behind
+        with open(full_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(full_path + ".tmp", full_path)
+
+    def delete(self, paths):
+        for path in paths:
+            try:
+                os.remove(os.path.join(self.root, path))
+            except FileNotFoundError:
+                pass
+
+
+class StorageCheckpointStore:
+    """Checkpoint files in a Supabase Storage bucket"""
+
+    def __init__(self, supabase, bucket=CHECKPOINT_BUCKET):
+        self.bucket = supabase.storage.from_(bucket)
+
+    def read(self, path):
+        # Missing objects and transient errors alike mean "redo the stage"
+        try:
+            return self.bucket.download(path)
+        except Exception:
+            return None
+
+    def write(self, path, data):
+        self.bucket.upload(path, data, {"content-type": "application/octet-stream", "upsert": "true"})
+
+    def delete(self, paths):
+        if paths:
+            self.bucket.remove(list(paths))
+
+
+def stage_key(parent, params):
+    """Key of a stage: hash of the previous stage's key and this stage's inputs"""
+    digest = hashlib.sha256(f"v{CHECKPOINT_VERSION}:{parent or ''}:".encode())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def stage_keys(raw_params, resize_params):
+    """Keys for raw -> resized -> usdz; the USDZ depends only on the resized model"""
+    raw = stage_key(None, raw_params)
+    resized = stage_key(raw, resize_params)
+    return {"raw": raw, "resized": resized, "usdz": stage_key(resized, {})}
+
+
+class GenerationCheckpoints:
+    """
+    Stage cursor and outputs for one generation tier.
+
+    `saved_seconds` is the original cost of the latest stage restored in this
+    run and of the stages before it, i.e. the work a resume didn't redo.
+    """
+
+    def __init__(self, store, gen_id, tier="final"):
+        self.store = store
+        self.prefix = f"{gen_id}/{tier}"
+        self.restored = []
+        self._manifest = None
+        # Manifest entries as of the last restore, so clear() doesn't reset saved_seconds
+        self._restored_from = {}
+
+    @property
+    def saved_seconds(self):
+        if not self.restored:
+            return 0.0
+        latest = max(STAGES.index(stage) for stage in self.restored)
+        stages = self._restored_from
+        return sum(stages[stage].get("seconds", 0.0) for stage in STAGES[:latest + 1] if stage in stages)
+
+    @property
+    def manifest(self):
+        if self._manifest is None:
+            data = self.store.read(f"{self.prefix}/manifest.json")
+            try:
+                self._manifest = json.loads(data) if data else {}
+            except ValueError:
+                self._manifest = {}
+            self._manifest.setdefault("stages", {})
+        return self._manifest
+
+    def completed(self, keys):
+        """Stages (in order) whose saved key matches; earlier stages needn't be saved"""
+        done = []
+        for stage in STAGES:
+            entry = self.manifest["stages"].get(stage)
+            if entry and entry.get("key") == keys[stage]:
+                done.append(stage)
+        return done
+
+    def restore(self, stage, key):
+        """Saved output of a stage, or None if it's missing or stale"""
+        entry = self.manifest["stages"].get(stage)
+        if not entry or entry.get("key") != key:
+            return None
+        data = self.store.read(f"{self.prefix}/{entry['file']}")
+        if data is None or len(data) != entry.get("bytes", len(data)):
+            return None
+        self.restored.append(stage)
+        self._restored_from = dict(self.manifest["stages"])
+        return data
+
+    def save(self, stage, key, data, seconds):
+        """
+        Store a stage's output, then advance the cursor. Returns False when it
+        couldn't be saved; failures only cost the checkpoint.
+        """
+        try:
+            self.store.write(f"{self.prefix}/{STAGE_FILES[stage]}", data)
+            self.manifest["stages"][stage] = {
+                "key": key,
+                "file": STAGE_FILES[stage],
+                "bytes": len(data),
+                "seconds": seconds,
+                "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+            self.store.write(f"{self.prefix}/manifest.json", json.dumps(self.manifest).encode())
+            return True
+        except Exception as e:
+            print(f"Warning: could not checkpoint {stage}: {e}")
+            return False
+
+    def clear(self):
+        try:
+            files = [entry["file"] for entry in self.manifest["stages"].values()]
+            if not files:
+                # Nothing saved, so no manifest either
+                return
+            self.store.delete([f"{self.prefix}/{name}" for name in files] + [f"{self.prefix}/manifest.json"])
+            self._manifest = {"stages": {}}
+        except Exception as e:
+            print(f"Warning: could not clear checkpoints: {e}")
+
+
+def clear_generation(store, gen_id):
+    """Drop the checkpoints of every tier of a finished generation"""
+    for tier in TIERS:
+        GenerationCheckpoints(store, gen_id, tier).clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect generation checkpoints in a local directory")
+    parser.add_argument("command", choices=("show", "clear"))
+    parser.add_argument("generation_id", help="Generation id")
+    parser.add_argument("--dir", required=True, help="Checkpoint directory (CHECKPOINT_STORE)")
+    args = parser.parse_args()
+
+    store = LocalCheckpointStore(args.dir)
+    if args.command == "clear":
+        clear_generation(store, args.generation_id)
+        print(f"Cleared checkpoints of {args.generation_id}")
+        return
+
+    found = False
+    for tier in TIERS:
+        stages = GenerationCheckpoints(store, args.generation_id, tier).manifest["stages"]
+        for stage in STAGES:
+            if stage in stages:
+                entry = stages[stage]
+                found = True
+                print(f"{tier:<6} {stage:<8} {entry['bytes'] / 1024:>8.0f} KB  {entry['seconds']:>7.2f}s  "
+                      f"{entry['saved_at']}  {entry['key'][:12]}")
+    if not found:
+        print(f"No checkpoints for {args.generation_id}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
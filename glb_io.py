@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+GLB Container Helpers
+Reads and writes binary glTF (.glb) files at the container level, without
+decoding meshes or re-encoding textures, and rescales models by patching
+their vertex data in place.
+
+Usage:
+    python3 glb_io.py info model.glb
+    python3 glb_io.py scale model.glb model_small.glb 0.5,1,1
+"""
+
+import sys
+import json
+import struct
+import argparse
+import numpy as np
+
+GLB_MAGIC = b"glTF"
+GLB_VERSION = 2
+JSON_CHUNK = 0x4E4F534A
+BIN_CHUNK = 0x004E4942
+
+COMPONENT_DTYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+
+IDENTITY = [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1]
+
+
+def read_glb(data):
+    """
+    Split GLB bytes into (gltf dict, binary chunk).
+
+    The binary chunk is returned as a memoryview (b"" when absent), so large
+    files aren't copied. Raises ValueError for anything that isn't GLB v2.
+    """
+    view = memoryview(data)
+    if len(view) < 20 or bytes(view[:4]) != GLB_MAGIC:
+        raise ValueError("Not a GLB file")
+    version, length = struct.unpack_from("<II", view, 4)
+    if version != GLB_VERSION:
+        raise ValueError(f"Unsupported GLB version {version}")
+
+    gltf, binary = None, b""
+    offset = 12
+    while offset + 8 <= min(length, len(view)):
+        chunk_length, chunk_type = struct.unpack_from("<II", view, offset)
+        chunk = view[offset + 8:offset + 8 + chunk_length]
+        if chunk_type == JSON_CHUNK:
+            gltf = json.loads(bytes(chunk))
+        elif chunk_type == BIN_CHUNK and not binary:
+            binary = chunk
+        offset += 8 + chunk_length
+
+    if gltf is None:
+        raise ValueError("GLB has no JSON chunk")
+    return gltf, binary
+
+
+def write_glb(gltf, binary=b""):
+    """Assemble GLB bytes from a gltf dict and a binary chunk"""
+    json_bytes = json.dumps(gltf, separators=(",", ":")).encode()
+    json_bytes += b" " * (-len(json_bytes) % 4)
+    binary = bytes(binary)
+    binary += b"\0" * (-len(binary) % 4)
+
+    length = 12 + 8 + len(json_bytes) + (8 + len(binary) if binary else 0)
+    parts = [
+        struct.pack("<4sII", GLB_MAGIC, GLB_VERSION, length),
+        struct.pack("<II", len(json_bytes), JSON_CHUNK), json_bytes,
+    ]
+    if binary:
+        parts += [struct.pack("<II", len(binary), BIN_CHUNK), binary]
+    return b"".join(parts)
+
+
+def accessor_array(gltf, binary, index):
+    """
+    numpy view (count, components) of an accessor in the binary chunk.
+
+    Writable when `binary` is a bytearray. Sparse accessors and external
+    buffers aren't supported (ValueError).
+    """
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor or "bufferView" not in accessor:
+        raise ValueError(f"Accessor {index} is sparse or has no buffer view")
+    buffer_view = gltf["bufferViews"][accessor["bufferView"]]
+    if buffer_view.get("buffer", 0) != 0 or "uri" in gltf["buffers"][buffer_view.get("buffer", 0)]:
+        raise ValueError(f"Accessor {index} isn't stored in the GLB binary chunk")
+
+    dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+    components = TYPE_SIZES[accessor["type"]]
+    stride = buffer_view.get("byteStride") or dtype.itemsize * components
+    offset = buffer_view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    return np.ndarray(
+        shape=(accessor["count"], components), dtype=dtype, buffer=binary,
+        offset=offset, strides=(stride, dtype.itemsize),
+    )
+
+
+def _has_identity_transforms(gltf):
+    for node in gltf.get("nodes", []):
+        if node.get("matrix", IDENTITY) != IDENTITY:
+            return False
+        if any(key in node for key in ("translation", "rotation", "scale")):
+            return False
+    return True
+
+
+def _vertex_accessors(gltf):
+    """Accessor indices of POSITION, NORMAL and TANGENT; None if the mesh data can't be patched"""
+    if gltf.get("skins") or gltf.get("extensionsUsed"):
+        # Skinned, Draco-compressed or quantized data needs a decoder
+        return None
+
+    accessors = {"POSITION": set(), "NORMAL": set(), "TANGENT": set()}
+    for mesh in gltf.get("meshes", []):
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("targets"):
+                return None
+            for semantic, indices in accessors.items():
+                if semantic in primitive.get("attributes", {}):
+                    indices.add(primitive["attributes"][semantic])
+
+    for index in set().union(*accessors.values()):
+        accessor = gltf["accessors"][index]
+        if accessor["componentType"] != 5126 or "sparse" in accessor:
+            return None
+    # An accessor used as both positions and normals can't be patched twice
+    if accessors["POSITION"] & (accessors["NORMAL"] | accessors["TANGENT"]):
+        return None
+    return accessors
+
+
+def scale_glb(data, scale):
+    """
+    Return GLB bytes with the whole model scaled by (sx, sy, sz).
+
+    When every node has an identity transform (trimesh's single-mesh export)
+    the vertex data is patched in place: positions scaled, normals and
+    tangents transformed and renormalized, POSITION bounds updated. Textures
+    and indices are copied byte for byte. Otherwise the scene roots are
+    parented under a new node carrying the scale.
+    """
+    scale = np.asarray(scale, dtype=np.float64)
+    if np.any(scale <= 0):
+        raise ValueError("Scale factors must be positive")
+
+    gltf, binary = read_glb(data)
+    accessors = _vertex_accessors(gltf) if _has_identity_transforms(gltf) else None
+
+    if accessors is None:
+        node_index = len(gltf.setdefault("nodes", []))
+        gltf["nodes"].append({"name": "scale", "scale": scale.tolist(), "children": []})
+        for scene in gltf.get("scenes", []):
+            gltf["nodes"][node_index]["children"].extend(scene.get("nodes", []))
+            scene["nodes"] = [node_index]
+        return write_glb(gltf, binary)
+
+    binary = bytearray(binary)
+    for index in accessors["POSITION"]:
+        positions = accessor_array(gltf, binary, index)
+        positions *= scale.astype(np.float32)
+        accessor = gltf["accessors"][index]
+        if len(positions):
+            accessor["min"] = positions.min(axis=0).tolist()
+            accessor["max"] = positions.max(axis=0).tolist()
+
+    # Normals transform by the inverse transpose, tangents like positions
+    for semantic, factor in (("NORMAL", 1.0 / scale), ("TANGENT", scale)):
+        for index in accessors[semantic]:
+            vectors = accessor_array(gltf, binary, index)
+            xyz = vectors[:, :3] * factor.astype(np.float32)
+            length = np.linalg.norm(xyz, axis=1, keepdims=True)
+            vectors[:, :3] = xyz / np.where(length > 0, length, 1.0)
+
+    return write_glb(gltf, binary)
+
+
+def glb_info(data):
+    """Summary of a GLB's contents, from the JSON chunk only"""
+    gltf, binary = read_glb(data)
+    primitives = [p for mesh in gltf.get("meshes", []) for p in mesh.get("primitives", [])]
+    return {
+        "bytes": len(data),
+        "binary_bytes": len(binary),
+        "nodes": len(gltf.get("nodes", [])),
+        "meshes": len(gltf.get("meshes", [])),
+        "primitives": len(primitives),
+        "materials": len(gltf.get("materials", [])),
+        "images": len(gltf.get("images", [])),
+        "extensions": gltf.get("extensionsUsed", []),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GLB container helpers")
+    subparsers = parser.add_subparsers(dest="command")
+
+    info_parser = subparsers.add_parser("info", help="Show what a GLB contains")
+    info_parser.add_argument("input", help="GLB file")
+
+    scale_parser = subparsers.add_parser("scale", help="Scale a GLB without re-encoding it")
+    scale_parser.add_argument("input", help="Input GLB")
+    scale_parser.add_argument("output", help="Output GLB")
+    scale_parser.add_argument("scale", help="Scale factors x,y,z (e.g. 0.5,1,1)")
+
+    args = parser.parse_args()
+
+    if args.command == "info":
+        with open(args.input, "rb") as f:
+            info = glb_info(f.read())
+        for key, value in info.items():
+            print(f"{key}: {value}")
+    elif args.command == "scale":
+        try:
+            scale = [float(x) for x in args.scale.split(",")]
+            if len(scale) != 3:
+                raise ValueError
+        except ValueError:
+            print("Error: Scale must be three comma-separated numbers: x,y,z")
+            sys.exit(1)
+        with open(args.input, "rb") as f:
+            data = scale_glb(f.read(), scale)
+        with open(args.output, "wb") as f:
+            f.write(data)
+        print(f"Saved scaled GLB to: {args.output}")
+    else:
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
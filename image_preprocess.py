@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Input Image Preprocessing Script
+Normalizes product photos before they are sent to Hunyuan3D:
+
+    - applies the EXIF orientation (and drops EXIF, including GPS data)
+    - crops to the product when it stands on a plain background
+    - downscales to the model's useful resolution
+    - re-encodes as JPEG (or PNG when the image has transparency)
+
+Results are content-addressed: the key is a hash of the original bytes and
+the preprocessing settings, so the same upload is processed and stored once.
+
+Usage:
+    python3 image_preprocess.py photo.jpg -o photo_small.jpg
+    python3 image_preprocess.py photo.jpg -o photo_small.jpg --no-crop --max-side 768
+    python3 image_preprocess.py --benchmark --mbps 20
+"""
+
+import io
+import sys
+import time
+import hashlib
+import argparse
+import numpy as np
+
+# Hunyuan3D-2.1 conditions on ~512px crops of the object; 1024 leaves headroom
+# for its own recentring without shipping full-resolution phone photos
+MAX_SIDE = 1024
+JPEG_QUALITY = 90
+
+# Background cropping: a pixel is "product" when any channel differs from the
+# border colour by more than this
+BACKGROUND_THRESHOLD = 40
+# Skip cropping when more than this fraction of the border isn't background
+MAX_BUSY_BORDER = 0.15
+# Padding around the product, as a fraction of its larger side
+CROP_MARGIN = 0.08
+# Resolution of the copy used to find the product
+MASK_SIZE = 256
+
+# Bump when the output of preprocess_image changes, to invalidate stored results
+PREPROCESS_VERSION = 1
+
+STORAGE_PREFIX = "preprocessed"
+
+
+def has_alpha(image):
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def content_key(data, max_side=MAX_SIDE, crop=True):
+    """Storage key for the preprocessed form of `data` (hash of bytes + settings)"""
+    digest = hashlib.sha256(data)
+    digest.update(f"v{PREPROCESS_VERSION}:{max_side}:{int(crop)}:{JPEG_QUALITY}".encode())
+    return digest.hexdigest()
+
+
+def output_format(data):
+    """("JPEG"|"PNG", extension, content type) for the preprocessed form of `data`, from the header only"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        if has_alpha(image):
+            return "PNG", "png", "image/png"
+    return "JPEG", "jpg", "image/jpeg"
+
+
+def storage_path(data, max_side=MAX_SIDE, crop=True):
+    """Bucket path for the preprocessed image, e.g. preprocessed/<sha256>.jpg"""
+    _, extension, _ = output_format(data)
+    return f"{STORAGE_PREFIX}/{content_key(data, max_side, crop)}.{extension}"
+
+
+def subject_bbox(image):
+    """
+    Bounding box (left, upper, right, lower) of the product, or None.
+
+    Transparent images use their alpha channel. Opaque ones are compared to
+    the median border colour; a busy border (a real room behind the product)
+    means there's no plain background to crop, so None is returned.
+    """
+    if has_alpha(image):
+        bbox = image.convert("RGBA").getchannel("A").getbbox()
+        return bbox
+
+    small = image.convert("RGB")
+    small.thumbnail((MASK_SIZE, MASK_SIZE))
+    pixels = np.asarray(small, dtype=np.int16)
+
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    background = np.median(border, axis=0)
+    busy = (np.abs(border - background).max(axis=1) > BACKGROUND_THRESHOLD).mean()
+    if busy > MAX_BUSY_BORDER:
+        return None
+
+    mask = np.abs(pixels - background).max(axis=2) > BACKGROUND_THRESHOLD
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if len(rows) == 0:
+        return None
+
+    scale_x = image.width / small.width
+    scale_y = image.height / small.height
+    return (
+        int(cols[0] * scale_x), int(rows[0] * scale_y),
+        int(np.ceil((cols[-1] + 1) * scale_x)), int(np.ceil((rows[-1] + 1) * scale_y)),
+    )
+
+
+def crop_to_subject(image):
+    """Crop to the product plus a margin; returns (image, box or None)"""
+    bbox = subject_bbox(image)
+    if bbox is None:
+        return image, None
+
+    left, upper, right, lower = bbox
+    margin = int(max(right - left, lower - upper) * CROP_MARGIN)
+    box = (
+        max(left - margin, 0), max(upper - margin, 0),
+        min(right + margin, image.width), min(lower + margin, image.height),
+    )
+
+    # Not worth a crop (the product fills the frame) or implausibly small
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    if area > 0.9 * image.width * image.height or area < 0.01 * image.width * image.height:
+        return image, None
+    return image.crop(box), box
+
+
+def preprocess_image(data, max_side=MAX_SIDE, crop=True):
+    """
+    Normalize an input photo.
+
+    Args:
+        data: Original image bytes (JPEG, PNG, WebP, ...)
+        max_side: Longest side of the output in pixels
+        crop: Crop to the product when it stands on a plain background
+
+    Returns:
+        (bytes, info) where info has sizes, the crop box, format and timings
+    """
+    from PIL import Image, ImageOps
+
+    timings = {}
+    start = time.perf_counter()
+
+    image = Image.open(io.BytesIO(data))
+    original_size = image.size
+    format_name, _, content_type = output_format(data)
+
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly; keep some headroom for the crop
+    if image.format == "JPEG":
+        ratio = min(1.0, max_side * 1.5 / max(image.size))
+        image.draft("RGB", (int(image.width * ratio), int(image.height * ratio)))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert("RGBA" if format_name == "PNG" else "RGB")
+    timings["decode"] = time.perf_counter() - start
+
+    box = None
+    if crop:
+        step = time.perf_counter()
+        image, box = crop_to_subject(image)
+        timings["crop"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    timings["resize"] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    output = io.BytesIO()
+    if format_name == "PNG":
+        image.save(output, "PNG", optimize=True)
+    else:
+        image.save(output, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    timings["encode"] = time.perf_counter() - step
+    timings["total"] = time.perf_counter() - start
+
+    result = output.getvalue()
+    return result, {
+        "original_bytes": len(data),
+        "output_bytes": len(result),
+        "original_size": original_size,
+        "output_size": image.size,
+        "crop_box": box,
+        "format": format_name,
+        "content_type": content_type,
+        "timings": timings,
+    }
+
+
+def print_info(info):
+    reduction = 1 - info["output_bytes"] / info["original_bytes"] if info["original_bytes"] else 0.0
+    crop = f", cropped to {info['crop_box']}" if info["crop_box"] else ""
+    print(f"Preprocessed image: {info['original_size'][0]}x{info['original_size'][1]} "
+          f"-> {info['output_size'][0]}x{info['output_size'][1]} {info['format']}{crop}")
+    print(f"  {info['original_bytes'] / 1024:.0f} KB -> {info['output_bytes'] / 1024:.0f} KB "
+          f"({reduction:.0%} smaller) in {info['timings']['total'] * 1000:.0f} ms")
+
+
+def benchmark(mbps=20.0, repeats=3):
+    """
+    Preprocess synthetic phone photos and estimate the transfer time saved.
+
+    `mbps` is the bandwidth assumed for Replicate fetching the input image.
+    """
+    from synthetic_meshes import phone_photo
+
+    cases = [
+        ("12MP plain wall", dict(width=4032, height=3024, busy=False)),
+        ("12MP busy room", dict(width=4032, height=3024, busy=True)),
+        ("48MP plain wall", dict(width=8064, height=6048, busy=False)),
+        ("2MP plain wall", dict(width=1600, height=1200, busy=False)),
+    ]
+    results = []
+    print(f"{'case':<18} {'in KB':>8} {'out KB':>8} {'out px':>10} {'crop':>5} {'prep ms':>8} "
+          f"{'saved ms @' + str(int(mbps)) + 'Mbps':>17}")
+    for name, params in cases:
+        data = phone_photo(**params)
+        times = []
+        for _ in range(repeats):
+            output, info = preprocess_image(data)
+            times.append(info["timings"]["total"])
+        prep_ms = float(np.median(times)) * 1000
+        saved_ms = (info["original_bytes"] - info["output_bytes"]) * 8 / (mbps * 1e6) * 1000
+        size = f"{info['output_size'][0]}x{info['output_size'][1]}"
+        print(f"{name:<18} {info['original_bytes'] / 1024:>8.0f} {info['output_bytes'] / 1024:>8.0f} {size:>10} "
+              f"{'yes' if info['crop_box'] else 'no':>5} {prep_ms:>8.0f} {saved_ms - prep_ms:>17.0f}")
+        results.append({
+            "case": name,
+            "original_bytes": info["original_bytes"],
+            "output_bytes": info["output_bytes"],
+            "output_size": info["output_size"],
+            "cropped": info["crop_box"] is not None,
+            "preprocess_ms": prep_ms,
+            "net_saved_ms": saved_ms - prep_ms,
+        })
+    print(f"\nNet saving = transfer time saved at {mbps:g} Mbps minus preprocessing time "
+          f"(a one-off per image, later runs reuse the stored result).")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalize product photos for 3D generation")
+    parser.add_argument("input", nargs="?", help="Input image")
+    parser.add_argument("-o", "--output", help="Output image path")
+    parser.add_argument("--max-side", type=int, default=MAX_SIDE, help=f"Longest side in pixels (default: {MAX_SIDE})")
+    parser.add_argument("--no-crop", action="store_true", help="Don't crop to the product")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark on synthetic phone photos")
+    parser.add_argument("--mbps", type=float, default=20.0, help="Bandwidth for the benchmark estimate (default: 20)")
+
+    args = parser.parse_args()
+
+    try:
+        from PIL import Image  # noqa: F401
+    except ImportError:
+        print("Error: 'Pillow' is required. Please install it: pip install Pillow")
+        sys.exit(1)
+
+    if args.benchmark:
+        benchmark(mbps=args.mbps)
+        return
+
+    if not args.input or not args.output:
+        parser.print_help()
+        sys.exit(1)
+
+    with open(args.input, "rb") as f:
+        data = f.read()
+    output, info = preprocess_image(data, max_side=args.max_side, crop=not args.no_crop)
+    with open(args.output, "wb") as f:
+        f.write(output)
+    print_info(info)
+    print(f"Content key: {content_key(data, args.max_side, not args.no_crop)}")
+    print(f"Saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
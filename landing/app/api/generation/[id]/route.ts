@@ -12,7 +12,7 @@ export async function GET(
     // Fetch the generation status from the database
     const { data: generation, error } = await supabase
       .from('generations')
-      .select('id, status, progress_message, glb_url, usdz_url, created_at')
+      .select('id, status, progress_message, glb_url, usdz_url, created_at, draft_ready_at, completed_at')
       .eq('id', id)
       .single()
 
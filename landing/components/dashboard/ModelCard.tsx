@@ -15,6 +15,7 @@ interface Generation {
   glb_url: string | null
   usdz_url: string | null
   created_at: string
+  draft_ready_at?: string | null
   name?: string
 }
 
@@ -31,7 +32,10 @@ export function ModelCard({ model }: { model: Generation }) {
   // Check if model is in an active processing state
   const isProcessing = model.status === 'processing'
 
-  const progressMessage = 'Generating 3D model...'
+  // A draft model is published while the final one is still generating
+  const hasDraft = isProcessing && !!model.glb_url
+
+  const progressMessage = hasDraft ? 'Draft ready, refining...' : 'Generating 3D model...'
 
   // Close menu when clicking outside
   useEffect(() => {
@@ -274,6 +278,14 @@ export function ModelCard({ model }: { model: Generation }) {
                 </>
               )}
             </button>
+          ) : hasDraft ? (
+            <button
+              onClick={handleViewInAR}
+              className="w-full flex items-center justify-center gap-2 bg-[#1e293b] hover:bg-[#2d3b55] text-slate-300 hover:text-white text-sm font-medium py-3 rounded-lg transition-colors"
+            >
+              <Eye size={16} /> Preview Draft
+              <Loader2 className="w-4 h-4 animate-spin text-slate-500" />
+            </button>
           ) : (
             <div className="flex items-center justify-center text-xs text-slate-400 italic bg-[#1e293b]/50 py-3 rounded-lg border border-dashed border-[#1e293b]">
               <span className="flex items-center gap-2">
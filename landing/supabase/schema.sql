@@ -10,9 +10,48 @@ create table public.generations (
   status generation_status not null default 'processing',
   name text,
   created_at timestamp with time zone not null default now(),
+  draft_ready_at timestamp with time zone,
+  completed_at timestamp with time zone,
+  run_id text,
+  prediction_ids jsonb,
+  claimed_prediction_ids jsonb,
   primary key (id)
 );
 
+-- Draft-then-refine timestamps (time-to-first-view vs. time-to-final), for existing tables
+alter table public.generations add column if not exists draft_ready_at timestamp with time zone;
+alter table public.generations add column if not exists completed_at timestamp with time zone;
+
+-- Cancellation: the worker run that owns the row and its Replicate predictions, for existing tables
+alter table public.generations add column if not exists run_id text;
+alter table public.generations add column if not exists prediction_ids jsonb;
+
+-- Webhook deliveries already handled, so concurrent retries post-process once, for existing tables
+alter table public.generations add column if not exists claimed_prediction_ids jsonb;
+
+-- Claims a finished prediction for post-processing in one statement; false if
+-- another delivery claimed it, the run was superseded, or it isn't the row's
+create or replace function public.claim_prediction(
+  p_generation_id uuid, p_run_id text, p_prediction_id text
+) returns boolean
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.generations
+    set claimed_prediction_ids = coalesce(claimed_prediction_ids, '[]'::jsonb) || to_jsonb(p_prediction_id)
+    where id = p_generation_id
+      and status = 'processing'
+      and (p_run_id is null or run_id is null or run_id = p_run_id)
+      and coalesce(prediction_ids, '[]'::jsonb) ? p_prediction_id
+      and not coalesce(claimed_prediction_ids, '[]'::jsonb) ? p_prediction_id;
+  return found;
+end;
+$$;
+
+revoke execute on function public.claim_prediction(uuid, text, text) from public, anon, authenticated;
+
 -- Enable RLS
 alter table public.generations enable row level security;
 
@@ -60,11 +99,86 @@ create policy if not exists "Service role can read analytics"
   on public.analytics for select
   using (false); -- This forces all reads to go through the API with service role key
 
+-- Daily rollups of the analytics events (analytics_rollup.py, run on a Modal schedule)
+create table if not exists public.analytics_daily (
+  day date not null,
+  model_name text not null,
+  event_type text not null,
+  device text not null,
+  language text not null,
+  events bigint not null,
+  constraint analytics_daily_pkey primary key (day, model_name, event_type, device, language)
+) tablespace pg_default;
+
+-- One row per user seen for a model on a day, for unique user counts
+create table if not exists public.analytics_daily_users (
+  day date not null,
+  model_name text not null,
+  user_id text not null,
+  constraint analytics_daily_users_pkey primary key (day, model_name, user_id)
+) tablespace pg_default;
+
+-- The id of the last analytics event folded into the rollups
+create table if not exists public.analytics_rollup_state (
+  name text not null,
+  last_id bigint not null default 0,
+  updated_at timestamp with time zone,
+  constraint analytics_rollup_state_pkey primary key (name)
+) tablespace pg_default;
+
+insert into public.analytics_rollup_state (name, last_id) values ('daily', 0)
+on conflict (name) do nothing;
+
+-- Service role only, like the raw events
+alter table public.analytics_daily enable row level security;
+alter table public.analytics_daily_users enable row level security;
+alter table public.analytics_rollup_state enable row level security;
+
+-- Adds a batch to the rollups and moves the cursor in one transaction; false
+-- (and no change) if another run moved the cursor since the batch was read
+create or replace function public.analytics_rollup_apply(
+  p_name text, p_expected_id bigint, p_last_id bigint, p_daily jsonb, p_users jsonb
+) returns boolean
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  update public.analytics_rollup_state
+    set last_id = p_last_id, updated_at = now()
+    where name = p_name and last_id = p_expected_id;
+  if not found then
+    return false;
+  end if;
+
+  insert into public.analytics_daily (day, model_name, event_type, device, language, events)
+    select day, model_name, event_type, device, language, events
+    from jsonb_to_recordset(p_daily)
+      as r(day date, model_name text, event_type text, device text, language text, events bigint)
+  on conflict (day, model_name, event_type, device, language)
+    do update set events = analytics_daily.events + excluded.events;
+
+  insert into public.analytics_daily_users (day, model_name, user_id)
+    select day, model_name, user_id
+    from jsonb_to_recordset(p_users) as r(day date, model_name text, user_id text)
+  on conflict do nothing;
+
+  return true;
+end;
+$$;
+
+revoke execute on function public.analytics_rollup_apply(text, bigint, bigint, jsonb, jsonb) from public, anon, authenticated;
+
 -- Storage bucket for uploads
 insert into storage.buckets (id, name, public)
 values ('uploads', 'uploads', true)
 on conflict (id) do nothing;
 
+-- Private bucket for stage checkpoints of unfinished generations (service role only, no policies)
+insert into storage.buckets (id, name, public)
+values ('checkpoints', 'checkpoints', false)
+on conflict (id) do nothing;
+
 create policy "Users can upload their own images"
   on storage.objects for insert
   with check ( bucket_id = 'uploads' and auth.uid() = owner );
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Mesh Cleanup Script
+Repairs generated meshes before resizing: merges duplicate vertices, drops
+degenerate and duplicate faces, removes small disconnected "floater"
+components and recenters the model on the ground plane (y=0).
+
+All stages use vectorized NumPy/trimesh operations.
+
+Usage:
+    python3 mesh_cleanup.py model.glb [output.glb] [--min-component-ratio 0.01]
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Components smaller than this fraction of the largest component's area (across
+# every mesh of a scene) are floaters
+MIN_COMPONENT_RATIO = 0.01
+
+# Vertex position precision (decimal digits) used to detect shared positions
+POSITION_DIGITS = 6
+
+
+def component_labels(edges, node_count):
+    """
+    Label connected components of an undirected graph.
+
+    Vectorized union-find: hook every edge's larger root onto the smaller one,
+    then compress paths by pointer jumping, until no edge spans two roots.
+    """
+    parent = np.arange(node_count)
+    if len(edges) == 0:
+        return parent
+
+    a, b = edges[:, 0], edges[:, 1]
+    while True:
+        root_a = parent[a]
+        root_b = parent[b]
+        low = np.minimum(root_a, root_b)
+        high = np.maximum(root_a, root_b)
+        spanning = low != high
+        if not spanning.any():
+            break
+        np.minimum.at(parent, high[spanning], low[spanning])
+        # Pointer jumping until every node points at its root
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+
+    # Renumber roots to 0..k-1
+    _, labels = np.unique(parent, return_inverse=True)
+    return labels
+
+
+def _merge_vertices(mesh):
+    # Keeps UV and normal seams, so textures and shading are untouched
+    mesh.merge_vertices()
+
+
+def _drop_degenerate_faces(mesh):
+    keep = mesh.nondegenerate_faces() & mesh.unique_faces()
+    if not keep.all():
+        mesh.update_faces(keep)
+    mesh.remove_unreferenced_vertices()
+    return int((~keep).sum())
+
+
+def _component_areas(mesh, area_scale=1.0):
+    """(per-face component labels, surface area of each component)"""
+    import trimesh
+
+    # Connectivity by position, so UV/normal seams don't split a component
+    _, position_ids = trimesh.grouping.unique_rows(mesh.vertices, digits=POSITION_DIGITS)
+    position_faces = position_ids[mesh.faces]
+    adjacency = trimesh.graph.face_adjacency(faces=position_faces)
+
+    labels = component_labels(adjacency, len(mesh.faces))
+    return labels, np.bincount(labels, weights=mesh.area_faces) * area_scale
+
+
+def _remove_components(mesh, labels, keep_components):
+    removed = int((~keep_components).sum())
+    if removed:
+        mesh.update_faces(keep_components[labels])
+        mesh.remove_unreferenced_vertices()
+    return removed
+
+
+def _area_scales(model):
+    """
+    World-space area factor per geometry name of a Scene (the largest over
+    the nodes using it), so components of differently scaled meshes compare
+    in world units
+    """
+    scales = {}
+    for node in model.graph.nodes_geometry:
+        transform, geometry_name = model.graph[node]
+        scale = abs(np.linalg.det(transform[:3, :3])) ** (2.0 / 3.0)
+        scales[geometry_name] = max(scales.get(geometry_name, 0.0), scale)
+    return scales
+
+
+def _remove_small_components(model, min_component_ratio):
+    """
+    Drop components whose surface area is tiny next to the largest one.
+
+    The largest component is taken over the whole model: a merged Scene has
+    one mesh per material, and a floater that ended up in a mesh of its own
+    is still small next to the main body. Meshes left empty are removed
+    from the Scene.
+    """
+    import trimesh
+
+    if isinstance(model, trimesh.Scene):
+        scales = _area_scales(model)
+        named = [(name, g) for name, g in model.geometry.items() if isinstance(g, trimesh.Trimesh)]
+    else:
+        scales = {}
+        named = [(None, model)]
+
+    components = []
+    for name, mesh in named:
+        if len(mesh.faces):
+            labels, areas = _component_areas(mesh, scales.get(name, 1.0))
+            components.append((name, mesh, labels, areas))
+    if not components:
+        return 0
+
+    threshold = max(areas.max() for _, _, _, areas in components) * min_component_ratio
+    removed = 0
+    for name, mesh, labels, areas in components:
+        removed += _remove_components(mesh, labels, areas >= threshold)
+        if name is not None and len(mesh.faces) == 0:
+            model.delete_geometry(name)
+    return removed
+
+
+def _meshes(model):
+    import trimesh
+
+    if isinstance(model, trimesh.Scene):
+        return [g for g in model.geometry.values() if isinstance(g, trimesh.Trimesh)]
+    return [model]
+
+
+def ground_model(model):
+    """Center the model on X/Z and put its lowest point on y=0"""
+    bounds = model.bounds
+    center = (bounds[0] + bounds[1]) / 2.0
+    translation = np.array([-center[0], -bounds[0][1], -center[2]])
+    model.apply_translation(translation)
+    return translation
+
+
+def cleanup_model(model, min_component_ratio=MIN_COMPONENT_RATIO, ground=True):
+    """
+    Clean a trimesh Trimesh or Scene in place.
+
+    Args:
+        model: trimesh.Trimesh or trimesh.Scene
+        min_component_ratio: Area ratio (vs. the largest component of the
+            whole model) below which disconnected components are removed
+        ground: Recenter on X/Z and move the lowest point to y=0
+
+    Returns:
+        Report dict with per-stage timings (seconds), vertex/face counts before
+        and after, and the number of removed components.
+    """
+    meshes = _meshes(model)
+    report = {
+        "vertices_before": sum(len(m.vertices) for m in meshes),
+        "faces_before": sum(len(m.faces) for m in meshes),
+        "degenerate_faces_removed": 0,
+        "components_removed": 0,
+        "timings": {"merge_vertices": 0.0, "degenerate_faces": 0.0, "small_components": 0.0, "ground": 0.0},
+    }
+    timings = report["timings"]
+
+    for mesh in meshes:
+        start = time.perf_counter()
+        _merge_vertices(mesh)
+        timings["merge_vertices"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        report["degenerate_faces_removed"] += _drop_degenerate_faces(mesh)
+        timings["degenerate_faces"] += time.perf_counter() - start
+
+    if min_component_ratio > 0:
+        start = time.perf_counter()
+        report["components_removed"] = _remove_small_components(model, min_component_ratio)
+        timings["small_components"] = time.perf_counter() - start
+
+    if ground and report["faces_before"] > 0:
+        start = time.perf_counter()
+        ground_model(model)
+        timings["ground"] = time.perf_counter() - start
+
+    report["vertices_after"] = sum(len(m.vertices) for m in meshes)
+    report["faces_after"] = sum(len(m.faces) for m in meshes)
+    return report
+
+
+def print_report(report):
+    print(f"Cleanup: vertices {report['vertices_before']} -> {report['vertices_after']}, "
+          f"faces {report['faces_before']} -> {report['faces_after']} "
+          f"({report['degenerate_faces_removed']} degenerate, {report['components_removed']} floater components removed)")
+    stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in report["timings"].items())
+    print(f"Cleanup timings: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean up a generated GLB mesh")
+    parser.add_argument("input_glb", help="Path to input GLB file")
+    parser.add_argument("output_glb", nargs="?", help="Output path (default: <input>_clean.glb)")
+    parser.add_argument("--min-component-ratio", type=float, default=MIN_COMPONENT_RATIO,
+                        help=f"Remove components below this area ratio (default: {MIN_COMPONENT_RATIO})")
+    parser.add_argument("--no-ground", action="store_true", help="Keep the original position")
+
+    args = parser.parse_args()
+
+    try:
+        import trimesh
+    except ImportError:
+        print("Error: 'trimesh' is required. Please install it: pip install trimesh")
+        sys.exit(1)
+
+    if not os.path.exists(args.input_glb):
+        print(f"Error: File {args.input_glb} not found")
+        sys.exit(1)
+
+    output = args.output_glb or f"{os.path.splitext(args.input_glb)[0]}_clean.glb"
+
+    model = trimesh.load(args.input_glb)
+    report = cleanup_model(model, args.min_component_ratio, ground=not args.no_ground)
+    print_report(report)
+    model.export(output)
+    print(f"Saved cleaned GLB to: {output}")
+
+
+if __name__ == "__main__":
+    main()
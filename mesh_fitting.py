@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Mesh Fitting Script
+Scale modes and oriented bounding box (OBB) alignment for resizing models.
+
+Scale modes:
+    exact   non-uniform, every axis hits its target (the original behaviour)
+    fit     uniform, largest scale that fits inside width x height x depth
+    width   uniform, driven by the target width only (same for height/depth)
+
+OBB alignment finds the model's principal axes (vectorized hull + PCA, then a
+vectorized yaw search for the minimum-area footprint) and rotates the model so
+they line up with X/Y/Z before measuring, so rotated models aren't distorted.
+
+Usage:
+    python3 mesh_fitting.py --benchmark
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+
+FIT_MODES = ("exact", "fit", "width", "height", "depth")
+
+# Sample directions used to collect extreme (convex hull) points
+HULL_DIRECTIONS = 256
+
+# Yaw search: +/- 45 degrees around the PCA estimate
+YAW_STEPS = 181
+
+# Rows per chunk when projecting points, bounds the temporary matrix size
+PROJECTION_CHUNK = 8192
+
+
+def compute_scale(current_dims, target_dims_m, mode="exact"):
+    """
+    Return per-axis scale factors for a scale mode.
+
+    current_dims / target_dims_m: (x, y, z) extents in meters.
+    Zero-size axes keep a factor of 1 in exact mode and are ignored otherwise.
+    """
+    current = np.asarray(current_dims, dtype=np.float64)
+    target = np.asarray(target_dims_m, dtype=np.float64)
+    valid = current > 0
+
+    if mode == "exact":
+        return np.where(valid, target / np.where(valid, current, 1.0), 1.0)
+
+    if mode == "fit":
+        if not valid.any():
+            return np.ones(3)
+        factor = np.min(target[valid] / current[valid])
+    elif mode in ("width", "height", "depth"):
+        axis = ("width", "height", "depth").index(mode)
+        factor = target[axis] / current[axis] if valid[axis] else 1.0
+    else:
+        raise ValueError(f"Unknown scale mode '{mode}', expected one of {FIT_MODES}")
+
+    return np.full(3, factor)
+
+
+def _sphere_directions(count):
+    """Evenly spread unit vectors (Fibonacci sphere)"""
+    i = np.arange(count) + 0.5
+    phi = np.arccos(1 - 2 * i / count)
+    theta = np.pi * (1 + 5 ** 0.5) * i
+    return np.column_stack([np.cos(theta) * np.sin(phi), np.cos(phi), np.sin(theta) * np.sin(phi)])
+
+
+def hull_points(points, directions=HULL_DIRECTIONS):
+    """
+    Return a subset of the convex hull's vertices.
+
+    Takes the extreme point along each of `directions` sample directions (and
+    their opposites). Every returned point is a true hull vertex, and for
+    bounding-box purposes the set is a close stand-in for the full hull.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if len(points) <= 2 * directions:
+        return points
+
+    dirs = _sphere_directions(directions).astype(np.float32)
+    centered = (points - points.mean(axis=0)).astype(np.float32)
+
+    best_max = np.full(directions, -np.inf, dtype=np.float32)
+    best_min = np.full(directions, np.inf, dtype=np.float32)
+    arg_max = np.zeros(directions, dtype=np.int64)
+    arg_min = np.zeros(directions, dtype=np.int64)
+
+    rows = np.arange(directions)
+    for start in range(0, len(centered), PROJECTION_CHUNK):
+        # (directions, chunk) keeps the argmax reductions on contiguous rows
+        proj = dirs @ centered[start:start + PROJECTION_CHUNK].T
+        chunk_arg_max = proj.argmax(axis=1)
+        chunk_arg_min = proj.argmin(axis=1)
+        chunk_max = proj[rows, chunk_arg_max]
+        chunk_min = proj[rows, chunk_arg_min]
+
+        better = chunk_max > best_max
+        best_max[better] = chunk_max[better]
+        arg_max[better] = chunk_arg_max[better] + start
+        better = chunk_min < best_min
+        best_min[better] = chunk_min[better]
+        arg_min[better] = chunk_arg_min[better] + start
+
+    return points[np.unique(np.concatenate([arg_max, arg_min]))]
+
+
+def _min_area_yaw(points_2d):
+    """Angle (radians, in [-pi/4, pi/4]) of the minimum-area rectangle around 2D points"""
+    centered = points_2d - points_2d.mean(axis=0)
+    # PCA guess for the main direction, then a vectorized search around it
+    cov = centered.T @ centered
+    eigvals, eigvecs = np.linalg.eigh(cov)
+    main = eigvecs[:, np.argmax(eigvals)]
+    guess = np.arctan2(main[1], main[0])
+
+    angles = guess + np.linspace(-np.pi / 4, np.pi / 4, YAW_STEPS)
+    cos, sin = np.cos(angles), np.sin(angles)
+    # (angles, points) coordinates along each candidate rectangle's axes
+    along = np.outer(cos, centered[:, 0]) + np.outer(sin, centered[:, 1])
+    across = np.outer(-sin, centered[:, 0]) + np.outer(cos, centered[:, 1])
+    areas = np.ptp(along, axis=1) * np.ptp(across, axis=1)
+
+    best = angles[np.argmin(areas)]
+    # Rectangles repeat every 90 degrees, pick the smallest rotation
+    return (best + np.pi / 4) % (np.pi / 2) - np.pi / 4
+
+
+def _footprint_extents(points_2d, yaw):
+    """Width and depth of 2D points in the frame rotated by yaw"""
+    cos, sin = np.cos(yaw), np.sin(yaw)
+    along = cos * points_2d[:, 0] + sin * points_2d[:, 1]
+    across = -sin * points_2d[:, 0] + cos * points_2d[:, 1]
+    return np.ptp(along), np.ptp(across)
+
+
+def _matches_ratio(width, depth, target_ratio):
+    """True if width:depth is closer to target_ratio than depth:width"""
+    log_target = np.log(target_ratio)
+    return abs(np.log(width / depth) - log_target) <= abs(np.log(depth / width) - log_target)
+
+
+def oriented_bounds(points, upright=True, target_ratio=None):
+    """
+    Compute an oriented bounding box.
+
+    Args:
+        points: (n, 3) vertex positions
+        upright: Keep world Y as the up axis and only solve for yaw (furniture
+            standing on the floor). If False, the up axis is the principal axis
+            closest to world Y, which also corrects tilt.
+        target_ratio: Target width:depth. The box is turned by a further 90
+            degrees when that matches it better; without it, the yaw is the
+            smallest rotation, so an aligned model stays as it is.
+
+    Returns:
+        (rotation, center, extents): rotation is a 3x3 matrix that rotates the
+        model so the box is axis-aligned; center/extents are in world space.
+    """
+    hull = hull_points(points)
+    centered = hull - hull.mean(axis=0)
+
+    if upright:
+        up_frame = np.eye(3)
+    else:
+        # Principal axes of the hull; the one closest to Y becomes up
+        _, eigvecs = np.linalg.eigh(centered.T @ centered)
+        up_index = np.argmax(np.abs(eigvecs[1, :]))
+        up = eigvecs[:, up_index] * np.sign(eigvecs[1, up_index])
+        # Of the other two, the one closest to X stays "width", avoiding 180 degree flips
+        others = [i for i in range(3) if i != up_index]
+        side_index = max(others, key=lambda i: abs(eigvecs[0, i]))
+        side = eigvecs[:, side_index] * np.sign(eigvecs[0, side_index])
+        forward = np.cross(side, up)
+        side = np.cross(up, forward)
+        up_frame = np.column_stack([side, up, forward])
+
+    # Yaw around the up axis, on the footprint (X/Z of the up-aligned frame)
+    local = centered @ up_frame
+    footprint = local[:, [0, 2]]
+    yaw = _min_area_yaw(footprint)
+    if target_ratio:
+        width, depth = _footprint_extents(footprint, yaw)
+        if width > 0 and depth > 0 and not _matches_ratio(width, depth, target_ratio):
+            yaw += np.pi / 2 if yaw <= 0 else -np.pi / 2
+    cos, sin = np.cos(yaw), np.sin(yaw)
+    yaw_frame = np.array([[cos, 0.0, -sin], [0.0, 1.0, 0.0], [sin, 0.0, cos]])
+
+    # Columns are the box axes in world space
+    axes = up_frame @ yaw_frame
+    rotation = axes.T
+
+    aligned = hull @ axes
+    low, high = aligned.min(axis=0), aligned.max(axis=0)
+    center = axes @ ((low + high) / 2.0)
+    return rotation, center, high - low
+
+
+def model_points(model):
+    """All vertex positions of a Trimesh or Scene, in world space"""
+    import trimesh
+
+    if not isinstance(model, trimesh.Scene):
+        return np.asarray(model.vertices)
+
+    chunks = []
+    for node in model.graph.nodes_geometry:
+        transform, geometry_name = model.graph[node]
+        geometry = model.geometry[geometry_name]
+        if hasattr(geometry, "vertices") and len(geometry.vertices):
+            chunks.append(trimesh.transform_points(geometry.vertices, transform))
+    return np.vstack(chunks) if chunks else np.zeros((0, 3))
+
+
+def align_to_obb(model, upright=True, target_ratio=None):
+    """
+    Rotate a Trimesh or Scene in place so its OBB is axis-aligned.
+
+    The rotation happens around the box center; target_ratio (width:depth)
+    picks which footprint side ends up on X. Returns the 4x4 transform.
+    """
+    rotation, center, extents = oriented_bounds(model_points(model), upright=upright, target_ratio=target_ratio)
+
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation
+    matrix[:3, 3] = center - rotation @ center
+    model.apply_transform(matrix)
+
+    yaw = np.degrees(np.arctan2(rotation[0, 2], rotation[0, 0]))
+    print(f"OBB alignment: rotated {yaw:.1f} deg around up, box extents {np.round(extents, 4)}")
+    return matrix
+
+
+def _benchmark_mesh(faces, dims, yaw):
+    """Ellipsoid with roughly `faces` faces, known extents and a known yaw"""
+    import trimesh
+
+    count = max(int(np.sqrt(faces / 4.0)), 8)
+    mesh = trimesh.creation.uv_sphere(radius=0.5, count=[count, count])
+    mesh.apply_scale(dims)
+    matrix = trimesh.transformations.rotation_matrix(np.radians(yaw), [0, 1, 0])
+    mesh.apply_transform(matrix)
+    return mesh
+
+
+def _has_scipy():
+    try:
+        import scipy  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def benchmark(face_counts=(20000, 100000, 250000, 500000), repeats=3):
+    """Time hull + OBB on synthetic rotated meshes and check the recovered extents"""
+    import trimesh
+
+    dims = np.array([2.0, 0.9, 0.8])
+    results = []
+    print(f"{'faces':>9} {'hull pts':>9} {'hull ms':>9} {'obb ms':>9} {'extent err':>11} {'ref obb ms':>11}")
+    for faces in face_counts:
+        # Past 45 degrees: the target ratio has to pick the right side for X
+        mesh = _benchmark_mesh(faces, dims, yaw=63.0)
+        points = np.asarray(mesh.vertices)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            hull = hull_points(points)
+        hull_ms = (time.perf_counter() - start) / repeats * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            _, _, extents = oriented_bounds(points, target_ratio=dims[0] / dims[2])
+        obb_ms = (time.perf_counter() - start) / repeats * 1000
+
+        error = np.abs(extents - dims).max()
+
+        # trimesh's exact OBB needs scipy (qhull); report it when available
+        reference_ms = None
+        if _has_scipy():
+            start = time.perf_counter()
+            trimesh.bounds.oriented_bounds(mesh)
+            reference_ms = (time.perf_counter() - start) * 1000
+
+        reference = f"{reference_ms:>11.1f}" if reference_ms is not None else f"{'n/a':>11}"
+        print(f"{len(mesh.faces):>9} {len(hull):>9} {hull_ms:>9.1f} {obb_ms:>9.1f} {error:>11.5f} {reference}")
+        results.append({
+            "faces": len(mesh.faces),
+            "hull_points": len(hull),
+            "hull_ms": hull_ms,
+            "obb_ms": obb_ms,
+            "extent_error": float(error),
+            "reference_obb_ms": reference_ms,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OBB fitting utilities")
+    parser.add_argument("--benchmark", action="store_true", help="Benchmark OBB fitting on 20k-500k face meshes")
+    parser.add_argument("--repeats", type=int, default=3, help="Timing repeats per mesh (default: 3)")
+
+    args = parser.parse_args()
+
+    if not args.benchmark:
+        parser.print_help()
+        sys.exit(1)
+
+    try:
+        import trimesh
+    except ImportError:
+        print("Error: 'trimesh' is required. Please install it: pip install trimesh")
+        sys.exit(1)
+
+    benchmark(repeats=args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Draw-Call Merging
+Collapses a multi-part model into as few meshes as its materials allow, so
+model-viewer and AR Quick Look issue one draw call per material instead of
+one per part. Catalog models often arrive as a dozen nodes (legs, frame,
+cushions) with their own materials.
+
+Node transforms are baked into the vertices and the scene graph is
+flattened. Parts whose materials differ only in base color (a texture or a
+flat color) are merged into one mesh: their textures are packed into an
+atlas, flat colors become small swatches in it, and the UVs are remapped
+onto their tile. Parts with other textures (normal, metallic-roughness,
+...), tiling UVs or textures too large for the atlas are only merged with
+parts sharing their exact material. Metallic, roughness, emissive, alpha
+and double-sided settings are never mixed.
+
+Usage:
+    python3 mesh_merge.py model.glb [output.glb]
+    python3 mesh_merge.py model.glb --report-only
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import namedtuple
+import numpy as np
+
+# Largest atlas side in pixels; more tiles than fit go into a second atlas
+MAX_ATLAS_SIZE = 4096
+
+# Edge pixels repeated around each tile so mipmaps don't bleed neighbours in
+PADDING = 4
+
+# Side of a flat-color swatch tile (before padding)
+SWATCH_SIZE = 4
+
+# UVs this far outside [0, 1] mean a tiling texture, which can't share an atlas
+UV_TOLERANCE = 1e-3
+
+# One geometry instance in world space; `source` is the scene's mesh, which keeps the visuals
+Part = namedtuple("Part", "source vertices faces normals")
+
+
+def _pbr(material):
+    if material is None:
+        return None
+    return material if hasattr(material, "baseColorTexture") else material.to_pbr()
+
+
+def _color_factor(material):
+    """baseColorFactor as RGBA uint8 (white when unset)"""
+    from trimesh.visual.color import to_rgba
+
+    if material.baseColorFactor is None:
+        return np.full(4, 255, dtype=np.uint8)
+    return np.asarray(to_rgba(material.baseColorFactor), dtype=np.uint8).reshape(4)
+
+
+def _atlas_key(material):
+    """Settings parts must share to use one atlas material; None if it can't be atlased"""
+    other_textures = ("metallicRoughnessTexture", "normalTexture", "occlusionTexture", "emissiveTexture")
+    if any(getattr(material, name, None) is not None for name in other_textures):
+        return None
+    emissive = material.emissiveFactor
+    return (
+        None if material.metallicFactor is None else round(float(material.metallicFactor), 4),
+        None if material.roughnessFactor is None else round(float(material.roughnessFactor), 4),
+        None if emissive is None else tuple(np.round(np.asarray(emissive, dtype=float), 4)),
+        material.alphaMode,
+        None if material.alphaCutoff is None else round(float(material.alphaCutoff), 4),
+        bool(material.doubleSided),
+    )
+
+
+def _classify(mesh):
+    """
+    How a part can be merged: ("atlas", key, tile id, uv), ("material", key),
+    ("colors", None) or ("plain", None).
+    """
+    visual = mesh.visual
+    if visual.kind != "texture" or getattr(visual, "material", None) is None:
+        return ("colors", None) if visual.kind in ("vertex", "face") else ("plain", None)
+
+    material = _pbr(visual.material)
+    uv = visual.uv
+    key = _atlas_key(material)
+    texture = material.baseColorTexture
+    factor = _color_factor(material)
+
+    if key is not None and texture is None:
+        return ("atlas", key, ("swatch", tuple(factor)), None)
+    if key is not None and uv is not None and len(uv) == len(mesh.vertices):
+        width, height = texture.size
+        in_range = uv.min() >= -UV_TOLERANCE and uv.max() <= 1 + UV_TOLERANCE if len(uv) else True
+        if in_range and max(width, height) + 2 * PADDING <= MAX_ATLAS_SIZE:
+            return ("atlas", key, ("texture", id(texture), tuple(factor)), np.clip(uv, 0.0, 1.0))
+    return ("material", (id(visual.material), uv is None))
+
+
+def _tile_pixels(material, tile_id, channels):
+    """Padded tile image as a (h, w, channels) uint8 array, base color factor baked in"""
+    factor = np.asarray(tile_id[-1], dtype=np.float32) / 255.0
+    if tile_id[0] == "swatch":
+        pixels = np.ones((SWATCH_SIZE, SWATCH_SIZE, 4), dtype=np.float32) * 255.0
+    else:
+        image = material.baseColorTexture
+        pixels = np.asarray(image.convert("RGBA"), dtype=np.float32)
+    if not np.all(factor == 1.0):
+        pixels = pixels * factor
+    pixels = np.clip(np.rint(pixels), 0, 255).astype(np.uint8)[:, :, :channels]
+    return np.pad(pixels, ((PADDING, PADDING), (PADDING, PADDING), (0, 0)), mode="edge")
+
+
+def _has_alpha(material):
+    texture = material.baseColorTexture
+    if _color_factor(material)[3] < 255:
+        return True
+    return texture is not None and ("A" in texture.mode or "transparency" in texture.info)
+
+
+def pack_tiles(sizes, max_size=MAX_ATLAS_SIZE):
+    """
+    Shelf-pack (width, height) tiles.
+
+    Returns a list of atlases, each (width, height, {tile index: (x, y)}).
+    Tallest tiles go first; a tile that doesn't fit starts a new atlas.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+
+    def pack(width):
+        atlases = []
+        placed, x, y, shelf, used = {}, 0, 0, 0, 0
+        for i in order:
+            w, h = sizes[i]
+            if x + w > width:
+                x, y, shelf = 0, y + shelf, 0
+            if y + h > max_size:
+                atlases.append((used, y, placed))
+                placed, x, y, shelf, used = {}, 0, 0, 0, 0
+            placed[i] = (x, y)
+            x += w
+            used = max(used, x)
+            shelf = max(shelf, h)
+        atlases.append((used, y + shelf, placed))
+        # Block-compressed formats want multiples of 4
+        return [(-(-w // 4) * 4, -(-h // 4) * 4, p) for w, h, p in atlases]
+
+    # Shelf widths worth trying: each row holding the first k tallest tiles
+    widths = {min(max_size, w) for w in np.cumsum([sizes[i][0] for i in order])}
+    widths.add(max(w for w, _ in sizes))
+    best = None
+    for width in sorted(widths):
+        atlases = pack(width)
+        cost = (len(atlases), sum(w * h for w, h, _ in atlases), max(max(w, h) for w, h, _ in atlases))
+        if best is None or cost < best[0]:
+            best = (cost, atlases)
+    return best[1]
+
+
+def flatten_parts(scene):
+    """
+    Every geometry instance of a Scene in world space.
+
+    Returns a list of Part tuples; the source meshes (and their materials)
+    are shared, not copied.
+    """
+    import trimesh
+
+    parts, others = [], []
+    for node in scene.graph.nodes_geometry:
+        matrix, geometry_name = scene.graph[node]
+        mesh = scene.geometry[geometry_name]
+        if not isinstance(mesh, trimesh.Trimesh):
+            others.append(mesh.copy().apply_transform(matrix))
+            continue
+        if not len(mesh.faces):
+            continue
+
+        vertices = trimesh.transformations.transform_points(mesh.vertices, matrix)
+        faces = mesh.faces
+        normals = None
+        if "vertex_normals" in mesh._cache:
+            normals = mesh.vertex_normals @ np.linalg.inv(matrix[:3, :3])
+            length = np.linalg.norm(normals, axis=1, keepdims=True)
+            normals = normals / np.where(length > 0, length, 1.0)
+        # A mirroring transform turns the triangles inside out
+        if np.linalg.det(matrix[:3, :3]) < 0:
+            faces = faces[:, ::-1]
+        parts.append(Part(mesh, vertices, faces, normals))
+    return parts, others
+
+
+def _concatenate(parts, uvs=None, material=None, colors=False):
+    import trimesh
+
+    offsets = np.cumsum([0] + [len(p.vertices) for p in parts])
+    vertices = np.concatenate([p.vertices for p in parts])
+    faces = np.concatenate([p.faces + offset for p, offset in zip(parts, offsets)])
+    normals = None
+    if all(p.normals is not None for p in parts):
+        normals = np.concatenate([p.normals for p in parts])
+
+    if colors:
+        visual = trimesh.visual.ColorVisuals(
+            vertex_colors=np.concatenate([p.source.visual.vertex_colors for p in parts]))
+    elif material is not None:
+        uv = np.concatenate(uvs) if uvs is not None else None
+        visual = trimesh.visual.TextureVisuals(uv=uv, material=material)
+    else:
+        visual = None
+    return trimesh.Trimesh(vertices, faces, vertex_normals=normals, visual=visual, process=False)
+
+
+def _merge_atlas_group(parts, name):
+    """
+    Merge parts sharing an atlas key; returns the merged meshes (one per
+    atlas) and their atlas sizes.
+    """
+    import trimesh
+    from PIL import Image
+
+    tile_ids = list(dict.fromkeys(entry[1] for entry in parts))
+    first_material = {}
+    for part, tile_id, _ in parts:
+        first_material.setdefault(tile_id, _pbr(part.source.visual.material))
+    template = first_material[tile_ids[0]]
+
+    # One tile: keep the material as it is, nothing to remap
+    if len(tile_ids) == 1:
+        material = parts[0][0].source.visual.material
+        uvs = None if tile_ids[0][0] == "swatch" else [uv for _, _, uv in parts]
+        return [_concatenate([part for part, _, _ in parts], uvs=uvs, material=material)], []
+
+    channels = 4 if any(_has_alpha(first_material[t]) for t in tile_ids) else 3
+    tiles = [_tile_pixels(first_material[t], t, channels) for t in tile_ids]
+    atlases = pack_tiles([(tile.shape[1], tile.shape[0]) for tile in tiles])
+
+    merged, sizes = [], []
+    for index, (width, height, placed) in enumerate(atlases):
+        pixels = np.zeros((height, width, channels), dtype=np.uint8)
+        for i, (x, y) in placed.items():
+            pixels[y:y + tiles[i].shape[0], x:x + tiles[i].shape[1]] = tiles[i]
+        image = Image.fromarray(pixels, "RGBA" if channels == 4 else "RGB")
+        material = trimesh.visual.material.PBRMaterial(
+            name=f"{name}_atlas{index}" if len(atlases) > 1 else f"{name}_atlas",
+            baseColorTexture=image,
+            metallicFactor=template.metallicFactor,
+            roughnessFactor=template.roughnessFactor,
+            emissiveFactor=template.emissiveFactor,
+            alphaMode=template.alphaMode,
+            alphaCutoff=template.alphaCutoff,
+            doubleSided=template.doubleSided,
+        )
+
+        members, uvs = [], []
+        for part, tile_id, uv in parts:
+            tile = tile_ids.index(tile_id)
+            if tile not in placed:
+                continue
+            x, y = placed[tile]
+            tile_h, tile_w = tiles[tile].shape[:2]
+            inner_w, inner_h = tile_w - 2 * PADDING, tile_h - 2 * PADDING
+            if uv is None:
+                uv = np.full((len(part.vertices), 2), 0.5)
+            # trimesh UVs have v pointing up, image rows go down
+            u = (x + PADDING + uv[:, 0] * inner_w) / width
+            v = 1.0 - (y + PADDING + (1.0 - uv[:, 1]) * inner_h) / height
+            members.append(part)
+            uvs.append(np.column_stack([u, v]))
+        merged.append(_concatenate(members, uvs=uvs, material=material))
+        sizes.append((width, height))
+    return merged, sizes
+
+
+def _texture_pixels(materials):
+    pixels = 0
+    for material in materials:
+        material = _pbr(material)
+        for name in ("baseColorTexture", "metallicRoughnessTexture", "normalTexture",
+                     "occlusionTexture", "emissiveTexture"):
+            texture = getattr(material, name, None)
+            if texture is not None:
+                pixels += texture.size[0] * texture.size[1]
+    return pixels
+
+
+def _materials(meshes):
+    materials = {}
+    for mesh in meshes:
+        material = getattr(mesh.visual, "material", None)
+        if mesh.visual.kind == "texture" and material is not None:
+            materials[id(material)] = material
+    return list(materials.values())
+
+
+def merge_model(model):
+    """
+    Flatten and merge a trimesh Scene by material.
+
+    Returns (merged model, report). The model is a single Trimesh when
+    everything fits one material, otherwise a Scene with one node per
+    merged mesh. A Trimesh input is returned unchanged.
+    """
+    import trimesh
+
+    start = time.perf_counter()
+    if not isinstance(model, trimesh.Scene):
+        report = {"nodes_before": 1, "nodes_after": 1, "draw_calls_before": 1, "draw_calls_after": 1}
+        report["seconds"] = time.perf_counter() - start
+        return model, report
+
+    timings = {}
+    graph = model.graph
+    report = {
+        "nodes_before": len([n for n in graph.nodes if n != graph.base_frame]),
+        "draw_calls_before": len(graph.nodes_geometry),
+        "instances_flattened": len(graph.nodes_geometry) - len(model.geometry),
+    }
+
+    stage = time.perf_counter()
+    parts, others = flatten_parts(model)
+    materials_before = _materials(part.source for part in parts)
+    report["materials_before"] = len(materials_before)
+    report["texture_pixels_before"] = _texture_pixels(materials_before)
+    timings["flatten"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    groups = {}
+    for part in parts:
+        kind = _classify(part.source)
+        groups.setdefault((kind[0], kind[1]), []).append((part,) + kind[2:])
+    timings["group"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    merged, atlases = [], []
+    for index, ((kind, _), group) in enumerate(groups.items()):
+        members = [entry[0] for entry in group]
+        visual = members[0].source.visual
+        if kind == "atlas":
+            name = getattr(_pbr(visual.material), "name", None) or "material"
+            results, sizes = _merge_atlas_group(group, name if len(groups) == 1 else f"{name}_{index}")
+            merged.extend(results)
+            atlases.extend(sizes)
+        elif kind == "material":
+            uvs = None if visual.uv is None else [part.source.visual.uv for part in members]
+            merged.append(_concatenate(members, uvs=uvs, material=visual.material))
+        elif kind == "colors":
+            merged.append(_concatenate(members, colors=True))
+        else:
+            merged.append(_concatenate(members))
+    timings["merge"] = time.perf_counter() - stage
+
+    if len(merged) == 1 and not others:
+        result = merged[0]
+    else:
+        result = trimesh.Scene()
+        for index, mesh in enumerate(merged + others):
+            result.add_geometry(mesh, node_name=f"merged_{index}", geom_name=f"merged_{index}")
+
+    materials_after = _materials(merged)
+    report.update({
+        "nodes_after": len(merged) + len(others),
+        "draw_calls_after": len(merged) + len(others),
+        "materials_after": len(materials_after),
+        "texture_pixels_after": _texture_pixels(materials_after),
+        "atlases": atlases,
+        "timings": timings,
+        "seconds": time.perf_counter() - start,
+    })
+    return result, report
+
+
+def print_report(report):
+    line = (f"Merge: {report['nodes_before']} nodes -> {report['nodes_after']}, "
+            f"{report['draw_calls_before']} draw calls -> {report['draw_calls_after']}")
+    if "materials_before" in report:
+        line += f", {report['materials_before']} materials -> {report['materials_after']}"
+    print(line)
+    if report.get("atlases"):
+        sizes = ", ".join(f"{w}x{h}" for w, h in report["atlases"])
+        print(f"Merge atlas: {sizes}, texture pixels {report['texture_pixels_before']} -> {report['texture_pixels_after']}")
+    if report.get("instances_flattened"):
+        print(f"Merge: {report['instances_flattened']} instanced parts copied into the merged mesh")
+    if "timings" in report:
+        stages = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in report["timings"].items())
+        print(f"Merge timings: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge a GLB's parts by material to cut draw calls")
+    parser.add_argument("input_glb", help="Path to input GLB file")
+    parser.add_argument("output_glb", nargs="?", help="Output path (default: <input>_merged.glb)")
+    parser.add_argument("--report-only", action="store_true", help="Print the merge report without saving")
+
+    args = parser.parse_args()
+
+    try:
+        import trimesh
+    except ImportError:
+        print("Error: 'trimesh' is required. Please install it: pip install trimesh")
+        sys.exit(1)
+
+    if not os.path.exists(args.input_glb):
+        print(f"Error: File {args.input_glb} not found")
+        sys.exit(1)
+
+    model, report = merge_model(trimesh.load(args.input_glb))
+    print_report(report)
+    if args.report_only:
+        return
+
+    output = args.output_glb or f"{os.path.splitext(args.input_glb)[0]}_merged.glb"
+    model.export(output)
+    before, after = os.path.getsize(args.input_glb), os.path.getsize(output)
+    print(f"File size: {before / 1024:.1f} KB -> {after / 1024:.1f} KB ({(after - before) / max(before, 1):+.1%})")
+    print(f"Saved merged GLB to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,25 @@
 """
 Resize and Convert Script
 Resizes a GLB model to specific dimensions and generates a USDZ version.
+
+Multi-part models are merged into one mesh per material, with their
+textures packed into an atlas (mesh_merge.py), and exported meshes are
+reordered for the GPU vertex cache (mesh_optimize.py).
+
+Several sizes of the same piece can be made in one run: the model is loaded
+and cleaned once, each size is exported from it, and all USDZ conversions
+share one Blender session.
+
+Usage:
+    python3 resize_and_convert.py model.glb 152,144,30
+    python3 resize_and_convert.py stol.glb 85,75,85 120,75,85 160,75,90
+    python3 resize_and_convert.py stol.glb 85,75,85 120,75,85 --index catalog_index.sqlite
 """
 
 import os
 import sys
+import json
 import argparse
-import subprocess
 import tempfile
 import shutil
 import numpy as np
@@ -19,7 +32,14 @@ except ImportError:
     print("Error: 'trimesh' is required. Please install it: pip install trimesh")
     sys.exit(1)
 
-BLENDER_PATH = "/Applications/Blender.app/Contents/MacOS/Blender"
+from blender_probe import get_blender_info, can_convert_to_usdz
+from usdz_packager import package_usdz, validate_usdz, remove_layer_files
+from mesh_cleanup import cleanup_model, print_report, ground_model
+from mesh_fitting import FIT_MODES, compute_scale, align_to_obb
+from mesh_optimize import optimize_model, print_report as print_optimize_report
+from mesh_merge import merge_model, print_report as print_merge_report
+from glb_io import scale_glb
+from subprocess_supervisor import run_supervised, blender_limits, describe
 
 def get_model_bounds(mesh):
     """Get the actual dimensions of the model"""
@@ -27,28 +47,67 @@ def get_model_bounds(mesh):
     dimensions = bounds[1] - bounds[0]
     return dimensions
 
-def resize_glb(input_path, target_dims_cm, output_path):
+def target_ratio(target_dims_list):
     """
-    Resize GLB to target dimensions (in cm).
-    target_dims_cm: tuple (width, height, depth)
+    Width:depth for OBB alignment, or None when the sizes disagree on which
+    side is longer (the aligned model then keeps its smallest rotation)
+    """
+    ratios = [float(dims[0]) / float(dims[2]) for dims in target_dims_list if float(dims[2]) > 0]
+    if not ratios or not (all(r >= 1 for r in ratios) or all(r <= 1 for r in ratios)):
+        return None
+    return ratios[0]
+
+def load_model(input_path, cleanup=True, obb=False, optimize=True, merge=True, target_ratio=None):
+    """
+    Load a GLB and prepare it for measuring and export.
+
+    cleanup: repair the mesh and ground it on y=0
+    obb: rotate the model onto its oriented bounding box axes
+    target_ratio: target width:depth, picks which footprint side the OBB puts on X
+    optimize: reorder triangles and vertices for GPU rendering (mesh_optimize)
+    merge: one mesh per material, textures in an atlas (mesh_merge)
     """
     print(f"Loading GLB: {input_path}")
     
-    # Load mesh
-    try:
-        scene = trimesh.load(input_path, force='mesh')
-    except Exception as e:
-        # Fallback for scenes
-        scene = trimesh.load(input_path)
+    if merge:
+        # Flatten the parts ourselves: force='mesh' bakes every material into extra textures
+        scene, report = merge_model(trimesh.load(input_path))
+        print_merge_report(report)
+    else:
+        try:
+            scene = trimesh.load(input_path, force='mesh')
+        except Exception as e:
+            # Fallback for scenes
+            scene = trimesh.load(input_path)
+    
+    # Clean first so duplicate vertices and floaters don't skew the bounds
+    if cleanup:
+        print_report(cleanup_model(scene))
     
+    # Straighten rotated models so width/height/depth map onto the right axes
+    if obb:
+        align_to_obb(scene, target_ratio=target_ratio)
+        if cleanup:
+            ground_model(scene)
+
+    # Order only: scaling later keeps it, so every size variant gets it for free
+    if optimize:
+        print_optimize_report(optimize_model(scene))
+
+    return scene
+
+def export_scaled(model, target_dims_cm, output_path, mode="exact"):
+    """
+    Scale a loaded model to target dimensions (in cm) and export it.
+    Returns the final dimensions (cm).
+    """
     # Handle Scene vs Mesh
-    if isinstance(scene, trimesh.Scene):
+    if isinstance(model, trimesh.Scene):
         # Get bounds of the scene
-        bounds = scene.bounds
+        bounds = model.bounds
         current_dims = bounds[1] - bounds[0]
     else:
-        mesh = scene
-        bounds = mesh.bounds
+        bounds = model.bounds
         current_dims = bounds[1] - bounds[0]
 
     print(f"Current dimensions (m): {current_dims}")
@@ -58,69 +117,145 @@ def resize_glb(input_path, target_dims_cm, output_path):
     target_h_m = target_dims_cm[1] / 100.0
     target_d_m = target_dims_cm[2] / 100.0
     
-    # Calculate scale factors for each axis
-    # Avoid division by zero
-    scale_x = target_w_m / current_dims[0] if current_dims[0] > 0 else 1
-    scale_y = target_h_m / current_dims[1] if current_dims[1] > 0 else 1
-    scale_z = target_d_m / current_dims[2] if current_dims[2] > 0 else 1
+    # Calculate scale factors for each axis (zero-size axes are left alone)
+    scale_x, scale_y, scale_z = compute_scale(current_dims, (target_w_m, target_h_m, target_d_m), mode)
 
     print(f"Target dimensions (m): {target_w_m:.2f}, {target_h_m:.2f}, {target_d_m:.2f}")
     print(f"Axis scale factors: X={scale_x:.4f}, Y={scale_y:.4f}, Z={scale_z:.4f}")
-    print(f"Applying Non-Uniform Scale (exact dimensions)")
+    if mode == "exact":
+        print(f"Applying Non-Uniform Scale (exact dimensions)")
+    else:
+        print(f"Applying Uniform Scale (mode: {mode})")
 
-    # Apply non-uniform scaling to match exact dimensions
     matrix = np.eye(4)
     matrix[0,0] = scale_x
     matrix[1,1] = scale_y
     matrix[2,2] = scale_z
     
-    if isinstance(scene, trimesh.Scene):
-        scene.apply_transform(matrix)
-        # Update bounds to show user the final result
-        new_bounds = scene.bounds
-        new_dims = new_bounds[1] - new_bounds[0]
-        print(f"Final dimensions (cm): {new_dims * 100}")
-        scene.export(output_path)
-    else:
-        mesh.apply_transform(matrix)
-        new_bounds = mesh.bounds
-        new_dims = new_bounds[1] - new_bounds[0]
-        print(f"Final dimensions (cm): {new_dims * 100}")
-        mesh.export(output_path)
+    model.apply_transform(matrix)
+    # Update bounds to show user the final result
+    new_bounds = model.bounds
+    new_dims = new_bounds[1] - new_bounds[0]
+    print(f"Final dimensions (cm): {new_dims * 100}")
+    model.export(output_path)
         
     print(f"Saved resized GLB to: {output_path}")
+    return new_dims * 100
+
+def resize_glb(input_path, target_dims_cm, output_path, cleanup=True, mode="exact", obb=False, optimize=True,
+               merge=True):
+    """
+    Resize GLB to target dimensions (in cm).
+    target_dims_cm: tuple (width, height, depth)
+    cleanup: repair the mesh and ground it on y=0 before measuring
+    mode: scale mode, one of mesh_fitting.FIT_MODES (exact, fit, width, height, depth)
+    obb: rotate the model onto its oriented bounding box axes before measuring
+    optimize: reorder triangles and vertices for GPU vertex cache and fetch locality
+    merge: merge parts sharing a material and atlas their textures, to cut draw calls
+    """
+    model = load_model(input_path, cleanup=cleanup, obb=obb, optimize=optimize, merge=merge,
+                       target_ratio=target_ratio([target_dims_cm]))
+    return export_scaled(model, target_dims_cm, output_path, mode=mode)
+
+def resize_glb_variants(input_path, variants, cleanup=True, mode="exact", obb=False, optimize=True, merge=True):
+    """
+    Export several sizes of one model, loading and cleaning it only once.
+
+    The first size goes through trimesh; the others rescale its GLB bytes
+    (glb_io.scale_glb), so textures are encoded once rather than per size.
+
+    variants: list of (target_dims_cm, output_path)
+    Returns the final dimensions (cm) of each variant.
+    """
+    model = load_model(input_path, cleanup=cleanup, obb=obb, optimize=optimize, merge=merge,
+                       target_ratio=target_ratio([dims for dims, _ in variants]))
+    current_dims = get_model_bounds(model)
+    scales = [np.asarray(compute_scale(current_dims, np.asarray(dims) / 100.0, mode)) for dims, _ in variants]
+
+    results = []
+    base = None
+    for index, ((target_dims_cm, output_path), scale) in enumerate(zip(variants, scales), 1):
+        print(f"\nVariant {index}/{len(variants)}: {format_dims(target_dims_cm)} cm")
+        if base is None:
+            results.append(export_scaled(model, target_dims_cm, output_path, mode=mode))
+            with open(output_path, "rb") as f:
+                base, base_scale = f.read(), scale
+            continue
+
+        print(f"Axis scale factors: X={scale[0]:.4f}, Y={scale[1]:.4f}, Z={scale[2]:.4f}")
+        with open(output_path, "wb") as f:
+            f.write(scale_glb(base, scale / base_scale))
+        new_dims = current_dims * scale * 100
+        print(f"Final dimensions (cm): {new_dims}")
+        print(f"Saved resized GLB to: {output_path}")
+        results.append(new_dims)
+    return results
+
+def format_dims(dims):
+    return "x".join(f"{d:g}" for d in dims)
+
+def unique_sizes(sizes):
+    """Sizes in order without repeats; file names and labels come from format_dims"""
+    seen = set()
+    unique = []
+    for dims in sizes:
+        if format_dims(dims) not in seen:
+            seen.add(format_dims(dims))
+            unique.append(dims)
+    return unique
 
 def convert_glb_to_usdz_blender(glb_path, usdz_path):
     """
     Convert GLB to USDZ using Blender headless.
     """
-    print("Converting to USDZ using Blender...")
+    return convert_glbs_to_usdz_blender([(glb_path, usdz_path)])[0]
+
+def convert_glbs_to_usdz_blender(pairs):
+    """
+    Convert several GLBs to USDZ in a single headless Blender session.
+
+    pairs: list of (glb_path, usdz_path)
+    Returns a list of booleans, one per pair.
+    """
+    print(f"Converting {len(pairs)} model(s) to USDZ using Blender...")
     
-    if not os.path.exists(BLENDER_PATH):
-        print(f"Error: Blender not found at {BLENDER_PATH}")
-        return False
+    # Cached capability probe: fail instantly instead of launching Blender for nothing
+    blender = get_blender_info()
+    if not can_convert_to_usdz(blender):
+        print(f"Error: Blender cannot produce USDZ: {blender['error'] or 'USD exporter unavailable'}")
+        return [False] * len(pairs)
 
-    # Blender script to execute
+    # Older Blender can only write .usdc, which we package ourselves
+    jobs = []
+    for glb_path, usdz_path in pairs:
+        usdc_path = os.path.splitext(usdz_path)[0] + '.usdc'
+        export_path = usdz_path if blender["usdz_export"] else usdc_path
+        jobs.append((os.path.abspath(glb_path), os.path.abspath(export_path)))
+
+    # Blender script to execute: one factory reset + import + export per model
     blender_script_content = f"""
 import bpy
 import sys
-import os
+import json
+
+JOBS = json.loads({json.dumps(json.dumps(jobs))})
 
 def convert():
-    # Clear existing data
-    bpy.ops.wm.read_factory_settings(use_empty=True)
-    
-    glb_in = "{os.path.abspath(glb_path)}"
-    usdz_out = "{os.path.abspath(usdz_path)}"
-    
-    print(f"Importing: {{glb_in}}")
-    bpy.ops.import_scene.gltf(filepath=glb_in)
+    failed = 0
+    for glb_in, usd_out in JOBS:
+        # Clear existing data
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        
+        print(f"Importing: {{glb_in}}")
+        print(f"Exporting: {{usd_out}}")
+        try:
+            bpy.ops.import_scene.gltf(filepath=glb_in)
+            bpy.ops.wm.usd_export(filepath=usd_out)
+        except Exception as e:
+            print(f"Error converting {{glb_in}}: {{e}}")
+            failed += 1
     
-    print(f"Exporting: {{usdz_out}}")
-    try:
-        bpy.ops.wm.usd_export(filepath=usdz_out)
-    except Exception as e:
-        print(f"Error exporting USD: {{e}}")
+    if failed == len(JOBS):
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -134,52 +269,82 @@ if __name__ == "__main__":
         
     # Run Blender
     cmd = [
-        BLENDER_PATH,
+        blender["path"],
         "--background",
         "--python", script_path
     ]
     
-    # Suppress output unless error
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    # Cleanup script
-    if os.path.exists(script_path):
-        os.remove(script_path)
-    
-    if result.returncode != 0:
-        print("Blender Error:")
-        print(result.stderr)
-        print(result.stdout)
-        return False
+    # Blender's output is streamed as it runs; a hung or runaway Blender is killed
+    try:
+        run = run_supervised(cmd, prefix="[blender] ", **blender_limits())
+    finally:
+        # Cleanup script
+        if os.path.exists(script_path):
+            os.remove(script_path)
+
+    if run["status"] != "ok":
+        print(f"Error: Blender {describe(run)}")
+        return [False] * len(pairs)
+
+    results = [_finish_usdz(usdz_path, run["output"]) for _, usdz_path in pairs]
+    # Only once every layer is packaged: variants exported to one folder share textures/
+    remove_layer_files([os.path.splitext(usdz_path)[0] + '.usdc' for _, usdz_path in pairs])
+    return results
+
+def _finish_usdz(usdz_path, blender_stdout):
+    """Check one Blender output, packaging a .usdc export into USDZ if needed"""
+    usdc_path = os.path.splitext(usdz_path)[0] + '.usdc'
             
     # Check if output file exists
     if os.path.exists(usdz_path):
         print(f"USDZ created at: {usdz_path}")
         return True
     else:
-        # Check for .usdc
-        usdc_path = usdz_path.replace('.usdz', '.usdc')
+        # Salvage a .usdc export by packaging it with its textures
         if os.path.exists(usdc_path):
-             print(f"Blender exported .usdc instead. Renaming/Zipping might be needed.")
-             return False
-        print("Error: Output file not found after Blender run.")
-        print(result.stdout)
+            print(f"Blender exported .usdc, packaging into USDZ...")
+            package_usdz(usdc_path, usdz_path)
+            problems = validate_usdz(usdz_path)
+            if problems:
+                print(f"Error: Packaged USDZ is invalid: {'; '.join(problems)}")
+                return False
+            print(f"USDZ created at: {usdz_path}")
+            return True
+        print(f"Error: {usdz_path} not found after Blender run.")
+        print(blender_stdout)
         return False
 
+def parse_dims(text):
+    """Parse 'width,height,depth' (cm); raises ValueError(text) if malformed"""
+    try:
+        dims = [float(x) for x in text.split(',')]
+    except ValueError:
+        raise ValueError(text)
+    if len(dims) != 3 or min(dims) <= 0:
+        raise ValueError(text)
+    return dims
+
 def main():
     parser = argparse.ArgumentParser(description="Resize GLB and convert to USDZ")
     parser.add_argument("input_glb", help="Path to input GLB file")
-    parser.add_argument("dimensions", help="Target dimensions in cm: width,height,depth (e.g. 152,144,30)")
+    parser.add_argument("dimensions", nargs="+",
+                        help="Target dimensions in cm: width,height,depth (e.g. 152,144,30); "
+                             "give several for size variants (e.g. 85,75,85 120,75,85)")
+    parser.add_argument("--no-cleanup", action="store_true", help="Skip mesh cleanup before resizing")
+    parser.add_argument("--mode", choices=FIT_MODES, default="exact",
+                        help="exact: non-uniform; fit: uniform fit-inside; width/height/depth: uniform by one dimension")
+    parser.add_argument("--obb", action="store_true", help="Align the model to its oriented bounding box first")
+    parser.add_argument("--no-optimize", action="store_true", help="Keep the original triangle and vertex order")
+    parser.add_argument("--no-merge", action="store_true", help="Don't merge parts by material into a texture atlas")
+    parser.add_argument("--index", help="Catalog index (see catalog_index.py): skip sizes already made from this exact file")
     
     args = parser.parse_args()
     
     # Parse dimensions
     try:
-        dims = [float(x) for x in args.dimensions.split(',')]
-        if len(dims) != 3:
-            raise ValueError
+        sizes = unique_sizes([parse_dims(text) for text in args.dimensions])
     except:
-        print("Error: Dimensions must be comma-separated numbers: width,height,depth")
+        print("Error: Dimensions must be comma-separated positive numbers: width,height,depth")
         sys.exit(1)
         
     input_path = args.input_glb
@@ -191,30 +356,68 @@ def main():
     base_name = os.path.splitext(os.path.basename(input_path))[0]
     output_dir = os.path.join(os.path.dirname(os.path.abspath(input_path)), f"{base_name}_resized")
     
-    if os.path.exists(output_dir):
+    # With an index, earlier outputs are kept so unchanged sizes can be skipped
+    if os.path.exists(output_dir) and not args.index:
         shutil.rmtree(output_dir)
-    os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
     
     print(f"Output directory: {output_dir}")
     
-    # 1. Resize
-    resized_glb_name = f"{base_name}_resized.glb"
-    resized_glb_path = os.path.join(output_dir, resized_glb_name)
-    
-    resize_glb(input_path, dims, resized_glb_path)
-    
-    # 2. Convert to USDZ
-    usdz_name = f"{base_name}_resized.usdz"
-    usdz_path = os.path.join(output_dir, usdz_name)
+    # One size keeps the original file names; variants are named by size
+    if len(sizes) == 1:
+        names = [f"{base_name}_resized"]
+    else:
+        names = [f"{base_name}_{format_dims(dims)}" for dims in sizes]
+    glb_paths = [os.path.join(output_dir, f"{name}.glb") for name in names]
+    usdz_paths = [os.path.join(output_dir, f"{name}.usdz") for name in names]
+
+    if args.index:
+        from catalog_index import open_index, lookup, is_done, record_done
+
+        index = open_index(args.index)
+        source_hash = lookup(index, input_path)["sha256"]
+        settings = [{"dims": dims, "mode": args.mode, "cleanup": not args.no_cleanup, "obb": args.obb,
+                     "optimize": not args.no_optimize, "merge": not args.no_merge, "output": os.path.abspath(glb_path)} for dims, glb_path in zip(sizes, glb_paths)]
+        todo = [i for i, (params, glb_path, usdz_path) in enumerate(zip(settings, glb_paths, usdz_paths))
+                if not (is_done(index, source_hash, "resize", params)
+                        and os.path.exists(glb_path) and os.path.exists(usdz_path))]
+        for i in sorted(set(range(len(sizes))) - set(todo)):
+            print(f"Skipping {format_dims(sizes[i])} cm: unchanged since the last run ({usdz_paths[i]})")
+        if not todo:
+            print("\nNothing to do, all sizes are up to date.")
+            return
+        sizes, names, glb_paths, usdz_paths, settings = (
+            [items[i] for i in todo] for items in (sizes, names, glb_paths, usdz_paths, settings))
+        # A stale USDZ left behind would pass for a successful conversion
+        for path in glb_paths + usdz_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    # 1. Resize (one load and cleanup for all sizes)
+    resize_glb_variants(input_path, list(zip(sizes, glb_paths)),
+                        cleanup=not args.no_cleanup, mode=args.mode, obb=args.obb, optimize=not args.no_optimize,
+                        merge=not args.no_merge)
     
-    success = convert_glb_to_usdz_blender(resized_glb_path, usdz_path)
+    # 2. Convert to USDZ (one Blender session for all sizes)
+    results = convert_glbs_to_usdz_blender(list(zip(glb_paths, usdz_paths)))
+
+    if args.index:
+        for params, success in zip(settings, results):
+            if success:
+                record_done(index, source_hash, "resize", params)
     
-    if success:
+    if len(sizes) == 1 and not results[0]:
+        print("\nWarning: USDZ conversion failed. Only GLB is available.")
+        return
+
+    if all(results):
         print("\nSuccess! Files created:")
-        print(f"- {resized_glb_path}")
-        print(f"- {usdz_path}")
     else:
-        print("\nWarning: USDZ conversion failed. Only GLB is available.")
+        print("\nWarning: USDZ conversion failed for some sizes. Only GLB is available for those.")
+    for glb_path, usdz_path, success in zip(glb_paths, usdz_paths, results):
+        print(f"- {glb_path}")
+        if success:
+            print(f"- {usdz_path}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -37,7 +37,8 @@ def get_model_bounds(mesh):
     return dimensions
 
 
-def scale_glb_model(input_path, target_width_cm, target_height_cm, target_depth_cm, output_path):
+def scale_glb_model(input_path, target_width_cm, target_height_cm, target_depth_cm, output_path, cleanup=True,
+                    mode="exact", obb=False):
     """
     Scale a GLB model to specific dimensions
 
@@ -47,9 +48,15 @@ def scale_glb_model(input_path, target_width_cm, target_height_cm, target_depth_
         target_height_cm: Target height in cm (Y axis)
         target_depth_cm: Target depth in cm (Z axis)
         output_path: Path to output GLB file
+        cleanup: Repair the mesh and ground it on y=0 before measuring
+        mode: Scale mode: exact (non-uniform), fit (uniform fit-inside),
+            or width/height/depth (uniform by one dimension)
+        obb: Align the model to its oriented bounding box before measuring
     """
     import trimesh
     import numpy as np
+    from mesh_cleanup import cleanup_model, print_report, ground_model
+    from mesh_fitting import compute_scale, align_to_obb
 
     print(f"Loading GLB model from: {input_path}")
 
@@ -64,6 +71,14 @@ def scale_glb_model(input_path, target_width_cm, target_height_cm, target_depth_
         else:
             mesh = scene
 
+    if cleanup:
+        print_report(cleanup_model(mesh))
+
+    if obb:
+        align_to_obb(mesh, target_ratio=target_width_cm / target_depth_cm if target_depth_cm else None)
+        if cleanup:
+            ground_model(mesh)
+
     # Get current dimensions
     current_dims = get_model_bounds(mesh)
     print(f"Current dimensions: {current_dims[0]:.2f} x {current_dims[1]:.2f} x {current_dims[2]:.2f} units")
@@ -78,13 +93,13 @@ def scale_glb_model(input_path, target_width_cm, target_height_cm, target_depth_
     print(f"Target dimensions: {target_width_cm} x {target_height_cm} x {target_depth_cm} cm")
 
     # Calculate scale factors for each axis
-    scale_x = target_width_m / current_dims[0]
-    scale_y = target_height_m / current_dims[1]
-    scale_z = target_depth_m / current_dims[2]
+    scale_x, scale_y, scale_z = compute_scale(
+        current_dims, (target_width_m, target_height_m, target_depth_m), mode
+    )
 
-    print(f"Scale factors: X={scale_x:.4f}, Y={scale_y:.4f}, Z={scale_z:.4f}")
+    print(f"Scale factors: X={scale_x:.4f}, Y={scale_y:.4f}, Z={scale_z:.4f} (mode: {mode})")
 
-    # Apply non-uniform scaling
+    # Apply scaling
     scaling_matrix = np.eye(4)
     scaling_matrix[0, 0] = scale_x
     scaling_matrix[1, 1] = scale_y
@@ -152,12 +167,29 @@ def convert_glb_to_usdz(glb_path, usdz_path):
 def scale_usdz_model(input_path, target_width_cm, target_height_cm, target_depth_cm, output_path):
     """
     Scale a USDZ model to specific dimensions
-    Strategy: Convert USDZ -> GLB -> Scale -> Convert back to USDZ
+    Strategy: Rescale the USD layer in place with the USD Python bindings (any OS).
+    Fallback: Convert USDZ -> GLB -> Scale -> Convert back to USDZ (macOS xcrun)
     """
     import tempfile
 
     print("Processing USDZ file...")
 
+    if output_path.endswith('.usdz'):
+        try:
+            from pxr import Tf
+            from usdz_reader import rescale_usdz
+        except ImportError:
+            print("USD Python bindings not available (pip3 install usd-core), trying Reality Converter...")
+        else:
+            try:
+                rescale_usdz(input_path, (target_width_cm, target_height_cm, target_depth_cm), output_path)
+                print("✓ Model scaled successfully!")
+                return
+            except (ValueError, Tf.ErrorException) as e:
+                # Tf.ErrorException: USD couldn't open or author a malformed layer
+                print(f"Warning: Native USDZ rescale failed: {e}")
+                print("Trying Reality Converter...")
+
     # Create temporary files
     temp_dir = tempfile.gettempdir()
     temp_glb_input = os.path.join(temp_dir, 'temp_input.glb')
@@ -248,6 +280,10 @@ Note: Dimensions are Width(X) x Height(Y) x Depth(Z) in centimeters
     parser.add_argument('height', type=float, help='Target height in cm (Y axis)')
     parser.add_argument('depth', type=float, help='Target depth in cm (Z axis)')
     parser.add_argument('output_file', nargs='?', help='Output file (optional, defaults to input_scaled.ext)')
+    parser.add_argument('--no-cleanup', action='store_true', help='Skip mesh cleanup before scaling (GLB only)')
+    parser.add_argument('--mode', choices=['exact', 'fit', 'width', 'height', 'depth'], default='exact',
+                        help='exact: non-uniform; fit: uniform fit-inside; width/height/depth: uniform by one dimension (GLB only)')
+    parser.add_argument('--obb', action='store_true', help='Align to the oriented bounding box before scaling (GLB only)')
 
     args = parser.parse_args()
 
@@ -284,7 +320,10 @@ Note: Dimensions are Width(X) x Height(Y) x Depth(Z) in centimeters
             args.width,
             args.height,
             args.depth,
-            args.output_file
+            args.output_file,
+            cleanup=not args.no_cleanup,
+            mode=args.mode,
+            obb=args.obb
         )
     elif input_ext == '.usdz':
         scale_usdz_model(
@@ -3,9 +3,11 @@ import os
 import sys
 import tempfile
 import time
-import subprocess
+from contextlib import contextmanager
 import numpy as np
 
+BLENDER_PATH = "/usr/local/blender/blender"
+
 # Image: Standard CPU image with Blender
 image = (
     modal.Image.debian_slim(python_version="3.10")
@@ -38,21 +40,60 @@ image = (
         "fastapi",
         "replicate" 
     )
+    .env({"BLENDER_PATH": BLENDER_PATH})
+    # Probe Blender at build time so containers start with a warm capability cache
+    .add_local_python_source("blender_probe", "usdz_packager", "mesh_cleanup", "mesh_fitting", "image_preprocess",
+                           "checkpoints", "cancellation", "subprocess_supervisor",
+                           "mesh_optimize", "mesh_merge", "analytics_rollup", "asset_store", "glb_io",
+                           copy=True)
+    .run_commands("cd /root && python -c 'import blender_probe; blender_probe.get_blender_info()'")
 )
 
 app = modal.App("spacecheck-backend", image=image)
 
-BLENDER_PATH = "/usr/local/blender/blender"
-
 # --- Helper Functions (Resize & Convert) ---
 
-def resize_glb(input_path, target_dims_cm, output_path):
+@contextmanager
+def timed_stage(timings, name):
+    """Accumulate the wall time of a pipeline stage into timings[name]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def resize_glb(input_path, target_dims_cm, output_path, cleanup=True, mode="exact", obb=False, optimize=True,
+               merge=True):
     import trimesh
+    from mesh_cleanup import cleanup_model, print_report, ground_model
+    from mesh_fitting import compute_scale, align_to_obb
+    from mesh_optimize import optimize_model, print_report as print_optimize_report
+    from mesh_merge import merge_model, print_report as print_merge_report
     print(f"Loading GLB for resize: {input_path}")
-    try:
-        scene = trimesh.load(input_path, force='mesh')
-    except Exception as e:
-        scene = trimesh.load(input_path)
+    if merge:
+        # One draw call per material instead of one per part
+        scene, merge_report = merge_model(trimesh.load(input_path))
+        print_merge_report(merge_report)
+    else:
+        try:
+            scene = trimesh.load(input_path, force='mesh')
+        except Exception as e:
+            scene = trimesh.load(input_path)
+    
+    # Hunyuan output has duplicate vertices and floaters that skew the bounds
+    if cleanup:
+        print_report(cleanup_model(scene))
+    
+    # Generated models are often rotated; straighten before measuring
+    if obb:
+        # The target W:D decides which footprint side becomes the width
+        align_to_obb(scene, target_ratio=target_dims_cm[0] / target_dims_cm[2] if target_dims_cm[2] else None)
+        if cleanup:
+            ground_model(scene)
+
+    # Vertex cache / overdraw / vertex fetch order for the phones viewing it
+    if optimize:
+        print_optimize_report(optimize_model(scene))
     
     if isinstance(scene, trimesh.Scene):
         bounds = scene.bounds
@@ -69,16 +110,10 @@ def resize_glb(input_path, target_dims_cm, output_path):
     target_h_m = target_dims_cm[1] / 100.0
     target_d_m = target_dims_cm[2] / 100.0
     
-    # Handle zero dimension edge cases
-    cur_x = current_dims[0] if current_dims[0] > 0 else 1.0
-    cur_y = current_dims[1] if current_dims[1] > 0 else 1.0
-    cur_z = current_dims[2] if current_dims[2] > 0 else 1.0
+    # Zero-size axes are left alone
+    scale_x, scale_y, scale_z = compute_scale(current_dims, (target_w_m, target_h_m, target_d_m), mode)
 
-    scale_x = target_w_m / cur_x
-    scale_y = target_h_m / cur_y
-    scale_z = target_d_m / cur_z
-
-    print(f"Scaling to: {target_w_m:.2f}, {target_h_m:.2f}, {target_d_m:.2f}")
+    print(f"Scaling to: {target_w_m:.2f}, {target_h_m:.2f}, {target_d_m:.2f} (mode: {mode})")
 
     matrix = np.eye(4)
     matrix[0,0] = scale_x
@@ -92,7 +127,25 @@ def resize_glb(input_path, target_dims_cm, output_path):
         mesh.apply_transform(matrix)
         mesh.export(output_path)
 
-def convert_to_usdz(glb_path, usdz_path):
+def convert_to_usdz(glb_path, usdz_path, cancel=None):
+    """
+    GLB -> USDZ with headless Blender, under the BLENDER_* limits.
+
+    Raises SubprocessLimitExceeded when Blender times out or runs out of CPU
+    time or memory. Blender is killed if `cancel` (a CancelWatcher) fires.
+    """
+    from blender_probe import get_blender_info, can_convert_to_usdz
+    from usdz_packager import package_usdz, validate_usdz, remove_layer_files
+    from subprocess_supervisor import run_supervised, blender_limits, describe, SubprocessLimitExceeded, LIMIT_STATUSES
+
+    blender = get_blender_info(BLENDER_PATH)
+    if not can_convert_to_usdz(blender):
+        print(f"Skipping USDZ: {blender['error'] or 'Blender has no USD exporter'}")
+        return False
+
+    usdc_path = os.path.splitext(usdz_path)[0] + ".usdc"
+    export_path = usdz_path if blender["usdz_export"] else usdc_path
+
     blender_script = f"""
 import bpy
 import sys
@@ -101,7 +154,7 @@ import os
 def convert():
     bpy.ops.wm.read_factory_settings(use_empty=True)
     glb_in = "{os.path.abspath(glb_path)}"
-    usdz_out = "{os.path.abspath(usdz_path)}"
+    usd_out = "{os.path.abspath(export_path)}"
     
     try:
         bpy.ops.import_scene.gltf(filepath=glb_in)
@@ -109,7 +162,7 @@ def convert():
         sys.exit(1)
         
     try:
-        bpy.ops.wm.usd_export(filepath=usdz_out)
+        bpy.ops.wm.usd_export(filepath=usd_out)
     except Exception as e:
         sys.exit(1)
 
@@ -120,144 +173,828 @@ if __name__ == "__main__":
         f.write(blender_script)
         script_path = f.name
         
-    cmd = [BLENDER_PATH, "--background", "--python", script_path]
-    result = subprocess.run(cmd, check=False, capture_output=True, text=True)
-    
-    if result.returncode != 0:
-        print("Blender Error:", result.stderr)
-        print("Blender Stdout:", result.stdout)
-    
-    if os.path.exists(script_path):
-        os.remove(script_path)
-    
+    cmd = [blender["path"], "--background", "--python", script_path]
+    try:
+        # Output goes to the job log as Blender writes it
+        run = run_supervised(cmd, cancel=cancel, prefix="[blender] ", **blender_limits())
+    finally:
+        if os.path.exists(script_path):
+            os.remove(script_path)
+    if cancel:
+        cancel.raise_if_cancelled()
+
+    print(f"Blender {describe(run)}")
+    if run["status"] in LIMIT_STATUSES:
+        raise SubprocessLimitExceeded("Blender", run)
+
+    # Salvage a .usdc export instead of falling back to GLB
+    if not os.path.exists(usdz_path) and os.path.exists(usdc_path):
+        print("Blender exported .usdc, packaging into USDZ...")
+        package_usdz(usdc_path, usdz_path)
+        problems = validate_usdz(usdz_path)
+        if problems:
+            print(f"Packaged USDZ is invalid: {'; '.join(problems)}")
+            os.remove(usdz_path)
+    remove_layer_files([usdc_path])
+
     return os.path.exists(usdz_path)
 
 
-# --- API Worker (CPU is fine, calling external API) ---
+# --- Generation Pipeline ---
+
+HUNYUAN_MODEL = "ndreca/hunyuan3d-2.1:895e514f953d39e8b5bfb859df9313481ad3fa3a8631e5c54c7e5c9c85a6aa9f"
+
+# Hunyuan3D-2.1 parameters per quality tier. The draft skips texturing and
+# uses fewer steps and a coarser octree, so a first model is ready quickly.
+QUALITY_TIERS = {
+    "draft": {
+        "steps": 20,
+        "num_chunks": 8000,
+        "max_facenum": 10000,
+        "generate_texture": False,
+        "octree_resolution": 128,
+    },
+    "final": {
+        "steps": 50,
+        "num_chunks": 8000,
+        "max_facenum": 20000,
+        "generate_texture": True,
+        "octree_resolution": 256,
+    },
+}
+
+def hunyuan_input(image_url, tier="final"):
+    """Hunyuan3D-2.1 parameters for one image"""
+    return {
+        "seed": 1234,
+        "image": image_url,
+        "guidance_scale": 7.5,
+        "remove_background": False,
+        **QUALITY_TIERS[tier]
+    }
+
+def wants_draft(item):
+    """Publish a draft before the final model (per request, or DRAFT_FIRST=1 for all)"""
+    return bool(item.get("draftFirst", os.environ.get("DRAFT_FIRST") == "1"))
+
+def run_prediction(input, cancel=None, poll=0.5):
+    """
+    Run a Hunyuan3D prediction and return its output.
+
+    Polls like replicate.run, but the prediction is cancelled on Replicate as
+    soon as `cancel` (a CancelWatcher) fires, freeing the GPU.
+    """
+    import replicate
 
-@app.function(timeout=1800, secrets=[modal.Secret.from_name("spacecheck-secrets")])
-def process_generation(item: dict):
-    import requests
-    from supabase import create_client, Client
+    prediction = replicate.predictions.create(version=HUNYUAN_MODEL.split(":", 1)[1], input=input)
+    unregister = cancel.on_cancel(prediction.cancel) if cancel else (lambda: None)
+    try:
+        while prediction.status not in ("succeeded", "failed", "canceled"):
+            if cancel:
+                cancel.wait(poll)
+                cancel.raise_if_cancelled()
+            else:
+                time.sleep(poll)
+            prediction.reload()
+    finally:
+        unregister()
+
+    if prediction.status != "succeeded":
+        raise Exception(f"Prediction {prediction.status}: {prediction.error}")
+    return prediction.output
+
+def cancel_predictions(prediction_ids, timings):
+    """Cancel Replicate predictions of a superseded run (finished ones ignore it)"""
     import replicate
 
-    print(f"Processing: {item.get('generationId')}")
-    
-    image_url = item.get("imageUrl")
-    dims = item.get("dimensions")
-    gen_id = item.get("generationId")
-    
-    # Init Supabase
+    for prediction_id in prediction_ids:
+        try:
+            with timed_stage(timings, "submit"):
+                replicate.predictions.cancel(prediction_id)
+            print(f"Cancelled prediction {prediction_id}")
+        except Exception as e:
+            print(f"Could not cancel prediction {prediction_id}: {e}")
+
+def watch_cancellation(supabase, gen_id, run_id):
+    """
+    CancelWatcher for one run of a generation, polling the row every
+    CANCEL_POLL_SECONDS (default 5).
+    """
+    from cancellation import CancelWatcher, cancel_reason
+
+    def check():
+        rows = supabase.table("generations").select("status, run_id").eq("id", gen_id).execute().data
+        return cancel_reason(rows[0] if rows else None, run_id)
+
+    return CancelWatcher(check, float(os.environ.get("CANCEL_POLL_SECONDS", "5")))
+
+def utc_now():
+    from datetime import datetime, timezone
+    return datetime.now(timezone.utc).isoformat()
+
+def get_supabase():
+    from supabase import create_client, Client
+
     url: str = os.environ.get("NEXT_PUBLIC_SUPABASE_URL")
     if url and not url.endswith("/"): url += "/"
     key: str = os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or os.environ.get("NEXT_PUBLIC_SUPABASE_ANON_KEY")
     supabase: Client = create_client(url, key)
+    return supabase
+
+def prepare_input_image(supabase, item, timings):
+    """
+    Normalize the input photo and return the URL to send to Replicate.
+
+    The result is stored content-addressed under uploads/preprocessed/, so a
+    retry of the same upload reuses it. Any failure falls back to the
+    original URL, preprocessing only saves time.
+    """
+    import requests
+    from image_preprocess import preprocess_image, storage_path, print_info
+
+    image_url = item.get("imageUrl")
+    if not item.get("preprocessImage", True):
+        return image_url
 
     try:
-        # Update status to processing
+        with timed_stage(timings, "preprocess"):
+            image_resp = requests.get(image_url, timeout=60)
+            image_resp.raise_for_status()
+
+            path = storage_path(image_resp.content)
+            public_url = supabase.storage.from_("uploads").get_public_url(path)
+            if requests.head(public_url, timeout=30).status_code == 200:
+                print(f"Reusing preprocessed image: {public_url}")
+                return public_url
+
+            output, info = preprocess_image(image_resp.content)
+            print_info(info)
+            supabase.storage.from_("uploads").upload(
+                path, output, {"content-type": info["content_type"], "upsert": "true"}
+            )
+            return public_url
+    except Exception as e:
+        print(f"Image preprocessing failed, using the original: {e}")
+        return image_url
+
+def extract_glb_url(output):
+    """Pull the GLB URL out of a Hunyuan3D output"""
+    if isinstance(output, str):
+        generated_glb_url = output
+    elif isinstance(output, dict):
+        generated_glb_url = output.get('glb') or output.get('model') or output.get('mesh')
+    elif isinstance(output, list):
+        generated_glb_url = output[0]
+    else:
+        raise Exception(f"Unexpected output format: {output}")
+
+    if not generated_glb_url:
+        raise Exception(f"No GLB URL in output: {output}")
+    return generated_glb_url
+
+def get_checkpoints(supabase, gen_id, tier="final"):
+    """
+    Stage checkpoints for a generation tier, or None when disabled.
+
+    CHECKPOINT_STORE selects the store: unset or "storage" for the private
+    Supabase bucket, "off" to disable, anything else is a local directory.
+    """
+    from checkpoints import GenerationCheckpoints, LocalCheckpointStore, StorageCheckpointStore
+
+    where = os.environ.get("CHECKPOINT_STORE", "storage")
+    if where == "off":
+        return None
+    store = StorageCheckpointStore(supabase) if where == "storage" else LocalCheckpointStore(where)
+    return GenerationCheckpoints(store, gen_id, tier)
+
+def checkpoint_keys(item, tier="final"):
+    """Stage keys for a job: the raw model depends on image and model settings, the resize on dimensions"""
+    from checkpoints import stage_keys
+
+    settings = hunyuan_input(None, tier)
+    settings.pop("image")
+    raw = {"model": HUNYUAN_MODEL, "image": item.get("imageUrl"),
+           "preprocess": item.get("preprocessImage", True), **settings}
+    resize = {"dimensions": item.get("dimensions"), "scaleMode": item.get("scaleMode", "exact"),
+              "alignObb": bool(item.get("alignObb", False))}
+    return stage_keys(raw, resize)
+
+def upload_model_file(supabase, local_path, filename, content_type):
+    """Upload one output file to the uploads bucket and return its public URL"""
+    with open(local_path, "rb") as f:
+        supabase.storage.from_("uploads").upload(
+            filename, f, {"content-type": content_type, "upsert": "true"}
+        )
+    return supabase.storage.from_("uploads").get_public_url(filename)
+
+def upload_model_blobs(supabase, local_path, gltf_path):
+    """
+    Upload a GLB as a .gltf plus content-addressed blobs (asset_store.py) in
+    the uploads bucket and return the .gltf's public URL; blobs already
+    stored by earlier generations aren't uploaded again. None when the GLB
+    can't be split, so the caller uploads it whole.
+    """
+    from asset_store import StorageBlobStore, publish_model
+
+    store = StorageBlobStore(supabase, "uploads")
+    with open(local_path, "rb") as f:
+        report = publish_model(store, f.read(), gltf_path)
+    if report is None:
+        return None
+    print(f"Blobs: {report['blobs']} ({report['uploaded_blobs']} new, "
+          f"{report['uploaded_bytes'] / 1024:.1f} of {report['blob_bytes'] / 1024:.1f} KB uploaded)")
+    return store.public_url(gltf_path)
+
+def postprocess_generation(supabase, item, generated_glb_url, timings, tier="final", checkpoints=None, cancel=None,
+                           degraded=None):
+    """
+    Download, resize, convert and upload a generated GLB, then publish it on the row.
+
+    The final tier marks the row completed. A draft goes to {gen_id}/draft/
+    and only fills in the URLs while the row is still processing, so a late
+    draft never replaces a finished model.
+
+    With checkpoints, the resized model and USDZ are saved as they complete
+    and a rerun starts after the last saved stage; generated_glb_url may then
+    be None. The raw model is only saved when the resize fails. Drafts are
+    never checkpointed.
+    With a CancelWatcher, a cancelled generation stops before the next stage
+    (raising GenerationCancelled) and nothing is uploaded.
+
+    When Blender hits a limit the model is published without a USDZ and the
+    reason ("timeout", "cpu" or "memory") is stored in `degraded` by stage.
+    """
+    import requests
+    from subprocess_supervisor import SubprocessLimitExceeded
+
+    dims = item.get("dimensions")
+    gen_id = item.get("generationId")
+    # Draft stages are timed separately, e.g. draft_resize
+    stage = lambda name: name if tier == "final" else f"{tier}_{name}"
+    prefix = f"{gen_id}/" if tier == "final" else f"{gen_id}/{tier}/"
+    keys = checkpoint_keys(item, tier)
+    # Latest saved stage first: a saved USDZ makes the raw model unnecessary
+    completed = checkpoints.completed(keys) if checkpoints else []
+    check_cancelled = cancel.raise_if_cancelled if cancel else (lambda: None)
+
+    def restore(name, path):
+        if name not in completed:
+            return False
+        with timed_stage(timings, "restore"):
+            data = checkpoints.restore(name, keys[name])
+            if data is None:
+                return False
+            with open(path, "wb") as f:
+                f.write(data)
+        print(f"Restored {name} from checkpoint")
+        return True
+
+    def save(name, path, seconds):
+        if not checkpoints:
+            return False
+        with timed_stage(timings, "checkpoint"), open(path, "rb") as f:
+            return checkpoints.save(name, keys[name], f.read(), seconds)
+
+    # The downloaded model and its cost until it's checkpointed: only saved
+    # if the resize fails, since a saved resize makes it unnecessary
+    raw_pending = None
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        generated_glb_path = os.path.join(temp_dir, "generated.glb")
+        resized_glb_path = os.path.join(temp_dir, "resized.glb")
+        usdz_path = os.path.join(temp_dir, "model.usdz")
+
+        have_usdz = restore("usdz", usdz_path)
+        have_resized = restore("resized", resized_glb_path)
+        if not have_resized:
+            if not restore("raw", generated_glb_path):
+                if not generated_glb_url:
+                    raise Exception("No GLB URL and no checkpoint to resume from")
+                print(f"GLB URL: {generated_glb_url}")
+
+                # Download GLB
+                check_cancelled()
+                print("Downloading GLB...")
+                started = time.perf_counter()
+                with timed_stage(timings, stage("download")):
+                    glb_resp = requests.get(generated_glb_url, timeout=300)
+                    glb_resp.raise_for_status()
+
+                    with open(generated_glb_path, "wb") as f:
+                        f.write(glb_resp.content)
+                print(f"Downloaded: {len(glb_resp.content)} bytes")
+                # A restored raw model saves the inference as well as the download
+                raw_pending = timings.get(stage("inference"), 0.0) + time.perf_counter() - started
+
+            # Clean up and resize to target dimensions
+            check_cancelled()
+            print(f"Cleaning up and resizing to {dims}...")
+            target_dims = (float(dims['width']), float(dims['height']), float(dims['depth']))
+            started = time.perf_counter()
+            try:
+                with timed_stage(timings, stage("resize")):
+                    resize_glb(
+                        generated_glb_path, target_dims, resized_glb_path, cleanup=True,
+                        mode=item.get("scaleMode", "exact"), obb=bool(item.get("alignObb", False))
+                    )
+            except Exception:
+                # A retry has no output URL to download again
+                if raw_pending is not None:
+                    save("raw", generated_glb_path, raw_pending)
+                raise
+            # The resized checkpoint also stands for the inference and download it skips
+            seconds = time.perf_counter() - started + (raw_pending or 0.0)
+            if not save("resized", resized_glb_path, seconds) and raw_pending is not None:
+                save("raw", generated_glb_path, raw_pending)
+
+        # Convert to USDZ
+        usdz_success = have_usdz
+        if not have_usdz:
+            check_cancelled()
+            print("Converting to USDZ...")
+            started = time.perf_counter()
+            try:
+                with timed_stage(timings, stage("convert")):
+                    usdz_success = convert_to_usdz(resized_glb_path, usdz_path, cancel=cancel)
+            except SubprocessLimitExceeded as e:
+                # A pathological mesh costs the USDZ, not the whole generation
+                print(f"Skipping USDZ: {e}")
+                usdz_success = False
+                if degraded is not None:
+                    degraded[stage("convert")] = e.status
+            if usdz_success and os.path.exists(usdz_path):
+                save("usdz", usdz_path, time.perf_counter() - started)
+
+        # Upload GLB
+        check_cancelled()
+        print("Uploading...")
+        with timed_stage(timings, stage("upload")):
+            glb_public_url = None
+            # ASSET_STORE=blobs: the web model shares textures and buffers with earlier uploads
+            if os.environ.get("ASSET_STORE") == "blobs":
+                glb_public_url = upload_model_blobs(supabase, resized_glb_path, f"{prefix}model.gltf")
+            if glb_public_url is None:
+                glb_public_url = upload_model_file(
+                    supabase, resized_glb_path, f"{prefix}model.glb", "model/gltf-binary"
+                )
+
+            # Upload USDZ if successful
+            usdz_public_url = None
+            if usdz_success and os.path.exists(usdz_path):
+                usdz_public_url = upload_model_file(
+                    supabase, usdz_path, f"{prefix}model.usdz", "model/vnd.usdz+zip"
+                )
+
+        check_cancelled()
+        with timed_stage(timings, "db"):
+            if tier == "final":
+                # Update to completed
+                query = supabase.table("generations").update({
+                    "status": "completed",
+                    "glb_url": glb_public_url,
+                    "usdz_url": usdz_public_url or glb_public_url,
+                    "completed_at": utc_now()
+                }).eq("id", gen_id)
+            else:
+                query = supabase.table("generations").update({
+                    "glb_url": glb_public_url,
+                    "usdz_url": usdz_public_url or glb_public_url,
+                    "draft_ready_at": utc_now()
+                }).eq("id", gen_id).eq("status", "processing")
+            # A resubmitted generation belongs to the newer run
+            if item.get("runId"):
+                query = query.eq("run_id", item["runId"])
+            query.execute()
+
+    if tier == "final" and checkpoints:
+        # Published: nothing left to resume
+        with timed_stage(timings, "checkpoint"):
+            checkpoints.clear()
+
+    print(f"✓ {'Complete' if tier == 'final' else 'Draft published'}: {glb_public_url}")
+    return glb_public_url
+
+def mark_processing(supabase, gen_id, timings, run_id=None):
+    """
+    Reset the row for a new run, including the timestamps of a previous one.
+
+    The run_id claims the generation: an older run still working on it sees
+    a different run_id and cancels itself.
+    """
+    with timed_stage(timings, "db"):
         supabase.table("generations").update({
-            "status": "processing"
+            "status": "processing",
+            "run_id": run_id,
+            "draft_ready_at": None,
+            "completed_at": None
         }).eq("id", gen_id).execute()
 
-        # Generate 3D model using the working Hunyuan3D-2.1 version with user-provided parameters
-        print(f"Generating 3D model from image: {image_url}")
-
-        output = replicate.run(
-            "ndreca/hunyuan3d-2.1:895e514f953d39e8b5bfb859df9313481ad3fa3a8631e5c54c7e5c9c85a6aa9f",
-            input={
-                "seed": 1234,
-                "image": image_url,
-                "steps": 50,
-                "num_chunks": 8000,
-                "max_facenum": 20000,
-                "guidance_scale": 7.5,
-                "generate_texture": True,
-                "octree_resolution": 256,
-                "remove_background": False
-            }
-        )
+def mark_failed(supabase, gen_id, timings):
+    with timed_stage(timings, "db"):
+        supabase.table("generations").update({
+            "status": "failed"
+        }).eq("id", gen_id).execute()
 
-        print(f"Hunyuan3D-2.1 output: {output}")
+def print_timings(timings):
+    print("Stage timings: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items()))
 
-        # Extract GLB URL from output
-        if isinstance(output, str):
-            generated_glb_url = output
-        elif isinstance(output, dict):
-            generated_glb_url = output.get('glb') or output.get('model') or output.get('mesh')
-        elif isinstance(output, list):
-            generated_glb_url = output[0]
-        else:
-            raise Exception(f"Unexpected output format: {output}")
+# --- Replicate Webhooks ---
+# The job (generation id, dimensions, scale options) travels in the webhook
+# URL, signed with WEBHOOK_SECRET so the endpoint only accepts our own jobs.
+# The posted prediction isn't signed: finish_generation fetches it again
+# from Replicate and only trusts ids stored in the row's prediction_ids.
 
-        if not generated_glb_url:
-            raise Exception(f"No GLB URL in output: {output}")
+# imageUrl and preprocessImage are part of the checkpoint keys (checkpoint_keys),
+# runId tells finish_generation whether the run was superseded
+WEBHOOK_JOB_KEYS = ("generationId", "runId", "imageUrl", "preprocessImage", "dimensions", "scaleMode", "alignObb", "tier")
 
-        print(f"GLB URL: {generated_glb_url}")
+PREDICTION_DONE = ("succeeded", "failed", "canceled")
 
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Download GLB
-            print("Downloading GLB...")
-            glb_resp = requests.get(generated_glb_url, timeout=300)
-            glb_resp.raise_for_status()
+def encode_job(item):
+    import json
+    import base64
 
-            generated_glb_path = os.path.join(temp_dir, "generated.glb")
-            with open(generated_glb_path, "wb") as f:
-                f.write(glb_resp.content)
-            print(f"Downloaded: {len(glb_resp.content)} bytes")
+    job = {k: item[k] for k in WEBHOOK_JOB_KEYS if k in item}
+    return base64.urlsafe_b64encode(json.dumps(job, separators=(",", ":")).encode()).decode()
 
-            # Resize to target dimensions
-            print(f"Resizing to {dims}...")
-            target_dims = (float(dims['width']), float(dims['height']), float(dims['depth']))
-            resized_glb_path = os.path.join(temp_dir, "resized.glb")
-            resize_glb(generated_glb_path, target_dims, resized_glb_path)
+def decode_job(job):
+    import json
+    import base64
 
-            # Convert to USDZ
-            print("Converting to USDZ...")
-            usdz_path = os.path.join(temp_dir, "model.usdz")
-            usdz_success = convert_to_usdz(resized_glb_path, usdz_path)
-
-            # Upload GLB
-            print("Uploading...")
-            glb_filename = f"{gen_id}/model.glb"
-            with open(resized_glb_path, "rb") as f:
-                supabase.storage.from_("uploads").upload(
-                    glb_filename, f, {"content-type": "model/gltf-binary", "upsert": "true"}
-                )
+    return json.loads(base64.urlsafe_b64decode(job.encode()))
 
-            glb_public_url = supabase.storage.from_("uploads").get_public_url(glb_filename)
+def sign_job(job, secret):
+    import hmac
+    import hashlib
 
-            # Upload USDZ if successful
-            usdz_public_url = None
-            if usdz_success and os.path.exists(usdz_path):
-                usdz_filename = f"{gen_id}/model.usdz"
-                with open(usdz_path, "rb") as f:
-                    supabase.storage.from_("uploads").upload(
-                        usdz_filename, f, {"content-type": "model/vnd.usdz+zip", "upsert": "true"}
-                    )
-                usdz_public_url = supabase.storage.from_("uploads").get_public_url(usdz_filename)
+    return hmac.new(secret.encode(), job.encode(), hashlib.sha256).hexdigest()
+
+def fetch_prediction(prediction_id):
+    """A prediction's status, output, error and metrics, as Replicate reports them"""
+    import replicate
+
+    prediction = replicate.predictions.get(prediction_id)
+    return {
+        "id": prediction.id,
+        "status": prediction.status,
+        "output": prediction.output,
+        "error": prediction.error,
+        "metrics": getattr(prediction, "metrics", None),
+    }
+
+def claim_prediction(supabase, gen_id, run_id, prediction_id, timings):
+    """
+    Atomically mark a prediction of this run as handled (claim_prediction in
+    landing/supabase/schema.sql). True for exactly one caller per prediction,
+    and only while the row is processing and the prediction is in its
+    prediction_ids.
+    """
+    with timed_stage(timings, "db"):
+        result = supabase.rpc("claim_prediction", {
+            "p_generation_id": gen_id,
+            "p_run_id": run_id,
+            "p_prediction_id": prediction_id,
+        }).execute()
+    return bool(result.data)
+
+def build_webhook_url(base_url, item, secret):
+    from urllib.parse import urlencode
+
+    job = encode_job(item)
+    separator = "&" if "?" in base_url else "?"
+    return f"{base_url}{separator}{urlencode({'job': job, 'token': sign_job(job, secret)})}"
+
+def handle_replicate_webhook(prediction, job, token, secret, spawn):
+    """
+    Validate a Replicate webhook delivery and hand finished predictions to `spawn(item, prediction)`.
+
+    Raises PermissionError for unsigned or tampered jobs. Only the job is
+    signed; `spawn` must treat the prediction body as a hint. Returns a small
+    status dict for the HTTP response.
+    """
+    import hmac
+
+    if not secret or not job or not token or not hmac.compare_digest(sign_job(job, secret), token):
+        raise PermissionError("Invalid webhook token")
+
+    status = prediction.get("status")
+    if status not in PREDICTION_DONE:
+        return {"status": "ignored", "prediction": status}
+
+    item = decode_job(job)
+    print(f"Prediction {prediction.get('id')} {status} for {item.get('generationId')}")
+    spawn(item, prediction)
+    return {"status": "accepted"}
+
+
+# --- API Worker (CPU is fine, calling external API) ---
+
+@app.function(timeout=1800, secrets=[modal.Secret.from_name("spacecheck-secrets")])
+def process_generation(item: dict):
+    """Blocking pipeline: waits for inference inside this container"""
+    from uuid import uuid4
+    from concurrent.futures import ThreadPoolExecutor
+    from cancellation import GenerationCancelled
+
+    print(f"Processing: {item.get('generationId')}")
+    
+    gen_id = item.get("generationId")
+    # Claims the row; a resubmit gets a new run_id and this run stops
+    run_id = uuid4().hex
+    item = {**item, "runId": run_id}
+
+    # Per-stage wall times, returned to the caller and logged at the end
+    started = time.perf_counter()
+    timings = {}
+    degraded = {}
+    result = {"generationId": gen_id, "status": "failed", "timings": timings}
+    
+    supabase = get_supabase()
+    cancel = watch_cancellation(supabase, gen_id, run_id)
+
+    def run_tier(tier):
+        with timed_stage(timings, "inference" if tier == "final" else f"{tier}_inference"):
+            return run_prediction(hunyuan_input(image_url, tier), cancel)
+
+    checkpoints = None
+
+    try:
+        # Update status to processing
+        mark_processing(supabase, gen_id, timings, run_id)
+
+        with cancel:
+            # A retry resumes after the last saved stage, skipping inference when the raw model was kept
+            checkpoints = get_checkpoints(supabase, gen_id)
+            with timed_stage(timings, "restore"):
+                resumable = bool(checkpoints and checkpoints.completed(checkpoint_keys(item)))
+
+            if resumable:
+                print(f"Resuming {gen_id} from checkpoint")
+                output = None
+            else:
+                # Smaller, upright, cropped input: faster to fetch and cleaner geometry
+                image_url = prepare_input_image(supabase, item, timings)
+
+                # Generate 3D model using the working Hunyuan3D-2.1 version with user-provided parameters
+                print(f"Generating 3D model from image: {image_url}")
+
+                with ThreadPoolExecutor(max_workers=1) as pool:
+                    # The final inference runs on Replicate while the draft is made and published
+                    final_output = pool.submit(run_tier, "final")
+
+                    if wants_draft(item):
+                        try:
+                            output = run_tier("draft")
+                            print(f"Hunyuan3D-2.1 draft output: {output}")
+                            # No checkpoints: a failed draft is simply dropped
+                            postprocess_generation(supabase, item, extract_glb_url(output), timings, tier="draft",
+                                                   cancel=cancel, degraded=degraded)
+                            result["draft_ready"] = time.perf_counter() - started
+                        except GenerationCancelled:
+                            raise
+                        except Exception as e:
+                            # The final model is still coming, a failed draft only costs the preview
+                            print(f"Draft failed: {e}")
+
+                    output = final_output.result()
+
+                print(f"Hunyuan3D-2.1 output: {output}")
+
+            postprocess_generation(supabase, item, output and extract_glb_url(output), timings,
+                                   checkpoints=checkpoints, cancel=cancel, degraded=degraded)
+        result["status"] = "completed"
+        result["final_ready"] = time.perf_counter() - started
+
+    except Exception as e:
+        if cancel.cancelled:
+            # Deleted or resubmitted: stop quietly, the row isn't ours to fail
+            print(f"Stopped {gen_id}: {cancel.reason}")
+            result["status"] = "cancelled"
+            result["reason"] = cancel.reason
+            if cancel.reason == "deleted" and checkpoints:
+                from checkpoints import clear_generation
+                clear_generation(checkpoints.store, gen_id)
+        else:
+            print(f"ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            result["error"] = str(e)
+            mark_failed(supabase, gen_id, timings)
+
+    if checkpoints and checkpoints.restored:
+        # Original cost of the restored stages: the work this retry didn't redo
+        result["resumed"] = checkpoints.restored
+        result["recovered_seconds"] = checkpoints.saved_seconds
+    if degraded:
+        # e.g. {"convert": "timeout"}: published without a USDZ
+        result["degraded"] = degraded
+
+    print_timings(timings)
+    return result
+
+
+@app.function(timeout=120, secrets=[modal.Secret.from_name("spacecheck-secrets")])
+def submit_generation(item: dict):
+    """
+    Start inference and return without waiting; Replicate calls
+    replicate_webhook when the prediction finishes.
+    """
+    import replicate
+    from uuid import uuid4
+
+    gen_id = item.get("generationId")
+    secret = os.environ.get("WEBHOOK_SECRET")
+    if not secret:
+        print("WEBHOOK_SECRET not set, falling back to blocking process_generation")
+        process_generation.spawn(item)
+        return {"generationId": gen_id, "status": "queued", "timings": {}}
+
+    print(f"Submitting: {gen_id}")
+    run_id = uuid4().hex
+    item = {**item, "runId": run_id}
+    timings = {}
+    result = {"generationId": gen_id, "status": "failed", "timings": timings}
+    supabase = get_supabase()
+
+    base_url = os.environ.get("REPLICATE_WEBHOOK_URL") or replicate_webhook.get_web_url()
+
+    prediction_ids = []
+
+    def create_prediction(tier):
+        with timed_stage(timings, "submit"):
+            prediction = replicate.predictions.create(
+                version=HUNYUAN_MODEL.split(":", 1)[1],
+                input=hunyuan_input(image_url, tier),
+                webhook=build_webhook_url(base_url, {**item, "tier": tier}, secret),
+                webhook_events_filter=["completed"],
+            )
+        print(f"Prediction {prediction.id} ({tier}) submitted")
+        # Stored right away: a resubmit cancels them, and finish_generation
+        # only accepts webhooks for ids stored here
+        prediction_ids.append(prediction.id)
+        with timed_stage(timings, "db"):
+            supabase.table("generations").update({"prediction_ids": prediction_ids}) \
+                .eq("id", gen_id).eq("run_id", run_id).execute()
+        return prediction.id
+
+    try:
+        # A resubmit supersedes the previous run: stop its predictions on Replicate
+        with timed_stage(timings, "db"):
+            rows = supabase.table("generations").select("prediction_ids").eq("id", gen_id).execute().data
+        mark_processing(supabase, gen_id, timings, run_id)
+        cancel_predictions((rows[0].get("prediction_ids") or []) if rows else [], timings)
+
+        checkpoints = get_checkpoints(supabase, gen_id)
+        with timed_stage(timings, "restore"):
+            resumable = bool(checkpoints and checkpoints.completed(checkpoint_keys(item)))
+
+        if resumable:
+            # A retry with saved stages needs no new prediction, only the remaining post-processing
+            print(f"Resuming {gen_id} from checkpoint")
+            process_generation.spawn(item)
+            result["status"] = "resumed"
+        else:
+            image_url = prepare_input_image(supabase, item, timings)
 
-            # Update to completed
-            supabase.table("generations").update({
-                "status": "completed",
-                "glb_url": glb_public_url,
-                "usdz_url": usdz_public_url or glb_public_url
-            }).eq("id", gen_id).execute()
+            # Both tiers run on Replicate at once; the draft just finishes first
+            if wants_draft(item):
+                try:
+                    result["draftPredictionId"] = create_prediction("draft")
+                except Exception as e:
+                    print(f"Draft submission failed: {e}")
 
-            print(f"✓ Complete: {glb_public_url}")
+            result["predictionId"] = create_prediction("final")
+            result["status"] = "submitted"
 
     except Exception as e:
         print(f"ERROR: {e}")
         import traceback
         traceback.print_exc()
+        result["error"] = str(e)
+        mark_failed(supabase, gen_id, timings)
 
-        supabase.table("generations").update({
-            "status": "failed"
-        }).eq("id", gen_id).execute()
+    print_timings(timings)
+    return result
+
+
+@app.function(timeout=600, secrets=[modal.Secret.from_name("spacecheck-secrets")])
+def finish_generation(item: dict, prediction: dict):
+    """Post-process a finished prediction delivered by replicate_webhook"""
+    gen_id = item.get("generationId")
+    tier = item.get("tier", "final")
+    print(f"Finishing: {gen_id} ({tier})")
+
+    timings = {}
+    degraded = {}
+    result = {"generationId": gen_id, "tier": tier, "status": "failed", "timings": timings}
+    supabase = get_supabase()
+
+    from cancellation import cancel_reason
+
+    cancel = watch_cancellation(supabase, gen_id, item.get("runId"))
+    try:
+        # Cheap early exits; claim_prediction below makes the final call
+        with timed_stage(timings, "db"):
+            rows = (supabase.table("generations").select("status, run_id, prediction_ids")
+                    .eq("id", gen_id).execute().data)
+        reason = cancel_reason(rows[0] if rows else None, item.get("runId"))
+        if reason:
+            print(f"Generation {gen_id} was {reason}, skipping")
+            result["status"] = "cancelled"
+            result["reason"] = reason
+            return result
+        if rows[0].get("status") != "processing":
+            print(f"Generation {gen_id} is already {rows[0].get('status')}, skipping")
+            result["status"] = "skipped"
+            return result
+
+        # The webhook body isn't signed: only predictions this run submitted,
+        # with status and output read back from Replicate
+        prediction_id = prediction.get("id")
+        if not prediction_id or prediction_id not in (rows[0].get("prediction_ids") or []):
+            print(f"Prediction {prediction_id} doesn't belong to {gen_id}, skipping")
+            result["status"] = "skipped"
+            return result
+        with timed_stage(timings, "submit"):
+            prediction = fetch_prediction(prediction_id)
+        if prediction.get("status") not in PREDICTION_DONE:
+            print(f"Prediction {prediction_id} is still {prediction.get('status')}, skipping")
+            result["status"] = "skipped"
+            return result
+
+        # Replicate retries deliveries and may send them concurrently; only the claimant does the work
+        if not claim_prediction(supabase, gen_id, item.get("runId"), prediction_id, timings):
+            print(f"Prediction {prediction_id} is already being handled, skipping")
+            result["status"] = "skipped"
+            return result
+
+        # Inference ran on Replicate; keep its duration for reporting
+        predict_time = (prediction.get("metrics") or {}).get("predict_time")
+        if predict_time is not None:
+            timings["inference" if tier == "final" else f"{tier}_inference"] = float(predict_time)
+
+        if prediction.get("status") != "succeeded":
+            raise Exception(f"Prediction {prediction.get('status')}: {prediction.get('error')}")
+
+        with cancel:
+            postprocess_generation(supabase, item, extract_glb_url(prediction.get("output")), timings, tier=tier,
+                                   checkpoints=get_checkpoints(supabase, gen_id) if tier == "final" else None,
+                                   cancel=cancel,
+                                   degraded=degraded)
+        result["status"] = "completed" if tier == "final" else "draft"
+
+    except Exception as e:
+        if cancel.cancelled:
+            print(f"Stopped {gen_id}: {cancel.reason}")
+            result["status"] = "cancelled"
+            result["reason"] = cancel.reason
+        else:
+            print(f"ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+            result["error"] = str(e)
+            # The final prediction is still coming, a failed draft only costs the preview
+            if tier == "final":
+                mark_failed(supabase, gen_id, timings)
+    if degraded:
+        result["degraded"] = degraded
+
+    print_timings(timings)
+    return result
+
+
+@app.function(secrets=[modal.Secret.from_name("spacecheck-secrets")])
+@modal.fastapi_endpoint(method="POST")
+def replicate_webhook(prediction: dict, job: str = "", token: str = ""):
+    from fastapi import HTTPException
+
+    try:
+        return handle_replicate_webhook(
+            prediction, job, token, os.environ.get("WEBHOOK_SECRET"),
+            spawn=lambda item, prediction: finish_generation.spawn(item, prediction)
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+
+@app.function(schedule=modal.Period(minutes=15), timeout=900, max_containers=1,
+              secrets=[modal.Secret.from_name("spacecheck-secrets")])
+def rollup_analytics():
+    """Fold new AR viewer events into the daily analytics rollups (analytics_rollup.py)"""
+    from analytics_rollup import SupabaseRollupStore, run_rollup, print_report
+
+    report = run_rollup(SupabaseRollupStore(get_supabase()))
+    print_report(report)
+    return report
 
 
 @app.function()
 @modal.fastapi_endpoint(method="POST")
 def generate(item: dict):
     print(f"Queuing job: {item}")
-    process_generation.spawn(item)
+    # Blocking mode holds a container for the whole inference
+    if item.get("blocking"):
+        process_generation.spawn(item)
+    else:
+        submit_generation.spawn(item)
     return {"status": "queued"}
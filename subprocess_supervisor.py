@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Supervised Subprocesses
+Runs external tools such as Blender under a wall-clock timeout, a CPU-time
+limit and a memory limit, streams their output to the job log as it
+arrives, and kills the whole process group when a limit is hit or the job
+is cancelled.
+
+The memory limit is enforced by a cgroup v2 group when SUPERVISOR_CGROUP
+points at a delegated, writable cgroup directory, and otherwise by a
+watchdog summing the resident memory of the process group (Linux /proc).
+The CPU limit is RLIMIT_CPU. Every run ends in one status: "ok", "failed",
+"timeout", "cpu", "memory" or "cancelled".
+
+Usage:
+    python3 subprocess_supervisor.py --timeout 60 --memory-mb 2048 -- blender --background --python script.py
+"""
+
+import os
+import sys
+import time
+import uuid
+import signal
+import argparse
+import threading
+import subprocess
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WATCHDOG_INTERVAL = 0.25
+# Seconds between RLIMIT_CPU's SIGXCPU and the kernel's SIGKILL
+CPU_GRACE = 5
+MB = 1024 * 1024
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+# Statuses meaning the tool was stopped by a limit rather than failing on its own
+LIMIT_STATUSES = ("timeout", "cpu", "memory")
+
+
+class SubprocessLimitExceeded(Exception):
+    """A supervised subprocess was killed for exceeding a limit"""
+
+    def __init__(self, name, run):
+        self.status = run["status"]
+        self.run = run
+        super().__init__(f"{name} {describe(run)}")
+
+
+def blender_limits():
+    """
+    Limits for a Blender conversion.
+
+    From BLENDER_TIMEOUT_SECONDS (default 600), BLENDER_CPU_SECONDS (default
+    1800, summed over Blender's threads) and BLENDER_MEMORY_MB (default 4096);
+    0 disables a limit.
+    """
+    def read(name, default):
+        value = float(os.environ.get(name) or default)
+        return value if value > 0 else None
+
+    return {
+        "timeout": read("BLENDER_TIMEOUT_SECONDS", 600),
+        "cpu_seconds": read("BLENDER_CPU_SECONDS", 1800),
+        "memory_mb": read("BLENDER_MEMORY_MB", 4096),
+    }
+
+
+def group_usage(pgid):
+    """(resident bytes, CPU seconds) summed over a process group; None without /proc"""
+    try:
+        pids = os.listdir("/proc")
+    except FileNotFoundError:
+        return None
+    rss, cpu = 0, 0
+    for pid in pids:
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces; fields after it start with the state
+        fields = stat[stat.rindex(b")") + 2:].split()
+        if int(fields[2]) == pgid:
+            rss += int(fields[21]) * PAGE_SIZE
+            cpu += int(fields[11]) + int(fields[12])
+    return rss, cpu / CLOCK_TICKS
+
+
+def _make_cgroup(root, memory_mb):
+    """A child cgroup of `root` capped at memory_mb, or None if it can't be created"""
+    path = os.path.join(root, f"supervised-{uuid.uuid4().hex[:12]}")
+    try:
+        os.mkdir(path)
+        with open(os.path.join(path, "memory.max"), "w") as f:
+            f.write(str(int(memory_mb * MB)))
+        if os.path.exists(os.path.join(path, "memory.swap.max")):
+            with open(os.path.join(path, "memory.swap.max"), "w") as f:
+                f.write("0")
+        return path
+    except OSError as e:
+        print(f"Warning: no cgroup memory limit ({e}), using the RSS watchdog")
+        _remove_cgroup(path)
+        return None
+
+
+def _cgroup_oom_kills(path):
+    try:
+        with open(os.path.join(path, "memory.events")) as f:
+            events = dict(line.split() for line in f if line.strip())
+        return int(events.get("oom_kill", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _remove_cgroup(path):
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+
+def _limit_cpu(pid, cpu_seconds):
+    """RLIMIT_CPU on a running process (Linux prlimit); inherited by its children"""
+    if resource is None or not hasattr(resource, "prlimit"):
+        return
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (int(cpu_seconds), int(cpu_seconds) + CPU_GRACE))
+    except OSError as e:
+        print(f"Warning: no CPU limit ({e})")
+
+
+def _join_cgroup(cgroup, pid):
+    """Move a running process into a cgroup; the children it starts later follow"""
+    try:
+        with open(os.path.join(cgroup, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+        return True
+    except OSError as e:
+        print(f"Warning: no cgroup memory limit ({e}), using the RSS watchdog")
+        return False
+
+
+def _kill_group(process):
+    """SIGKILL the process and everything it started"""
+    if os.name == "posix":
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    elif process.poll() is None:
+        process.kill()
+
+
+def _stream(pipe, tail, prefix):
+    for line in pipe:
+        line = line.rstrip("\n")
+        tail.append(line)
+        print(f"{prefix}{line}", flush=True)
+    pipe.close()
+
+
+def run_supervised(cmd, timeout=None, cpu_seconds=None, memory_mb=None, cancel=None,
+                   prefix="", tail_lines=200, cwd=None, env=None):
+    """
+    Run cmd in its own process group under the given limits.
+
+    stdout and stderr are merged and printed line by line with `prefix`.
+    `cancel` (a CancelWatcher) kills the group as soon as it fires. Returns
+    a dict: status, returncode, seconds, peak_rss_mb (None when not
+    measurable) and output (the last `tail_lines` lines).
+    """
+    posix = os.name == "posix"
+    cgroup_root = os.environ.get("SUPERVISOR_CGROUP")
+    cgroup = _make_cgroup(cgroup_root, memory_mb) if posix and memory_mb and cgroup_root else None
+
+    # Limits are applied from the parent right after the start rather than in a
+    # preexec_fn: forking from a threaded worker (cancel watcher, executor)
+    # can deadlock on locks held by other threads before exec
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, errors="replace",
+        cwd=cwd, env=env, start_new_session=posix,
+    )
+    if cpu_seconds:
+        _limit_cpu(process.pid, cpu_seconds)
+    if cgroup and not _join_cgroup(cgroup, process.pid):
+        _remove_cgroup(cgroup)
+        cgroup = None
+    tail = deque(maxlen=tail_lines)
+    reader = threading.Thread(target=_stream, args=(process.stdout, tail, prefix), daemon=True)
+    reader.start()
+
+    stopped = []
+    lock = threading.Lock()
+
+    def stop(reason):
+        with lock:
+            if stopped:
+                return
+            stopped.append(reason)
+        _kill_group(process)
+
+    unregister = cancel.on_cancel(lambda: stop("cancelled")) if cancel else (lambda: None)
+    peak, cpu_used = None, 0.0
+    try:
+        while True:
+            try:
+                process.wait(timeout=WATCHDOG_INTERVAL)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if timeout and time.perf_counter() - started > timeout:
+                stop("timeout")
+            usage = group_usage(process.pid) if posix else None
+            if usage is not None:
+                rss, cpu_used = usage
+                peak = max(peak or 0, rss)
+                if memory_mb and not cgroup and rss > memory_mb * MB:
+                    stop("memory")
+    finally:
+        unregister()
+        # Also catches helpers the tool left behind
+        _kill_group(process)
+        process.wait()
+        reader.join(timeout=5)
+        oom_kills = _cgroup_oom_kills(cgroup) if cgroup else 0
+        if cgroup:
+            _remove_cgroup(cgroup)
+
+    returncode = process.returncode
+    if stopped:
+        status = stopped[0]
+    elif oom_kills:
+        status = "memory"
+    elif returncode == 0:
+        status = "ok"
+    elif posix and cpu_seconds and (returncode == -signal.SIGXCPU or
+                                    (returncode == -signal.SIGKILL and cpu_used >= cpu_seconds - 1)):
+        # RLIMIT_CPU sends SIGXCPU, then SIGKILL if that was ignored
+        status = "cpu"
+    elif returncode == -getattr(signal, "SIGKILL", 9):
+        # Nothing here sent it: in a container that is the kernel's OOM killer
+        status = "memory"
+    else:
+        status = "failed"
+
+    return {
+        "status": status,
+        "returncode": returncode,
+        "seconds": time.perf_counter() - started,
+        "peak_rss_mb": peak / MB if peak is not None else None,
+        "output": "\n".join(tail),
+    }
+
+
+def describe(run):
+    """One line saying how a supervised run ended"""
+    peak = f", peak {run['peak_rss_mb']:.0f} MB" if run.get("peak_rss_mb") else ""
+    messages = {
+        "ok": "finished",
+        "failed": f"failed with exit code {run['returncode']}",
+        "timeout": "timed out",
+        "cpu": "exceeded its CPU time limit",
+        "memory": "ran out of memory",
+        "cancelled": "was cancelled",
+    }
+    return f"{messages[run['status']]} after {run['seconds']:.1f}s{peak}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a command under time, CPU and memory limits")
+    parser.add_argument("--timeout", type=float, help="Wall-clock seconds")
+    parser.add_argument("--cpu-seconds", type=float, help="CPU seconds (all threads)")
+    parser.add_argument("--memory-mb", type=float, help="Resident memory of the process group")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Command to run, after --")
+    args = parser.parse_args()
+
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+    if not command:
+        parser.print_help()
+        sys.exit(1)
+
+    run = run_supervised(command, timeout=args.timeout, cpu_seconds=args.cpu_seconds,
+                         memory_mb=args.memory_mb, prefix="| ")
+    print(f"{command[0]} {describe(run)}")
+    sys.exit(0 if run["status"] == "ok" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Synthetic Furniture Mesh Generator
+Builds parametric multi-part furniture scenes (table, chair, sofa, shelf) as
+GLB files with a chosen face budget, textured or untextured, plus synthetic
+phone photos for the image preprocessing benchmarks. Used by the benchmarks
+so they don't depend on real catalog assets.
+
+Usage:
+    python3 synthetic_meshes.py sofa.glb --kind sofa --faces 100000
+    python3 synthetic_meshes.py table.glb --kind table --faces 20000 --untextured --yaw 30 --floaters 10
+"""
+
+import argparse
+import numpy as np
+
+# Parts as (name, size (x, y, z) in meters, center (x, y, z) in meters)
+FURNITURE = {
+    "table": [
+        ("top", (1.60, 0.04, 0.90), (0.0, 0.73, 0.0)),
+        ("leg_fl", (0.06, 0.71, 0.06), (-0.74, 0.355, 0.39)),
+        ("leg_fr", (0.06, 0.71, 0.06), (0.74, 0.355, 0.39)),
+        ("leg_bl", (0.06, 0.71, 0.06), (-0.74, 0.355, -0.39)),
+        ("leg_br", (0.06, 0.71, 0.06), (0.74, 0.355, -0.39)),
+    ],
+    "chair": [
+        ("seat", (0.45, 0.05, 0.45), (0.0, 0.45, 0.0)),
+        ("back", (0.45, 0.45, 0.04), (0.0, 0.70, -0.205)),
+        ("leg_fl", (0.04, 0.43, 0.04), (-0.2, 0.215, 0.2)),
+        ("leg_fr", (0.04, 0.43, 0.04), (0.2, 0.215, 0.2)),
+        ("leg_bl", (0.04, 0.43, 0.04), (-0.2, 0.215, -0.2)),
+        ("leg_br", (0.04, 0.43, 0.04), (0.2, 0.215, -0.2)),
+    ],
+    "sofa": [
+        ("base", (2.20, 0.25, 0.95), (0.0, 0.175, 0.0)),
+        ("seat_l", (0.95, 0.15, 0.75), (-0.5, 0.375, 0.08)),
+        ("seat_r", (0.95, 0.15, 0.75), (0.5, 0.375, 0.08)),
+        ("back", (2.00, 0.50, 0.20), (0.0, 0.55, -0.375)),
+        ("arm_l", (0.10, 0.35, 0.95), (-1.05, 0.475, 0.0)),
+        ("arm_r", (0.10, 0.35, 0.95), (1.05, 0.475, 0.0)),
+        ("foot_l", (0.05, 0.05, 0.80), (-1.0, 0.025, 0.0)),
+        ("foot_r", (0.05, 0.05, 0.80), (1.0, 0.025, 0.0)),
+    ],
+    "shelf": [
+        ("side_l", (0.02, 1.80, 0.35), (-0.39, 0.90, 0.0)),
+        ("side_r", (0.02, 1.80, 0.35), (0.39, 0.90, 0.0)),
+        ("back", (0.80, 1.80, 0.01), (0.0, 0.90, -0.17)),
+    ] + [
+        (f"board_{i}", (0.76, 0.02, 0.33), (0.0, 0.01 + i * 0.44, 0.0)) for i in range(5)
+    ],
+}
+
+# (axis normal, u axis, v axis) for the six faces of a box
+_BOX_SIDES = [
+    (np.array([1, 0, 0]), np.array([0, 0, -1]), np.array([0, 1, 0])),
+    (np.array([-1, 0, 0]), np.array([0, 0, 1]), np.array([0, 1, 0])),
+    (np.array([0, 1, 0]), np.array([1, 0, 0]), np.array([0, 0, -1])),
+    (np.array([0, -1, 0]), np.array([1, 0, 0]), np.array([0, 0, 1])),
+    (np.array([0, 0, 1]), np.array([1, 0, 0]), np.array([0, 1, 0])),
+    (np.array([0, 0, -1]), np.array([-1, 0, 0]), np.array([0, 1, 0])),
+]
+
+
+def grid_box(size, divisions):
+    """
+    Box built from six `divisions` x `divisions` quad grids (12 * divisions^2
+    triangles). Sides don't share vertices, like typical exported meshes.
+
+    Returns (vertices, faces, uv).
+    """
+    n = max(int(divisions), 1)
+    half = np.asarray(size, dtype=np.float64) / 2.0
+    steps = np.linspace(-1.0, 1.0, n + 1)
+    gu, gv = np.meshgrid(steps, steps, indexing="xy")
+    gu, gv = gu.ravel(), gv.ravel()
+
+    # Two triangles per grid cell
+    row, col = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    corner = (row * (n + 1) + col).ravel()
+    quad = np.column_stack([corner, corner + 1, corner + n + 2, corner + n + 1])
+    grid_faces = np.vstack([quad[:, [0, 1, 2]], quad[:, [0, 2, 3]]])
+
+    vertices, faces, uv = [], [], []
+    per_side = (n + 1) ** 2
+    for i, (normal, u_axis, v_axis) in enumerate(_BOX_SIDES):
+        points = normal + np.outer(gu, u_axis) + np.outer(gv, v_axis)
+        vertices.append(points * half)
+        faces.append(grid_faces + i * per_side)
+        uv.append(np.column_stack([(gu + 1) / 2.0, (gv + 1) / 2.0]))
+
+    return np.vstack(vertices), np.vstack(faces), np.vstack(uv)
+
+
+def fabric_texture(size=512, seed=0, color=(120, 96, 80)):
+    """Procedural woven-fabric texture as a PIL image"""
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+    weave = (np.sin(x * 0.8) * np.sin(y * 0.8) + 1.0) * 12.0
+    noise = rng.normal(0.0, 8.0, (size, size))
+    shade = (weave + noise)[..., None]
+    pixels = np.clip(np.asarray(color, dtype=np.float64) + shade, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def phone_photo(width=4032, height=3024, busy=False, seed=0, orientation=6, quality=95):
+    """
+    Synthetic product photo as JPEG bytes, like a phone camera upload.
+
+    A sofa-like shape on a plain wall (or, with busy=True, in front of a
+    cluttered room), with sensor noise and an EXIF orientation tag.
+    width x height is the stored (sensor) size; the default orientation 6
+    means viewers rotate it 90 degrees, as for portrait shots.
+    """
+    import io
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    wall = np.array([236, 232, 225], dtype=np.float32)
+    pixels = np.broadcast_to(wall - y * 18.0, (height, width, 3)).copy()
+
+    if busy:
+        for _ in range(40):
+            x0, y0 = rng.integers(0, width), rng.integers(0, height)
+            w, h = rng.integers(width // 20, width // 4), rng.integers(height // 20, height // 4)
+            pixels[y0:y0 + h, x0:x0 + w] = rng.integers(30, 220, 3)
+
+    # Product: base, back and arms in one upholstery colour, centred
+    color = np.array([96, 110, 140], dtype=np.float32)
+    cx, cy, unit = width // 2, height // 2, min(width, height) // 10
+    for dx, dy, w, h in [(-3, 0, 6, 2), (-3, -2, 6, 2), (-3.5, -1, 0.6, 3), (2.9, -1, 0.6, 3)]:
+        x0, y0 = int(cx + dx * unit), int(cy + dy * unit)
+        pixels[y0:y0 + int(h * unit), x0:x0 + int(w * unit)] = color * rng.uniform(0.85, 1.0)
+
+    # Sensor noise from a small tile, so 48MP images stay cheap to build
+    tile = rng.normal(0.0, 4.0, (256, 256, 1)).astype(np.float32)
+    reps = (-(-height // 256), -(-width // 256), 1)
+    pixels += np.tile(tile, reps)[:height, :width]
+
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=quality, exif=exif.tobytes())
+    return output.getvalue()
+
+
+def make_furniture(kind="sofa", faces=10000, textured=True, seed=0, yaw=0.0, floaters=0, texture_size=512,
+                   part_textures=False):
+    """
+    Build a multi-part furniture scene.
+
+    Args:
+        kind: One of FURNITURE (table, chair, sofa, shelf)
+        faces: Approximate total triangle budget, spread by part surface area
+        textured: Give parts UVs and a shared fabric texture; otherwise flat colors
+        seed: Random seed (colors, texture noise, floater placement)
+        yaw: Rotate the whole model around Y (degrees), e.g. for OBB tests
+        floaters: Number of tiny disconnected boxes to scatter, e.g. for cleanup tests
+        texture_size: Texture resolution in pixels
+        part_textures: Give every textured part its own material and texture,
+            like catalog models exported part by part
+
+    Returns:
+        trimesh.Scene with one node per part
+    """
+    import trimesh
+
+    rng = np.random.default_rng(seed)
+    parts = list(FURNITURE[kind])
+    for i in range(floaters):
+        center = rng.uniform(-1.0, 1.0, 3) + np.array([0.0, 1.0, 0.0])
+        parts.append((f"floater_{i}", (0.01, 0.01, 0.01), tuple(center)))
+
+    sizes = np.array([p[1] for p in parts], dtype=np.float64)
+    areas = 2 * (sizes[:, 0] * sizes[:, 1] + sizes[:, 1] * sizes[:, 2] + sizes[:, 0] * sizes[:, 2])
+    budgets = faces * areas / areas.sum()
+
+    # Textured parts share one fabric material, like upholstered catalog models
+    fabric = None
+    if textured:
+        fabric = trimesh.visual.material.PBRMaterial(
+            name=f"{kind}_fabric", baseColorTexture=fabric_texture(texture_size, seed), roughnessFactor=0.9
+        )
+
+    scene = trimesh.Scene()
+    for (name, size, center), budget in zip(parts, budgets):
+        vertices, part_faces, uv = grid_box(size, np.sqrt(budget / 12.0))
+        vertices = vertices + np.asarray(center)
+
+        if textured and part_textures:
+            tint = tuple(int(c) for c in rng.integers(60, 200, 3))
+            material = trimesh.visual.material.PBRMaterial(
+                name=f"{kind}_{name}", roughnessFactor=0.9,
+                baseColorTexture=fabric_texture(texture_size // 2, int(rng.integers(1 << 16)), color=tint),
+            )
+            visual = trimesh.visual.TextureVisuals(uv=uv, material=material)
+        elif textured:
+            visual = trimesh.visual.TextureVisuals(uv=uv, material=fabric)
+        else:
+            color = np.append(rng.integers(60, 220, 3), 255).astype(np.uint8)
+            material = trimesh.visual.material.PBRMaterial(
+                name=f"{kind}_{name}", baseColorFactor=color, roughnessFactor=0.8
+            )
+            visual = trimesh.visual.TextureVisuals(material=material)
+
+        mesh = trimesh.Trimesh(vertices, part_faces, visual=visual, process=False)
+        scene.add_geometry(mesh, node_name=name, geom_name=name)
+
+    if yaw:
+        scene.apply_transform(trimesh.transformations.rotation_matrix(np.radians(yaw), [0, 1, 0]))
+    return scene
+
+
+def write_furniture_glb(path, **kwargs):
+    """Generate a furniture scene (see make_furniture) and save it as GLB"""
+    scene = make_furniture(**kwargs)
+    scene.export(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic furniture GLBs")
+    parser.add_argument("output", help="Output GLB path")
+    parser.add_argument("--kind", choices=sorted(FURNITURE), default="sofa", help="Furniture type (default: sofa)")
+    parser.add_argument("--faces", type=int, default=10000, help="Approximate triangle count (default: 10000)")
+    parser.add_argument("--untextured", action="store_true", help="Flat colors instead of a texture")
+    parser.add_argument("--part-textures", action="store_true", help="A separate material and texture per part")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--yaw", type=float, default=0.0, help="Rotate around Y by this many degrees")
+    parser.add_argument("--floaters", type=int, default=0, help="Scatter this many tiny disconnected parts")
+
+    args = parser.parse_args()
+
+    scene = make_furniture(
+        kind=args.kind, faces=args.faces, textured=not args.untextured,
+        seed=args.seed, yaw=args.yaw, floaters=args.floaters,
+        part_textures=args.part_textures,
+    )
+    scene.export(args.output)
+    total = sum(len(g.faces) for g in scene.geometry.values())
+    print(f"Saved {args.kind} with {len(scene.geometry)} parts and {total} faces to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
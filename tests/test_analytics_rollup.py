@@ -0,0 +1,120 @@
+import json
+import sqlite3
+from datetime import timedelta
+
+import pytest
+
+from analytics_rollup import SqlRollupStore, run_rollup, seed_events, utc_now
+
+# The rollup's device and language rules, as a GROUP BY over the raw events
+RAW_DAILY = """
+SELECT substr(created_at, 1, 10) AS day, COALESCE(model_name, '') AS model_name, event_type,
+       CASE
+           WHEN json_extract(metadata, '$.ios') IN (1, 'true')
+                OR json_extract(metadata, '$.userAgent') LIKE '%iPhone%'
+                OR json_extract(metadata, '$.userAgent') LIKE '%iPad%' THEN 'ios'
+           WHEN json_extract(metadata, '$.userAgent') LIKE '%Android%' THEN 'android'
+           ELSE 'desktop'
+       END AS device,
+       COALESCE(json_extract(metadata, '$.language'), '') AS language,
+       COUNT(*) AS events
+FROM analytics WHERE id <= ? GROUP BY 1, 2, 3, 4, 5
+"""
+RAW_USERS = """
+SELECT DISTINCT substr(created_at, 1, 10), COALESCE(model_name, ''), user_id
+FROM analytics WHERE id <= ? AND user_id IS NOT NULL AND user_id != ''
+"""
+
+
+@pytest.fixture
+def store():
+    return SqlRollupStore(sqlite3.connect(":memory:"))
+
+
+def _daily(conn):
+    return sorted(conn.execute(
+        "SELECT day, model_name, event_type, device, language, events FROM analytics_daily").fetchall())
+
+
+def _users(conn):
+    return sorted(conn.execute("SELECT day, model_name, user_id FROM analytics_daily_users").fetchall())
+
+
+def _insert(conn, created_at, event_type="view_page", user_id="user-1", model_name="sofa", metadata=None):
+    conn.execute("INSERT INTO analytics (created_at, event_type, user_id, model_name, metadata) VALUES (?, ?, ?, ?, ?)",
+                 (created_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"), event_type, user_id, model_name,
+                  json.dumps(metadata or {})))
+    conn.commit()
+
+
+def test_matches_group_by_on_raw_events(store):
+    seed_events(store.conn, 5000, days=5, models=7, users=300)
+    # Small batches, so counts from several batches add up in the same rows
+    report = run_rollup(store, batch_size=700)
+    assert report["events"] == 5000
+    assert report["batches"] == 8
+    assert not report["conflict"]
+
+    last_id = report["last_id"]
+    assert _daily(store.conn) == sorted(store.conn.execute(RAW_DAILY, (last_id,)).fetchall())
+    assert _users(store.conn) == sorted(store.conn.execute(RAW_USERS, (last_id,)).fetchall())
+
+
+def test_rerun_adds_only_new_events(store):
+    seed_events(store.conn, 1000, days=2, seed=1)
+    run_rollup(store)
+    seed_events(store.conn, 500, days=2, seed=2)
+    report = run_rollup(store)
+    assert report["events"] == 500
+
+    assert run_rollup(store)["events"] == 0
+    total = store.conn.execute("SELECT SUM(events) FROM analytics_daily").fetchone()[0]
+    assert total == 1500
+    assert _daily(store.conn) == sorted(store.conn.execute(RAW_DAILY, (report["last_id"],)).fetchall())
+
+
+def test_recent_events_wait_for_the_next_run(store):
+    now = utc_now()
+    _insert(store.conn, now - timedelta(minutes=10))
+    _insert(store.conn, now - timedelta(seconds=5))
+    _insert(store.conn, now - timedelta(minutes=20))
+
+    report = run_rollup(store, settle_seconds=60)
+    # Stops at the first unsettled event, even though a later id is old enough
+    assert report["events"] == 1
+    assert report["last_id"] == 1
+    assert store.last_id() == 1
+
+    assert run_rollup(store, settle_seconds=0)["events"] == 2
+    assert store.last_id() == 3
+
+
+def test_stale_cursor_is_rejected(store):
+    seed_events(store.conn, 100, days=1)
+    assert store.apply(0, 50, [], [])
+    before = _daily(store.conn)
+
+    row = {"day": "2026-01-01", "model_name": "sofa", "event_type": "view_page", "device": "ios",
+           "language": "en", "events": 3}
+    # Another run already moved the cursor from 0 to 50
+    assert not store.apply(0, 60, [row], [{"day": "2026-01-01", "model_name": "sofa", "user_id": "u"}])
+    assert store.last_id() == 50
+    assert _daily(store.conn) == before
+    assert _users(store.conn) == []
+
+
+def test_concurrent_run_reports_conflict(store):
+    seed_events(store.conn, 300, days=1)
+
+    class Racing(SqlRollupStore):
+        def apply(self, expected_id, last_id, daily, users):
+            # A second run commits its batch between this run's read and write
+            super().apply(expected_id, expected_id + 1, [], [])
+            return super().apply(expected_id, last_id, daily, users)
+
+    racing = Racing(store.conn)
+    report = run_rollup(racing)
+    assert report["conflict"]
+    assert report["events"] == 0
+    assert store.last_id() == 1
+    assert _daily(store.conn) == []
@@ -0,0 +1,74 @@
+import json
+
+import numpy as np
+import pytest
+import trimesh
+from PIL import Image
+
+from asset_store import LocalBlobStore, load_packed, publish_model, split_glb
+from glb_io import read_glb, write_glb
+
+
+def _textured_glb(seed, texture, subdivisions=4):
+    """A textured sphere GLB; vertex buffers above MIN_BLOB_BYTES so they get blobs of their own"""
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions)
+    mesh.apply_translation(np.random.default_rng(seed).normal(size=3))
+    uv = (mesh.vertices[:, :2] + 1.0) / 2.0
+    mesh.visual = trimesh.visual.TextureVisuals(uv=uv, image=texture)
+    return mesh.export(file_type="glb")
+
+
+@pytest.fixture
+def texture():
+    pixels = np.random.default_rng(0).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def _load(data):
+    return trimesh.load(trimesh.util.wrap_as_stream(data), file_type="glb", force="mesh")
+
+
+def test_split_pack_round_trip(tmp_path, texture):
+    data = _textured_glb(1, texture)
+    store = LocalBlobStore(str(tmp_path))
+    assert publish_model(store, data, "gltf/model.gltf") is not None
+
+    packed = load_packed(store, "gltf/model.gltf")
+    original, restored = _load(data), _load(packed)
+    np.testing.assert_array_equal(original.vertices, restored.vertices)
+    np.testing.assert_array_equal(original.faces, restored.faces)
+    np.testing.assert_array_equal(original.visual.uv, restored.visual.uv)
+    np.testing.assert_array_equal(np.asarray(original.visual.material.baseColorTexture),
+                                  np.asarray(restored.visual.material.baseColorTexture))
+
+
+def test_shared_texture_is_stored_once(tmp_path, texture):
+    store = LocalBlobStore(str(tmp_path))
+    first = publish_model(store, _textured_glb(1, texture), "gltf/a.gltf")
+    second = publish_model(store, _textured_glb(2, texture), "gltf/b.gltf")
+    assert first["uploaded_blobs"] == first["blobs"]
+    # Same texture and the same sphere topology (indices, UVs): only the moved positions are new
+    assert second["uploaded_blobs"] < second["blobs"]
+    assert second["uploaded_bytes"] < first["uploaded_bytes"]
+
+
+def test_blob_uris_are_relative_to_the_gltf(tmp_path, texture):
+    gltf_bytes, blobs = split_glb(_textured_glb(1, texture), blob_uri="../blobs/")
+    gltf = json.loads(gltf_bytes)
+    uris = [b["uri"] for b in gltf["buffers"]] + [i["uri"] for i in gltf["images"]]
+    assert all(uri.startswith("../blobs/") for uri in uris)
+    assert {uri[len("../blobs/"):] for uri in uris} == set(blobs)
+
+
+@pytest.mark.parametrize("extension", ["EXT_meshopt_compression", "KHR_draco_mesh_compression"])
+def test_compressed_glbs_are_left_whole(texture, extension):
+    gltf, binary = read_glb(_textured_glb(1, texture))
+    # Listed only as used: a fallback exists, but the extension still points at buffer views
+    gltf["extensionsUsed"] = gltf.get("extensionsUsed", []) + [extension]
+    assert split_glb(write_glb(gltf, bytes(binary))) is None
+
+
+def test_external_buffers_are_left_whole(texture):
+    gltf, binary = read_glb(_textured_glb(1, texture))
+    gltf["buffers"][0]["uri"] = "model.bin"
+    assert split_glb(write_glb(gltf, bytes(binary))) is None
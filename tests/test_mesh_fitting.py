@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import trimesh
+
+from mesh_fitting import oriented_bounds
+
+
+def _box_points(extents, yaw_degrees):
+    mesh = trimesh.creation.box(extents=extents)
+    mesh.apply_transform(trimesh.transformations.rotation_matrix(np.radians(yaw_degrees), [0, 1, 0]))
+    return np.asarray(mesh.vertices)
+
+
+@pytest.mark.parametrize("extents", [(1.6, 0.5, 2.0), (2.0, 0.8, 0.9)])
+def test_aligned_box_keeps_its_axes(extents):
+    _, _, found = oriented_bounds(_box_points(extents, 0))
+    np.testing.assert_allclose(found, extents, atol=1e-6)
+
+
+def test_aligned_deep_box_with_matching_target_stays():
+    _, _, found = oriented_bounds(_box_points((1.6, 0.5, 2.0), 0), target_ratio=1.6 / 2.0)
+    np.testing.assert_allclose(found, (1.6, 0.5, 2.0), atol=1e-6)
+
+
+@pytest.mark.parametrize("yaw", [-60, 30, 46, 60, 89, 120])
+@pytest.mark.parametrize("extents", [(2.0, 0.8, 0.9), (1.6, 0.5, 2.0)])
+def test_target_ratio_picks_the_width_side(extents, yaw):
+    _, _, found = oriented_bounds(_box_points(extents, yaw), target_ratio=extents[0] / extents[2])
+    np.testing.assert_allclose(found, extents, atol=1e-3)
+
+
+def test_small_rotation_is_undone_without_target():
+    _, _, found = oriented_bounds(_box_points((1.6, 0.5, 2.0), 20))
+    np.testing.assert_allclose(found, (1.6, 0.5, 2.0), atol=1e-3)
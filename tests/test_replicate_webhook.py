@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+import spacecheck_backend
+from loadtest import StandInServer, make_fake_replicate, patched_environment
+from spacecheck_backend import build_webhook_url, encode_job, handle_replicate_webhook, sign_job
+
+SECRET = "test-webhook-secret"
+OUTPUT_URL = "https://replicate.delivery/model.glb"
+ITEM = {"generationId": "gen-1", "runId": "run-1", "imageUrl": "https://example.com/chair.jpg",
+        "dimensions": {"width": 80, "height": 90, "depth": 75}, "tier": "final"}
+
+
+def _spawned(prediction, job, token, secret=SECRET):
+    calls = []
+    response = handle_replicate_webhook(prediction, job, token, secret, spawn=lambda *args: calls.append(args))
+    return response, calls
+
+
+def test_signed_job_is_accepted():
+    job = encode_job(ITEM)
+    response, calls = _spawned({"id": "p1", "status": "succeeded"}, job, sign_job(job, SECRET))
+    assert response == {"status": "accepted"}
+    assert calls[0][0]["generationId"] == "gen-1"
+
+
+def test_webhook_url_carries_a_valid_token():
+    from urllib.parse import parse_qs, urlparse
+
+    query = parse_qs(urlparse(build_webhook_url("https://hooks.example.com/replicate", ITEM, SECRET)).query)
+    _, calls = _spawned({"id": "p1", "status": "succeeded"}, query["job"][0], query["token"][0])
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("token", ["", "0" * 64, None])
+def test_bad_token_is_rejected(token):
+    job = encode_job(ITEM)
+    with pytest.raises(PermissionError):
+        _spawned({"id": "p1", "status": "succeeded"}, job, token or "")
+
+
+def test_tampered_job_is_rejected():
+    job = encode_job(ITEM)
+    token = sign_job(job, SECRET)
+    tampered = encode_job({**ITEM, "generationId": "someone-elses"})
+    with pytest.raises(PermissionError):
+        _spawned({"id": "p1", "status": "succeeded"}, tampered, token)
+
+
+def test_missing_secret_rejects_everything():
+    job = encode_job(ITEM)
+    with pytest.raises(PermissionError):
+        _spawned({"id": "p1", "status": "succeeded"}, job, sign_job(job, SECRET), secret=None)
+
+
+def test_unfinished_prediction_is_ignored():
+    job = encode_job(ITEM)
+    response, calls = _spawned({"id": "p1", "status": "processing"}, job, sign_job(job, SECRET))
+    assert response["status"] == "ignored"
+    assert calls == []
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """finish_generation against the load test's Supabase and Replicate stand-ins, post-processing recorded"""
+    replicate = make_fake_replicate(OUTPUT_URL, inference_time=0.0)
+    processed = []
+
+    def postprocess(supabase, item, glb_url, timings, **kwargs):
+        processed.append(glb_url)
+
+    monkeypatch.setattr(spacecheck_backend, "postprocess_generation", postprocess)
+    with StandInServer() as server, patched_environment(server, replicate, checkpoint_store="off", cancel_poll=0):
+        prediction = replicate.predictions.create(version="v", input={})
+        server.state.insert("generations", {"id": ITEM["generationId"], "status": "processing",
+                                            "run_id": ITEM["runId"], "prediction_ids": [prediction.id]})
+        yield prediction.id, processed
+
+
+def _finish(prediction):
+    return spacecheck_backend.finish_generation.local(ITEM, prediction)
+
+
+def test_repeated_delivery_is_processed_once(backend):
+    prediction_id, processed = backend
+    delivery = {"id": prediction_id, "status": "succeeded", "output": OUTPUT_URL}
+    assert _finish(delivery)["status"] == "completed"
+    assert _finish(delivery)["status"] == "skipped"
+    assert processed == [OUTPUT_URL]
+
+
+def test_concurrent_deliveries_are_processed_once(backend):
+    prediction_id, processed = backend
+    delivery = {"id": prediction_id, "status": "succeeded", "output": OUTPUT_URL}
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(_finish(delivery)["status"])) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == ["completed", "skipped", "skipped", "skipped"]
+    assert processed == [OUTPUT_URL]
+
+
+def test_output_comes_from_replicate_not_the_body(backend):
+    prediction_id, processed = backend
+    _finish({"id": prediction_id, "status": "succeeded", "output": "https://attacker.example.com/evil.glb"})
+    assert processed == [OUTPUT_URL]
+
+
+def test_unknown_prediction_is_skipped(backend):
+    _, processed = backend
+    result = _finish({"id": "not-ours", "status": "succeeded", "output": "https://attacker.example.com/evil.glb"})
+    assert result["status"] == "skipped"
+    assert processed == []
@@ -0,0 +1,149 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+from usdz_packager import (
+    ALIGNMENT, entry_data_offset, find_layer_assets, package_usdz, remove_layer_files, validate_usdz, write_usdz
+)
+
+TEXTURES = ["albedo.png", "normal.jpg", "roughness.png"]
+
+
+def write_layer(path, textures):
+    """A .usda whose shaders reference textures/<name>, as Blender's USD export writes them"""
+    shaders = "".join(f"""
+    def Shader "{os.path.splitext(name)[0]}"
+    {{
+        uniform token info:id = "UsdUVTexture"
+        asset inputs:file = @./textures/{name}@
+    }}
+""" for name in textures)
+    path.write_text(f'#usda 1.0\n\ndef Material "material"\n{{{shaders}}}\n')
+    return path
+
+
+@pytest.fixture
+def layer(tmp_path):
+    """A layer with its textures, next to another model's texture in the same textures/ folder"""
+    textures = tmp_path / "textures"
+    textures.mkdir()
+    # Odd sizes, so unpadded entries would land off the 64-byte grid
+    for name, size in zip(TEXTURES, (4097, 333, 7)):
+        (textures / name).write_bytes(os.urandom(size))
+    (textures / "other_model.png").write_bytes(os.urandom(100))
+    return write_layer(tmp_path / "model.usda", TEXTURES)
+
+
+@pytest.fixture
+def usdz(layer, tmp_path):
+    return package_usdz(str(layer), str(tmp_path / "model.usdz"))
+
+
+def test_entries_are_stored(usdz):
+    with zipfile.ZipFile(usdz) as zf:
+        infos = zf.infolist()
+        assert len(infos) == 4
+        for info in infos:
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.compress_size == info.file_size
+
+
+def test_entry_data_is_aligned(usdz):
+    with zipfile.ZipFile(usdz) as zf:
+        for info in zf.infolist():
+            assert entry_data_offset(zf.fp, info) % ALIGNMENT == 0, info.filename
+
+
+def test_root_layer_is_first(usdz):
+    with zipfile.ZipFile(usdz) as zf:
+        names = zf.namelist()
+    assert names[0] == "model.usda"
+    assert sorted(names[1:]) == ["textures/albedo.png", "textures/normal.jpg", "textures/roughness.png"]
+
+
+def test_unreferenced_textures_are_left_out(layer):
+    assert sorted(os.path.basename(path) for path in find_layer_assets(str(layer))) == TEXTURES
+
+
+def test_references_without_usd_bindings(layer, monkeypatch):
+    # A text layer is read for @asset@ paths when usd-core isn't installed
+    monkeypatch.setitem(sys.modules, "pxr", None)
+    assert sorted(os.path.basename(path) for path in find_layer_assets(str(layer))) == TEXTURES
+
+
+def test_remove_layer_files(layer, tmp_path):
+    second = write_layer(tmp_path / "model_2.usda", TEXTURES[:1])
+    remove_layer_files([str(layer), str(second)])
+    assert sorted(os.listdir(tmp_path)) == ["textures"]
+    assert os.listdir(tmp_path / "textures") == ["other_model.png"]
+
+
+def test_remove_layer_files_drops_empty_folder(tmp_path):
+    (tmp_path / "textures").mkdir()
+    (tmp_path / "textures" / "albedo.png").write_bytes(b"png")
+    layer = write_layer(tmp_path / "model.usda", ["albedo.png"])
+    remove_layer_files([str(layer)])
+    assert os.listdir(tmp_path) == []
+
+
+def test_contents_round_trip(layer, usdz):
+    with zipfile.ZipFile(usdz) as zf:
+        assert zf.read("model.usda") == layer.read_bytes()
+        assert zf.read("textures/albedo.png") == (layer.parent / "textures" / "albedo.png").read_bytes()
+
+
+def test_packaged_archive_is_valid(usdz):
+    assert validate_usdz(usdz) == []
+
+
+def test_bytes_sources_are_aligned(tmp_path):
+    path = str(tmp_path / "memory.usdz")
+    write_usdz(path, [("scene.usda", b"#usda 1.0\n"), ("textures/a.png", memoryview(os.urandom(100)))])
+    assert validate_usdz(path) == []
+
+
+def test_write_rejects_texture_first(tmp_path):
+    with pytest.raises(ValueError):
+        write_usdz(str(tmp_path / "bad.usdz"), [("textures/a.png", b"png")])
+
+
+def _plain_zip(path, entries, compression=zipfile.ZIP_STORED):
+    """A zip written without USDZ padding"""
+    with zipfile.ZipFile(path, "w", compression=compression) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    return path
+
+
+def test_validate_rejects_compressed_entries(tmp_path):
+    path = _plain_zip(str(tmp_path / "deflated.usdz"),
+                      [("model.usdc", b"\0" * 1000), ("textures/a.png", b"\0" * 1000)],
+                      compression=zipfile.ZIP_DEFLATED)
+    problems = validate_usdz(path)
+    assert any("is compressed" in problem for problem in problems)
+
+
+def test_validate_rejects_unaligned_data(tmp_path):
+    path = _plain_zip(str(tmp_path / "unaligned.usdz"),
+                      [("model.usdc", b"x" * 37), ("textures/a.png", b"y" * 11)])
+    problems = validate_usdz(path)
+    assert any("not 64-byte aligned" in problem for problem in problems)
+
+
+def test_validate_rejects_texture_first(tmp_path):
+    path = str(tmp_path / "texture_first.usdz")
+    # Aligned and stored, only the order is wrong
+    write_usdz(path, [("model.usdc", b"usdc"), ("textures/a.png", b"png")])
+    with zipfile.ZipFile(path) as zf, zipfile.ZipFile(str(tmp_path / "reordered.usdz"), "w") as out:
+        for info in reversed(zf.infolist()):
+            out.writestr(info, zf.read(info))
+    problems = validate_usdz(str(tmp_path / "reordered.usdz"))
+    assert any("is not a USD layer" in problem for problem in problems)
+
+
+def test_validate_rejects_non_zip(tmp_path):
+    path = tmp_path / "model.usdz"
+    path.write_bytes(b"not a zip")
+    assert validate_usdz(str(path)) != []
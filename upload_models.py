@@ -3,16 +3,23 @@ import requests
 import sys
 
 # --- CONFIGURATION ---
-# usage: python3 upload_models.py <SUPABASE_URL> <SUPABASE_SERVICE_ROLE_KEY>
+# usage: python3 upload_models.py <SUPABASE_URL> <SUPABASE_SERVICE_ROLE_KEY> [--skip-unchanged] [--dedupe]
+#   --skip-unchanged: skip files uploaded before with the same content (tracked in catalog_index.sqlite)
+#   --dedupe: upload gltf/<name>.gltf plus content-addressed blobs (asset_store.py) instead of
+#             whole GLBs, so textures and buffers shared between models are stored once
 
-if len(sys.argv) < 3:
-    print("Usage: python3 upload_models.py <SUPABASE_URL> <SUPABASE_SERVICE_ROLE_KEY>")
+SKIP_UNCHANGED = "--skip-unchanged" in sys.argv
+DEDUPE = "--dedupe" in sys.argv
+ARGS = [arg for arg in sys.argv[1:] if arg not in ("--skip-unchanged", "--dedupe")]
+
+if len(ARGS) < 2:
+    print("Usage: python3 upload_models.py <SUPABASE_URL> <SUPABASE_SERVICE_ROLE_KEY> [--skip-unchanged] [--dedupe]")
     print("NOTE: Use the SERVICE_ROLE_KEY (secret) to bypass Row Level Security for uploads, ")
     print("      or ensure your 'models' bucket has an 'INSERT' policy for public users.")
     sys.exit(1)
 
-SUPABASE_URL = sys.argv[1]
-SUPABASE_KEY = sys.argv[2]
+SUPABASE_URL = ARGS[0]
+SUPABASE_KEY = ARGS[1]
 BUCKET_NAME = "models"
 ASSETS_DIR = "assets"
 
@@ -41,9 +48,44 @@ def upload_file(filename):
 
     if response.status_code == 200:
         print(f"✅ Success: {filename}")
+        return True
     else:
         print(f"❌ Failed: {filename}")
         print(response.text)
+        return False
+
+_blob_store = None
+DEDUPE_TOTALS = {"whole": 0, "uploaded": 0}
+
+def upload_deduplicated(filename):
+    """Upload a GLB as gltf/<name>.gltf plus only the blobs the bucket doesn't have yet"""
+    global _blob_store
+    from asset_store import StorageBlobStore, publish_model
+
+    if _blob_store is None:
+        from supabase import create_client
+        _blob_store = StorageBlobStore(create_client(SUPABASE_URL, SUPABASE_KEY), BUCKET_NAME)
+
+    with open(os.path.join(ASSETS_DIR, filename), 'rb') as f:
+        file_data = f.read()
+    gltf_path = f"gltf/{os.path.splitext(filename)[0]}.gltf"
+
+    print(f"Uploading {filename} as {gltf_path}...")
+    try:
+        report = publish_model(_blob_store, file_data, gltf_path)
+    except Exception as e:
+        print(f"❌ Failed: {filename}")
+        print(e)
+        return False
+    if report is None:
+        # Draco/meshopt models can't be split, they stay self-contained
+        return upload_file(filename)
+
+    DEDUPE_TOTALS["whole"] += len(file_data)
+    DEDUPE_TOTALS["uploaded"] += report["gltf_bytes"] + report["uploaded_bytes"]
+    print(f"✅ Success: {filename} ({report['uploaded_blobs']} of {report['blobs']} blobs new, "
+          f"{(report['gltf_bytes'] + report['uploaded_bytes']) / 1024:.1f} of {len(file_data) / 1024:.1f} KB uploaded)")
+    return True
 
 def main():
     if not os.path.exists(ASSETS_DIR):
@@ -58,8 +100,32 @@ def main():
 
     print(f"Found {len(files)} models. Starting upload to bucket '{BUCKET_NAME}'...")
     
-    for file in files:
-        upload_file(file)
+    upload = upload_deduplicated if DEDUPE else upload_file
+
+    if not SKIP_UNCHANGED:
+        for file in files:
+            upload(file)
+    else:
+        from catalog_index import open_index, lookup, is_done, record_done
+
+        index = open_index()
+        skipped = 0
+        for file in files:
+            file_hash = lookup(index, os.path.join(ASSETS_DIR, file))["sha256"]
+            target = {"url": SUPABASE_URL, "bucket": BUCKET_NAME, "name": file}
+            if DEDUPE:
+                target["dedupe"] = True
+            if is_done(index, file_hash, "upload", target):
+                skipped += 1
+                continue
+            if upload(file):
+                record_done(index, file_hash, "upload", target)
+        print(f"Skipped {skipped} unchanged models.")
+
+    if DEDUPE and DEDUPE_TOTALS["whole"]:
+        saved = DEDUPE_TOTALS["whole"] - DEDUPE_TOTALS["uploaded"]
+        print(f"Uploaded {DEDUPE_TOTALS['uploaded'] / 1024 / 1024:.2f} MB instead of "
+              f"{DEDUPE_TOTALS['whole'] / 1024 / 1024:.2f} MB ({saved / DEDUPE_TOTALS['whole']:.1%} saved)")
 
     print("\nDone! Don't forget to update your viewer.html with your Project ID.")
 
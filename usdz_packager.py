@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+USDZ Packager
+Packages a USD layer (.usdc/.usda) and its textures into a spec-compliant
+USDZ archive: stored (uncompressed) entries, every file's data 64-byte aligned,
+USD layer first. Entries are streamed in chunks, textures are never fully
+loaded into memory. Only the assets the layer references are packed.
+
+Usage:
+    python3 usdz_packager.py pack model.usdc model.usdz [--asset textures/wood.png ...]
+    python3 usdz_packager.py validate model.usdz
+"""
+
+import os
+import re
+import sys
+import struct
+import zipfile
+import argparse
+
+# USDZ requires each entry's data to start on a 64-byte boundary
+ALIGNMENT = 64
+
+# Extra field header id used by Pixar's usdzip for alignment padding
+PADDING_HEADER_ID = 0x1986
+
+USD_EXTENSIONS = {'.usda', '.usdc', '.usd'}
+ALLOWED_EXTENSIONS = USD_EXTENSIONS | {
+    '.usdz', '.png', '.jpg', '.jpeg', '.exr', '.avif', '.m4a', '.mp3', '.wav'
+}
+
+CHUNK_SIZE = 1024 * 1024
+
+LOCAL_HEADER_SIZE = 30
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+# @path@ asset references in a text (.usda) layer
+ASSET_PATH_PATTERN = re.compile(rb'@([^@\n]+)@')
+
+
+def _padding_extra(data_offset):
+    """Build an extra field that pushes data_offset up to the next aligned position"""
+    pad = (-data_offset) % ALIGNMENT
+    if pad == 0:
+        return b''
+    # An extra field needs at least its 4-byte header
+    if pad < 4:
+        pad += ALIGNMENT
+    return struct.pack('<HH', PADDING_HEADER_ID, pad - 4) + b'\x00' * (pad - 4)
+
+
+def _source_size(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source).nbytes
+    return os.path.getsize(source)
+
+
+def _write_source(dest, source):
+    """Stream a path or bytes-like source into an open archive entry"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, view.nbytes, CHUNK_SIZE):
+            dest.write(view[start:start + CHUNK_SIZE])
+        return
+
+    with open(source, 'rb') as src:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            dest.write(chunk)
+
+
+def write_usdz(usdz_path, entries):
+    """
+    Write a USDZ archive.
+
+    Args:
+        usdz_path: Output .usdz path
+        entries: List of (arcname, source) tuples. The first entry must be the
+            root USD layer. source is a file path or a bytes-like object
+            (memoryviews are written without copying).
+    """
+    if not entries:
+        raise ValueError("USDZ needs at least one entry")
+    if os.path.splitext(entries[0][0])[1].lower() not in USD_EXTENSIONS:
+        raise ValueError(f"First USDZ entry must be a USD layer, got '{entries[0][0]}'")
+
+    with zipfile.ZipFile(usdz_path, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for arcname, source in entries:
+            size = _source_size(source)
+
+            info = zipfile.ZipInfo(arcname, date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_STORED
+            info.file_size = size
+            info.external_attr = 0o644 << 16
+
+            # zipfile adds a 20-byte zip64 extra to the local header for large entries
+            zip64_extra = 20 if size * 1.05 > zipfile.ZIP64_LIMIT else 0
+            name_size = len(arcname.encode('utf-8'))
+            data_offset = zf.fp.tell() + LOCAL_HEADER_SIZE + name_size + zip64_extra
+            info.extra = _padding_extra(data_offset)
+
+            with zf.open(info, 'w') as dest:
+                _write_source(dest, source)
+
+
+def _referenced_assets(layer_path):
+    """
+    Files the layer references (textures, sublayers), or None if the layer
+    can't be read: a binary .usdc needs the USD Python bindings.
+    """
+    layer_path = os.path.abspath(layer_path)
+    try:
+        from pxr import Tf, UsdUtils
+    except ImportError:
+        if os.path.splitext(layer_path)[1].lower() != '.usda':
+            return None
+        base_dir = os.path.dirname(layer_path)
+        with open(layer_path, 'rb') as f:
+            found = [os.path.normpath(os.path.join(base_dir, match.decode('utf-8')))
+                     for match in ASSET_PATH_PATTERN.findall(f.read())]
+    else:
+        try:
+            layers, found, _ = UsdUtils.ComputeAllDependencies(layer_path)
+        except Tf.ErrorException as e:
+            print(f"Warning: Could not read {layer_path}: {e}")
+            return None
+        found = [layer.realPath for layer in layers] + list(found)
+
+    assets = []
+    for path in dict.fromkeys(os.path.abspath(path) for path in found):
+        if path != layer_path and os.path.isfile(path) \
+                and os.path.splitext(path)[1].lower() in ALLOWED_EXTENSIONS:
+            assets.append(path)
+    return assets
+
+
+def find_layer_assets(layer_path):
+    """
+    Collect the files a USD layer references, relative to the layer.
+
+    Falls back to the `textures/` folder Blender's USD exporter writes beside
+    the layer when the references can't be read (a .usdc without usd-core).
+    """
+    assets = _referenced_assets(layer_path)
+    if assets is not None:
+        return assets
+
+    print("Warning: USD bindings not available (pip3 install usd-core), packing every file in textures/")
+    base_dir = os.path.dirname(os.path.abspath(layer_path))
+    textures_dir = os.path.join(base_dir, 'textures')
+
+    assets = []
+    if os.path.isdir(textures_dir):
+        for root, _, files in os.walk(textures_dir):
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in ALLOWED_EXTENSIONS:
+                    assets.append(os.path.join(root, name))
+    return assets
+
+
+def package_usdz(layer_path, usdz_path, asset_paths=None):
+    """
+    Package a USD layer and its assets into a USDZ archive.
+
+    Args:
+        layer_path: Root layer (.usdc/.usda)
+        usdz_path: Output .usdz path
+        asset_paths: Texture files to include. Defaults to the files the
+            layer references (find_layer_assets). Archive names are relative to
+            the layer's directory so the layer's relative asset paths still resolve.
+    """
+    if asset_paths is None:
+        asset_paths = find_layer_assets(layer_path)
+
+    base_dir = os.path.dirname(os.path.abspath(layer_path))
+    entries = [(os.path.basename(layer_path), layer_path)]
+    for asset in asset_paths:
+        arcname = os.path.relpath(os.path.abspath(asset), base_dir).replace(os.sep, '/')
+        if arcname.startswith('../'):
+            arcname = os.path.basename(asset)
+        entries.append((arcname, asset))
+
+    print(f"Packaging USDZ: {len(entries)} file(s) -> {usdz_path}")
+    write_usdz(usdz_path, entries)
+    return usdz_path
+
+
+def remove_layer_files(layer_paths):
+    """
+    Delete packaged USD layers, the assets they reference and any folders
+    (textures/) left empty.
+
+    References are read for every layer before anything is deleted, since
+    layers exported into one folder can share texture files. Assets of a
+    layer whose references can't be read are left in place.
+    """
+    files = []
+    for layer_path in layer_paths:
+        if os.path.exists(layer_path):
+            base_dir = os.path.dirname(os.path.abspath(layer_path))
+            files.append((os.path.abspath(layer_path), base_dir))
+            files += [(asset, base_dir) for asset in _referenced_assets(layer_path) or []]
+
+    for path, _ in files:
+        if os.path.exists(path):
+            os.remove(path)
+
+    for path, base_dir in files:
+        folder = os.path.dirname(path)
+        while folder.startswith(base_dir + os.sep) and os.path.isdir(folder) and not os.listdir(folder):
+            os.rmdir(folder)
+            folder = os.path.dirname(folder)
+
+
+def entry_data_offset(fp, info):
+    """Read the local file header of an entry and return where its data starts"""
+    fp.seek(info.header_offset)
+    header = fp.read(LOCAL_HEADER_SIZE)
+    if header[:4] != LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"Bad local header for '{info.filename}'")
+    name_size, extra_size = struct.unpack('<HH', header[26:30])
+    return info.header_offset + LOCAL_HEADER_SIZE + name_size + extra_size
+
+
+def validate_usdz(usdz_path):
+    """
+    Check a USDZ archive against the packaging rules.
+
+    Returns a list of problem strings, empty if the archive is valid.
+    """
+    problems = []
+    try:
+        zf = zipfile.ZipFile(usdz_path)
+    except (OSError, zipfile.BadZipFile) as e:
+        return [f"Not a readable zip archive: {e}"]
+
+    with zf:
+        infos = zf.infolist()
+        if not infos:
+            return ["Archive is empty"]
+
+        if os.path.splitext(infos[0].filename)[1].lower() not in USD_EXTENSIONS:
+            problems.append(f"First entry '{infos[0].filename}' is not a USD layer")
+
+        for info in infos:
+            name = info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                problems.append(f"'{name}' is compressed")
+            if info.flag_bits & 0x1:
+                problems.append(f"'{name}' is encrypted")
+            if info.flag_bits & 0x8:
+                problems.append(f"'{name}' uses a data descriptor")
+            if not name.endswith('/') and os.path.splitext(name)[1].lower() not in ALLOWED_EXTENSIONS:
+                problems.append(f"'{name}' has an unsupported file type")
+
+            offset = entry_data_offset(zf.fp, info)
+            if offset % ALIGNMENT:
+                problems.append(f"'{name}' data at offset {offset} is not {ALIGNMENT}-byte aligned")
+
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Package or validate USDZ archives")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pack = subparsers.add_parser("pack", help="Package a USD layer and its textures")
+    pack.add_argument("layer", help="Root USD layer (.usdc/.usda)")
+    pack.add_argument("output", help="Output .usdz path")
+    pack.add_argument("--asset", action="append", help="Asset to include (default: the files the layer references)")
+
+    validate = subparsers.add_parser("validate", help="Check archive layout")
+    validate.add_argument("usdz", help="USDZ file to check")
+
+    args = parser.parse_args()
+
+    if args.command == "pack":
+        package_usdz(args.layer, args.output, args.asset)
+        target = args.output
+    else:
+        target = args.usdz
+
+    problems = validate_usdz(target)
+    if problems:
+        print(f"❌ {target} is not a valid USDZ:")
+        for problem in problems:
+            print(f"  - {problem}")
+        sys.exit(1)
+    print(f"✓ {target} is a valid USDZ")
+
+
+if __name__ == "__main__":
+    main()
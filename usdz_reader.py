@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Native USDZ Reader & Rescaler
+Opens USDZ archives in place (memory-mapped; stored entries are exposed as
+zero-copy memoryviews) and rescales models by overriding the root prim's
+xformOp on the USD layer, without converting through GLB.
+
+Rescaling writes a small .usda root layer that sublayers the original layer
+and prepends a scale op to the root prim(s). Every original entry is copied
+byte-for-byte, so the cost doesn't grow with mesh size.
+
+Requires the USD Python bindings for rescaling: pip3 install usd-core
+
+Usage:
+    python3 usdz_reader.py list model.usdz
+    python3 usdz_reader.py scale model.usdz 240 85 95 model_scaled.usdz
+"""
+
+import os
+import sys
+import mmap
+import zipfile
+import tempfile
+import argparse
+
+from usdz_packager import write_usdz, entry_data_offset
+
+# Name of the scale op we add, kept separate from any authored scale
+FIT_SCALE_OP = "xformOp:scale:arFit"
+
+# customLayerData flag marking a root layer written by rescale_usdz
+WRAPPER_FLAG = "arFitWrapper"
+
+
+class UsdzArchive:
+    """
+    Read-only, memory-mapped view of a USDZ archive.
+
+    Stored entries are returned by read() as memoryview slices of the map.
+    Release them before calling close().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.entries = {}
+        self.names = []
+        with zipfile.ZipFile(self._file) as zf:
+            for info in zf.infolist():
+                if info.filename.endswith('/'):
+                    continue
+                offset = entry_data_offset(self._file, info)
+                self.entries[info.filename] = (offset, info)
+                self.names.append(info.filename)
+
+        if not self.names:
+            self.close()
+            raise zipfile.BadZipFile(f"'{path}' has no entries")
+
+    @property
+    def root_layer(self):
+        """The first entry, which the USDZ spec requires to be the root layer"""
+        return self.names[0]
+
+    def read(self, name):
+        """Return entry data; stored entries are zero-copy views into the map"""
+        offset, info = self.entries[name]
+        if info.compress_type == zipfile.ZIP_STORED:
+            return memoryview(self._map)[offset:offset + info.file_size]
+        # Non-conforming (compressed) archive: decompress a copy
+        with zipfile.ZipFile(self._file) as zf:
+            return memoryview(zf.read(info))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _fit_targets(prim):
+    """
+    Find the prims that carry the root transform.
+
+    Xformable root prims are used directly; non-xformable containers (e.g. a
+    Scope) are searched for their top-most xformable descendants.
+    """
+    from pxr import UsdGeom, UsdShade
+
+    if prim.IsA(UsdGeom.Xformable):
+        return [prim]
+    if prim.IsA(UsdShade.Material):
+        return []
+    targets = []
+    for child in prim.GetChildren():
+        targets.extend(_fit_targets(child))
+    return targets
+
+
+def rescale_usdz(input_path, target_dims_cm, output_path):
+    """
+    Scale a USDZ model to target dimensions (cm) without converting it.
+
+    target_dims_cm: tuple (width, height, depth). Height follows the stage's
+    up axis, so Z-up stages map depth to Y.
+    """
+    from pxr import Usd, UsdGeom, Sdf, Gf, Vt
+
+    print(f"Opening USDZ: {input_path}")
+    stage = Usd.Stage.Open(str(input_path))
+    if stage is None:
+        raise ValueError(f"Could not open USD stage from '{input_path}'")
+
+    # Bounds come from authored extents, not from walking every point
+    bbox_cache = UsdGeom.BBoxCache(
+        Usd.TimeCode.Default(), [UsdGeom.Tokens.default_, UsdGeom.Tokens.render], useExtentsHint=True
+    )
+    box = bbox_cache.ComputeWorldBound(stage.GetPseudoRoot()).ComputeAlignedRange()
+    if box.IsEmpty():
+        raise ValueError("Model has no measurable geometry")
+    current_dims = box.GetMax() - box.GetMin()
+
+    meters_per_unit = UsdGeom.GetStageMetersPerUnit(stage)
+    up_axis = UsdGeom.GetStageUpAxis(stage)
+    width_m, height_m, depth_m = (d / 100.0 for d in target_dims_cm)
+    if up_axis == UsdGeom.Tokens.z:
+        target = (width_m, depth_m, height_m)
+    else:
+        target = (width_m, height_m, depth_m)
+
+    print(f"Current dimensions (m): {[round(current_dims[i] * meters_per_unit, 4) for i in range(3)]}")
+    factors = [
+        (target[i] / meters_per_unit) / current_dims[i] if current_dims[i] > 0 else 1.0
+        for i in range(3)
+    ]
+    print(f"Axis scale factors: X={factors[0]:.4f}, Y={factors[1]:.4f}, Z={factors[2]:.4f}")
+
+    root_layer = stage.GetRootLayer()
+    is_wrapper = bool(root_layer.customLayerData.get(WRAPPER_FLAG))
+
+    default_prim = stage.GetDefaultPrim()
+    roots = [default_prim] if default_prim else list(stage.GetPseudoRoot().GetChildren())
+    targets = [t for prim in roots for t in _fit_targets(prim)]
+    if not targets:
+        raise ValueError("No transformable root prim found")
+
+    # Wrapper layer: sublayers the original and overrides the root transform
+    wrapper = Sdf.Layer.CreateAnonymous(".usda")
+    wrapper.customLayerData = {WRAPPER_FLAG: True}
+    if default_prim:
+        wrapper.defaultPrim = default_prim.GetName()
+    wrapper.pseudoRoot.SetInfo("upAxis", up_axis)
+    wrapper.pseudoRoot.SetInfo("metersPerUnit", meters_per_unit)
+
+    with UsdzArchive(input_path) as archive:
+        original_root = archive.root_layer
+        if is_wrapper:
+            # Rescaling our own output: replace the wrapper, keep its sublayer
+            wrapper.subLayerPaths = list(root_layer.subLayerPaths)
+        else:
+            wrapper.subLayerPaths = [original_root]
+
+        for prim in targets:
+            xformable = UsdGeom.Xformable(prim)
+            order = list(xformable.GetXformOpOrderAttr().Get() or [])
+            scale = Gf.Vec3d(*factors)
+            if FIT_SCALE_OP in order:
+                previous = prim.GetAttribute(FIT_SCALE_OP).Get()
+                scale = Gf.Vec3d(*(previous[i] * factors[i] for i in range(3)))
+            else:
+                # The fit scale applies in world space: outermost op, after a reset
+                insert_at = 1 if order and order[0] == "!resetXformStack!" else 0
+                order.insert(insert_at, FIT_SCALE_OP)
+
+            spec = Sdf.CreatePrimInLayer(wrapper, prim.GetPath())
+            scale_attr = Sdf.AttributeSpec(spec, FIT_SCALE_OP, Sdf.ValueTypeNames.Double3)
+            scale_attr.default = scale
+            order_attr = Sdf.AttributeSpec(
+                spec, "xformOpOrder", Sdf.ValueTypeNames.TokenArray, Sdf.VariabilityUniform
+            )
+            order_attr.default = Vt.TokenArray(order)
+
+        wrapper_bytes = wrapper.ExportToString().encode("utf-8")
+        del stage, bbox_cache
+
+        wrapper_name = f"{os.path.splitext(os.path.basename(output_path))[0]}_fit.usda"
+        entries = [(wrapper_name, wrapper_bytes)]
+        for name in archive.names:
+            if is_wrapper and name == original_root:
+                continue
+            entries.append((name, archive.read(name)))
+
+        # Write next to the output first, the input may be the same file
+        fd, tmp_path = tempfile.mkstemp(suffix='.usdz', dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        try:
+            write_usdz(tmp_path, entries)
+        finally:
+            # Drop the views into the map before the archive closes
+            entries.clear()
+        os.replace(tmp_path, output_path)
+
+    print(f"Saved rescaled USDZ to: {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or rescale USDZ archives natively")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_cmd = subparsers.add_parser("list", help="List archive entries")
+    list_cmd.add_argument("usdz", help="USDZ file")
+
+    scale_cmd = subparsers.add_parser("scale", help="Rescale to dimensions in cm")
+    scale_cmd.add_argument("usdz", help="Input USDZ file")
+    scale_cmd.add_argument("width", type=float, help="Target width in cm")
+    scale_cmd.add_argument("height", type=float, help="Target height in cm")
+    scale_cmd.add_argument("depth", type=float, help="Target depth in cm")
+    scale_cmd.add_argument("output", help="Output USDZ file")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        with UsdzArchive(args.usdz) as archive:
+            for name in archive.names:
+                offset, info = archive.entries[name]
+                print(f"{offset:>12}  {info.file_size:>12}  {name}")
+        return
+
+    try:
+        rescale_usdz(args.usdz, (args.width, args.height, args.depth), args.output)
+    except ImportError:
+        print("Error: USD Python bindings not available. Install: pip3 install usd-core")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()